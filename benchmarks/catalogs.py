@@ -0,0 +1,42 @@
+import json
+import random
+from typing import Any, Dict
+
+from fastmcp import FastMCP
+from fastmcp.tools.tool import Tool, ToolResult
+
+
+VERBS = ["get", "list", "create", "update", "delete", "compute", "convert", "search", "summarize", "validate"]
+NOUNS = ["invoice", "user", "order", "report", "ticket", "forecast", "document", "image", "metric", "account"]
+PARAM_TYPES = ["integer", "number", "string", "boolean"]
+PARAM_NAMES = ["id", "name", "limit", "offset", "query", "amount", "currency", "start_date", "end_date", "verbose"]
+
+
+class SyntheticTool(Tool):
+    """
+    Tool with a generated JSON schema. Echoes its arguments back so tool calls are cheap
+    and deterministic.
+    """
+
+    async def run(self, arguments: Dict[str, Any]) -> ToolResult:
+        return ToolResult(structured_content={"result": json.dumps(arguments, sort_keys=True)})
+
+
+def create_synthetic_catalog(n_tools: int, seed: int = 0, name: str | None = None) -> FastMCP:
+    """
+    Builds an in-process FastMCP server with n_tools synthetic tools of 1 to 4 parameters.
+    The same (n_tools, seed) always produces the same catalog.
+    """
+    rng = random.Random(seed)
+    mcp = FastMCP(name or f"synthetic_{n_tools}")
+    for i in range(n_tools):
+        verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+        param_names = rng.sample(PARAM_NAMES, rng.randint(1, 4))
+        properties = {param: {"type": rng.choice(PARAM_TYPES)} for param in param_names}
+        mcp.add_tool(SyntheticTool(
+            name=f"{verb}_{noun}_{i}",
+            description=f"{verb.capitalize()} a {noun} record",
+            parameters={"type": "object", "properties": properties, "required": param_names},
+            output_schema={"type": "object", "properties": {"result": {"type": "string"}}, "required": ["result"]},
+        ))
+    return mcp
@@ -0,0 +1,376 @@
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import uvicorn
+from fastmcp import FastMCP
+from pydantic import BaseModel, Field
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src.mcp_client import MCPClientPool
+
+
+PLACEHOLDER_PATTERN = re.compile(r"\[[^\]]+\]")
+WORD_PATTERN = re.compile(r"[a-zA-Z]+")
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class FakeServerConfig(BaseModel):
+    latency_ms: float = Field(default=20.0, description="Mean response latency in milliseconds")
+    jitter_ms: float = Field(default=5.0, description="Uniform jitter added to the latency in milliseconds")
+    error_rate: float = Field(default=0.0, description="Fraction of requests answered with a 500")
+    rate_limit_rate: float = Field(default=0.0, description="Fraction of requests answered with a 429")
+    retry_after: float = Field(default=0.1, description="Retry-After seconds sent with 429 responses")
+    seed: int = Field(default=0, description="Seed for latency, failures and generated content")
+
+
+### Content generation ###
+def count_tokens(text: str) -> int:
+    # rough 4 characters per token estimate, only used for usage reporting
+    return max(1, len(text) // 4)
+
+
+def find_count(text: str, default: int = 3) -> int:
+    match = re.search(r"exactly (\d+)", text)
+    return int(match.group(1)) if match else default
+
+
+def fake_templates(system: str, user: str, rng: random.Random) -> dict:
+    name_match = re.search(r"name='([^']+)'", user)
+    tool_name = name_match.group(1) if name_match else "the tool"
+    params = re.findall(r"'(\w+)': \{'type'", user) or ["value"]
+    templates = []
+    for i in range(find_count(system + user)):
+        placeholders = " and ".join(f"[{param}]" for param in params)
+        templates.append(f"Variant {i}: please use {tool_name.replace('_', ' ')} with {placeholders}.")
+    return {"templates": templates}
+
+
+def fake_expansions(system: str, user: str, rng: random.Random) -> dict:
+    match = re.search(r"records to expand: (.*)", user)
+    template = match.group(1).strip() if match else user
+    expanded = []
+    for i in range(find_count(system + user)):
+        filled = PLACEHOLDER_PATTERN.sub(lambda _: f"[{rng.randint(1, 10_000)}]", template)
+        expanded.append(f"{filled} (request {i})")
+    return {"expanded_templates": expanded}
+
+
+def fake_chat_content(messages: list, rng: random.Random, json_mode: bool = False) -> str:
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+    text = system + " " + user
+    if "template generator" in text:
+        payload = fake_templates(system, user, rng)
+    elif "template expander" in text:
+        payload = fake_expansions(system, user, rng)
+    else:
+        payload = {"answer": "ok"}
+    # JSON mode returns the bare object, like the provider
+    return json.dumps(payload) if json_mode else f"```json\n{json.dumps(payload)}\n```"
+
+
+### Responses API with MCP tools ###
+def select_tool(query: str, tools: List[Any]) -> Any:
+    """
+    Picks the tool whose name and description share the most words with the query,
+    standing in for the teacher model's tool choice.
+    """
+    query_words = set(w.lower() for w in WORD_PATTERN.findall(query))
+
+    def score(tool) -> int:
+        tool_words = WORD_PATTERN.findall(f"{tool.name.replace('_', ' ')} {tool.description or ''}")
+        return len(query_words & set(w.lower() for w in tool_words))
+
+    return max(tools, key=score)
+
+
+def fill_arguments(query: str, input_schema: dict) -> Dict[str, Any]:
+    """
+    Fills the tool arguments from the query: numbers for numeric parameters, words for strings.
+    """
+    numbers = NUMBER_PATTERN.findall(query)
+    words = [w for w in WORD_PATTERN.findall(query) if len(w) > 3]
+    arguments = {}
+    for name, schema in input_schema.get("properties", {}).items():
+        param_type = schema.get("type")
+        if param_type == "integer":
+            arguments[name] = int(float(numbers.pop(0))) if numbers else 1
+        elif param_type == "number":
+            arguments[name] = float(numbers.pop(0)) if numbers else 1.0
+        elif param_type == "boolean":
+            arguments[name] = True
+        else:
+            arguments[name] = words.pop(0) if words else name
+    return arguments
+
+
+def fake_tool_call_message(messages: list, function_tools: list) -> dict:
+    """
+    Function-calling turn for the local teacher loop: call the best matching tool once,
+    then answer with the tool result.
+    """
+    tool_results = [m for m in messages if m.get("role") == "tool"]
+    if tool_results:
+        return {"role": "assistant", "content": str(tool_results[-1].get("content", "")), "reasoning": "The tool returned the answer."}
+    query = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+    functions = [SimpleNamespace(**tool["function"]) for tool in function_tools]
+    function = select_tool(query, functions)
+    arguments = fill_arguments(query, getattr(function, "parameters", {}) or {})
+    return {
+        "role": "assistant",
+        "content": None,
+        "reasoning": f"The user wants {function.name}.",
+        "tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex}",
+            "type": "function",
+            "function": {"name": function.name, "arguments": json.dumps(arguments)},
+        }],
+    }
+
+
+def get_call_output(result: Any) -> str:
+    texts = [block.text for block in getattr(result, "content", []) if hasattr(block, "text")]
+    return "\n".join(texts)
+
+
+async def run_mcp_turn(pool: MCPClientPool, query: str, tool_config: dict, local_servers: Dict[str, FastMCP]) -> List[dict]:
+    """
+    Emulates one hosted-MCP teacher turn: list the server's tools, pick one, call it and
+    return the `reasoning` and `mcp_call` output items the provider would send back.
+    """
+    server_url = tool_config.get("server_url", "")
+    client = await pool.connect(local_servers.get(server_url, server_url))
+    tools = await client.list_tools()
+    tool = select_tool(query, tools)
+    arguments = fill_arguments(query, tool.inputSchema)
+
+    output, error = None, None
+    try:
+        output = get_call_output(await client.call_tool(tool.name, arguments))
+    except Exception as e:
+        error = str(e)
+
+    return [
+        {
+            "id": f"rs_{uuid.uuid4().hex}",
+            "type": "reasoning",
+            "summary": [],
+            "content": [{"type": "reasoning_text", "text": f"The user wants {tool.name}. I will call it with {json.dumps(arguments)}."}],
+        },
+        {
+            "id": f"mcp_{uuid.uuid4().hex}",
+            "type": "mcp_call",
+            "server_label": tool_config.get("server_label"),
+            "name": tool.name,
+            "arguments": json.dumps(arguments),
+            "output": output,
+            "error": error,
+            "status": "completed" if error is None else "failed",
+        },
+        {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": output or error or "", "annotations": []}],
+        },
+    ]
+
+
+### App ###
+def create_app(config: FakeServerConfig, local_servers: Dict[str, FastMCP] | None = None) -> Starlette:
+    """
+    OpenAI-compatible app answering chat completions with canned templater and expander
+    responses, and `responses.create` calls with `mcp` tools by calling the MCP server itself,
+    with configurable latency, 500s and 429s.
+
+    Args:
+        config (FakeServerConfig): Latency and failure settings.
+        local_servers (Dict[str, FastMCP], optional): In-process servers keyed by the `server_url`
+            the teacher sends. Other URLs are reached over HTTP, e.g. `python src/server.py`.
+    """
+    if local_servers is None:
+        local_servers = {}
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+    seen_prefixes = set()
+
+    async def simulate_network():
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)) / 1000)
+        roll = rng.random()
+        if roll < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "fake server error", "type": "server_error"}}, status_code=500)
+        if roll < config.error_rate + config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(config.retry_after)}
+            )
+        return None
+
+    async def chat_completions(request: Request):
+        failure = await simulate_network()
+        if failure is not None:
+            return failure
+        body = await request.json()
+        messages = body.get("messages", [])
+        if body.get("tools"):
+            message = fake_tool_call_message(messages, body["tools"])
+        else:
+            json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+            message = {"role": "assistant", "content": fake_chat_content(messages, rng, json_mode)}
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = count_tokens(json.dumps(message))
+        # emulate provider prefix caching: a repeated first message is served from cache
+        prefix = str(messages[0].get("content", "")) if messages else ""
+        cached_tokens = count_tokens(prefix) if prefix in seen_prefixes else 0
+        seen_prefixes.add(prefix)
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        })
+
+    async def responses(request: Request):
+        failure = await simulate_network()
+        if failure is not None:
+            return failure
+        body = await request.json()
+        query = body.get("input")
+        query = query if isinstance(query, str) else json.dumps(query)
+        output = []
+        for tool_config in body.get("tools", []):
+            if tool_config.get("type") == "mcp":
+                output.extend(await run_mcp_turn(request.app.state.pool, query, tool_config, local_servers))
+        input_tokens = count_tokens(query)
+        output_tokens = sum(count_tokens(json.dumps(item)) for item in output) or 1
+        return JSONResponse({
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "fake"),
+            "status": "completed",
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": body.get("tools", []),
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        })
+
+    async def get_stats(request: Request):
+        return JSONResponse(stats)
+
+    routes = [
+        # groq sdk uses /openai/v1, openai sdk uses the configured base url
+        Route("/openai/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/openai/v1/responses", responses, methods=["POST"]),
+        Route("/v1/responses", responses, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+    ]
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        # one MCP session per server for the lifetime of the app
+        async with MCPClientPool() as pool:
+            app.state.pool = pool
+            yield
+
+    app = Starlette(routes=routes, lifespan=lifespan)
+    app.state.stats = stats
+    app.state.config = config
+    return app
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeLLMServer:
+    """
+    Runs the fake app with uvicorn in a background thread.
+
+    Usage:
+        with FakeLLMServer(FakeServerConfig(latency_ms=50)) as server:
+            os.environ["GROQ_BASE_URL"] = server.url
+    """
+
+    def __init__(self, config: FakeServerConfig | None = None, port: int | None = None,
+                 local_servers: Dict[str, FastMCP] | None = None):
+        self.config = config or FakeServerConfig()
+        self.port = port or get_free_port()
+        self.app = create_app(self.config, local_servers)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.app.state.stats)
+
+    def __enter__(self) -> "FakeLLMServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--local-mcp", action="store_true",
+                        help="Serve src/server.py in-process for teacher calls to http://localhost:8000/mcp")
+    args = parser.parse_args()
+    config = FakeServerConfig(latency_ms=args.latency_ms, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    local_servers = {}
+    if args.local_mcp:
+        from src.server import create_mcp_server
+        local_servers["http://localhost:8000/mcp"] = create_mcp_server()
+    uvicorn.run(create_app(config, local_servers), host="127.0.0.1", port=args.port)
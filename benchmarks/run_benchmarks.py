@@ -0,0 +1,249 @@
+"""
+End-to-end pipeline throughput benchmark against a local fake LLM server.
+
+Runs the same stages as `shrinkmcp` (discovery, templates, expansion, augmentation,
+merge + selection, teacher) over synthetic MCP tool catalogs and reports rows per second and
+peak RSS per stage. Results are appended to a JSON file and compared against the
+previous run with the same settings to flag regressions.
+
+Usage:
+    python -m benchmarks.run_benchmarks --tools 10 100 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from fastmcp import FastMCP
+
+from benchmarks.catalogs import create_synthetic_catalog
+from benchmarks.fake_llm_server import FakeLLMServer, FakeServerConfig
+
+
+DEFAULT_RESULTS_PATH = "benchmarks/results.json"
+
+
+### Memory sampling ###
+def get_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class PeakRSSSampler:
+    """
+    Samples the process RSS in a background thread and keeps the peak seen while active.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, get_rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self.peak = get_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, get_rss_bytes())
+
+
+def run_stage(name: str, func: Callable, results: List[dict], n_tools: int):
+    with PeakRSSSampler() as sampler:
+        start = time.perf_counter()
+        output = func()
+        seconds = time.perf_counter() - start
+    rows = len(output)
+    results.append({
+        "tools": n_tools,
+        "stage": name,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(rows / seconds, 2) if seconds > 0 else None,
+        "peak_rss_mb": round(sampler.peak / 1024 / 1024, 1),
+    })
+    print(f"  {name:<14} rows={rows:<7} {seconds:8.2f}s  {results[-1]['rows_per_second']} rows/s  peak_rss={results[-1]['peak_rss_mb']}MB")
+    return output
+
+
+class LexicalNoiseAugmentor:
+    """
+    Offline augmentor for benchmarks: lexical noise only, since semantic noise and
+    back translation need Wikipedia and Google Translate.
+    """
+
+    def __init__(self):
+        from src.query.augmentation.augmentors.noise_injection import NoiseInjectionAugmentor
+        self.augmentor = NoiseInjectionAugmentor()
+
+    def augment(self, text: str, rng=None) -> str:
+        return self.augmentor.augment(text, add_lexical=True, add_semantic=False, rng=rng)
+
+
+def run_pipeline(n_tools: int, target_size: int, seed: int, teacher_prompts: int, teacher_mode: str,
+                 local_servers: Dict[str, FastMCP]) -> List[dict]:
+    # imported here so the pipeline modules pick up the fake server environment
+    from src.query.generation.helpers import get_mcp_tools, generate_templates_for_all_tools, expand_templates_for_all_records
+    from src.query.augmentation.services import generate_augmented_queries
+    from src.query.sampling.helpers import select_diverse_prompts
+    from src.helpers import merge_base_queries_and_augmentation_queries
+    from src.knowledge_extraction.services import extract_knowledge_from_teacher
+    from src.knowledge_extraction.helpers import get_answers_with_local_tools
+    from src.utils import load_config
+
+    results: List[dict] = []
+    catalog = create_synthetic_catalog(n_tools, seed=seed)
+    # the teacher sends mcp_server_url + "/mcp", the fake server routes it to the in-process catalog
+    mcp_server_url = f"local://{catalog.name}"
+    local_servers[f"{mcp_server_url}/mcp"] = catalog
+    print(f"Catalog with {n_tools} tools")
+
+    tools = run_stage("discovery", lambda: asyncio.run(get_mcp_tools(catalog)), results, n_tools)
+    templates = run_stage("templates", lambda: generate_templates_for_all_tools(tools, mcp_server_url), results, n_tools)
+    expanded = run_stage("expansion", lambda: expand_templates_for_all_records(templates), results, n_tools)
+    augmentors = {"noise_injection": LexicalNoiseAugmentor()}
+    augmented = run_stage(
+        "augmentation",
+        lambda: generate_augmented_queries(expanded, {"seed": seed, "noise_injection": 1}, augmentors),
+        results, n_tools
+    )
+    prompts = run_stage(
+        "merge",
+        lambda: select_diverse_prompts(merge_base_queries_and_augmentation_queries(expanded, augmented, save_as_csv=False), target_size),
+        results, n_tools
+    )
+    teacher_config = load_config("config.yaml", section="teacher")
+    if teacher_mode == "local":
+        teacher = lambda: asyncio.run(get_answers_with_local_tools(prompts[:teacher_prompts], [catalog]))
+    else:
+        teacher = lambda: [extract_knowledge_from_teacher(teacher_prompt=prompt, config=teacher_config) for prompt in prompts[:teacher_prompts]]
+    run_stage("teacher", teacher, results, n_tools)
+    return results
+
+
+### Results file ###
+def get_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_results(file_path: str) -> List[dict]:
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path) as file:
+        return json.load(file)
+
+
+def find_regressions(run: dict, history: List[dict], threshold: float) -> List[str]:
+    """
+    Compares rows/s of each (tools, stage) against the latest previous run with the same settings.
+    """
+    previous = next((r for r in reversed(history) if r["settings"] == run["settings"]), None)
+    if previous is None:
+        return []
+    baseline = {(r["tools"], r["stage"]): r for r in previous["results"]}
+    regressions = []
+    for result in run["results"]:
+        before = baseline.get((result["tools"], result["stage"]))
+        if not before or not before["rows_per_second"] or not result["rows_per_second"]:
+            continue
+        if result["rows_per_second"] < before["rows_per_second"] * (1 - threshold):
+            regressions.append(
+                f"{result['stage']} @ {result['tools']} tools: {result['rows_per_second']} rows/s "
+                f"vs {before['rows_per_second']} rows/s at {previous['commit']}"
+            )
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--tools", type=int, nargs="+", default=[10, 100], help="Catalog sizes to benchmark (10 to 1000)")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--target-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--teacher-prompts", type=int, default=20, help="Number of merged prompts sent to the teacher")
+    parser.add_argument("--teacher-mode", choices=["hosted", "local"], default="hosted",
+                        help="Provider-hosted MCP calls or the client-side teacher loop")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH)
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative rows/s drop reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's INFO logs")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    server_config = FakeServerConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    local_servers: Dict[str, FastMCP] = {}
+    with FakeLLMServer(server_config, local_servers=local_servers) as server:
+        os.environ["GROQ_API_KEY"] = "fake-key"
+        os.environ["GROQ_BASE_URL"] = server.url
+        os.environ["GROQ_API_BASE_URL"] = f"{server.url}/v1"
+        results = []
+        for n_tools in args.tools:
+            results.extend(run_pipeline(n_tools, args.target_size, args.seed, args.teacher_prompts, args.teacher_mode, local_servers))
+        server_stats = server.stats
+        from src.llm_client import get_pool_stats, get_router_stats
+        from src.metrics import get_metrics
+        token_stats = {
+            stage: {key: values[key] for key in ("prompt_tokens", "cached_tokens", "completion_tokens")}
+            for stage, values in get_metrics().items() if values["prompt_tokens"]
+        }
+        pool_stats = get_pool_stats()
+        router_stats = get_router_stats()
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": get_commit(),
+        "settings": {**server_config.model_dump(), "target_size": args.target_size, "teacher_prompts": args.teacher_prompts, "teacher_mode": args.teacher_mode},
+        "server_stats": server_stats,
+        "pool_stats": pool_stats,
+        "router_stats": router_stats,
+        "token_stats": token_stats,
+        "results": results,
+    }
+    history = load_results(args.results)
+    regressions = find_regressions(run, history, args.threshold)
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "w") as file:
+        json.dump(history + [run], file, indent=2)
+    print(f"Results appended to {args.results}")
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,26 +11,22 @@ from src.query.generation.helpers import get_mcp_tools
 
 from src.query.augmentation.services import generate_augmented_queries
 from src.query.augmentation.utils import load_augmentation_config, load_augmentors_config, save_dataset_to_csv
+from src.utils import load_config
 
 
 def generate_queries() -> List[GeneratedQuery]:
     mcp = create_mcp_server()
     print("Fetching tools from MCP server...\n")
     tools = asyncio.run(get_mcp_tools(mcp))
-    print("Extracted tool metadata:")
-    print(tools)
-    print(len(tools))
+    print(f"Extracted metadata for {len(tools)} tools")
     print("Generating templates for all tools...\n")
     template_records = generate_templates_for_all_tools(tools, mcp_server_url="https://01b996655acc.ngrok-free.app")
     save_templates(template_records)
-    print(template_records)
-    print(len(template_records))
-    print()
+    print(f"Generated {len(template_records)} templates\n")
     print("Expanding templates for all records...\n")
     expanded_records: List[GeneratedQuery] = expand_templates_for_all_records(template_records)
     save_expanded_queries(expanded_records)
-    print(expanded_records)
-    print(len(expanded_records))
+    print(f"Expanded {len(expanded_records)} queries")
     print("\nDone!")
     return expanded_records
 
@@ -54,7 +50,7 @@ def query_augmentation(records: List[GeneratedQuery]) -> List[AugmentedQuery]:
     augmentation_config = load_augmentation_config()
     print("Loaded augmentation config:", augmentation_config)
 
-    # Seed for reproducibility, only working for backtranslation so far
+    # Seed for reproducibility, each record's augmentations use an RNG stream derived from it
     seed = augmentation_config.get("seed", 1)
     random.seed(seed)
 
@@ -73,6 +69,10 @@ def query_augmentation(records: List[GeneratedQuery]) -> List[AugmentedQuery]:
 
 
 def main():
+    servers = load_config("config.yaml", "mcp_servers").get("servers", [])
+    if servers:
+        shrinkmcp(servers)
+        return
     mcp = create_mcp_server()
     shrinkmcp(mcp, "https://c2b1087f017e.ngrok-free.app")
     
@@ -3,41 +3,62 @@ from typing import List
 
 from fastmcp import FastMCP
 
-from src.utils import remove_square_brackets_from_str, save_merged_dataset_to_csv
+from src.utils import load_config, remove_square_brackets_from_str, save_merged_dataset_to_csv
 from src.models.queries import GeneratedQuery, AugmentedQuery
 from src.models.dataset import TeacherPrompt
 from src.models import GeneratedQuery, AugmentedQuery
-from src.query.generation.helpers import generate_templates_for_all_tools, expand_templates_for_all_records, save_expanded_queries, save_templates
+from src.query.generation.helpers import generate_templates_for_all_tools, expand_templates_for_all_records, save_expanded_queries, save_templates, load_templates_index
 from src.server import create_mcp_server
-from src.query.generation.helpers import get_mcp_tools
+from src.query.generation.helpers import get_mcp_tools, discover_mcp_tools
+from src.mcp_client import ServerSpec, get_server_name, get_server_url
 from src.query.augmentation.services import generate_augmented_queries
 from src.query.augmentation.utils import load_augmentation_config, load_augmentors_config, save_dataset_to_csv
-from src.knowledge_extraction.helpers import get_answers_from_teacher_prompts
+from src.query.sampling.helpers import load_budget_plan, select_diverse_prompts
+from src.knowledge_extraction.helpers import get_answers_from_teacher_prompts, get_answers_with_local_tools
 from src.sft.helpers import parse_and_format_student_data
 from src.sft.utils import format_data_for_sft, save_jsonl_file
-from src.sft.tune import tune_student_model
+from src.metrics import save_metrics
+from src.llm_client import get_pool_stats, get_router_stats
 
 import logging
 import asyncio
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def shrinkmcp(mcp_server: FastMCP, mcp_server_url: str):
-    logger.info("Fetching tools from MCP server...\n")
-    tools = asyncio.run(get_mcp_tools(mcp_server))
-    logger.info("Generating templates for all tools...\n")
-    template_records = generate_templates_for_all_tools(tools, mcp_server_url)
-    save_templates(template_records)
-    logger.info("Expanding templates for all records...\n")
-    expanded_records: List[GeneratedQuery] = expand_templates_for_all_records(template_records)
-    save_expanded_queries(expanded_records)
-    logger.info("\nDone generating expanded records!\n\n")
-    # augment
-    logger.info("Starting query augmentation...\n")
+def check_teacher_mode(servers: List[ServerSpec], mcp_server_url: str | None, mode: str):
+    """
+    In "hosted" mode the provider calls each tool's server over the internet, so every server
+    needs a URL (its own or `mcp_server_url`). Fails before any generation work otherwise.
+    """
+    if mode == "local":
+        return
+    missing = [get_server_name(server) for server in servers if (get_server_url(server) or mcp_server_url) is None]
+    if missing:
+        raise ValueError(
+            f"teacher.mode '{mode}' needs a public URL for every MCP server, none for {missing}. "
+            f"Pass mcp_server_url, configure the servers by URL, or set teacher.mode: local"
+        )
+
+
+def shrinkmcp(mcp_server: FastMCP | List[ServerSpec], mcp_server_url: str | None = None):
+    teacher_config = load_config("config.yaml", "teacher")
+    check_teacher_mode([mcp_server] if isinstance(mcp_server, FastMCP) else mcp_server, mcp_server_url,
+                       teacher_config.get("mode", "hosted"))
+    if isinstance(mcp_server, FastMCP):
+        logger.info("Fetching tools from MCP server...\n")
+        tools = asyncio.run(get_mcp_tools(mcp_server))
+    else:
+        logger.info(f"Fetching tools from {len(mcp_server)} MCP servers...\n")
+        discovery_config = load_config("config.yaml", "mcp_servers")
+        tools = asyncio.run(discover_mcp_tools(
+            mcp_server,
+            max_concurrency=discovery_config.get("max_concurrency", 8),
+        ))
+
     augmentation_config = load_augmentation_config()
     print("Loaded augmentation config:", augmentation_config)
 
-    # Seed for reproducibility, only working for backtranslation so far
+    # Seed for reproducibility, each record's augmentations use an RNG stream derived from it
     seed = augmentation_config.get("seed", 1)
     random.seed(seed)
 
@@ -45,9 +66,32 @@ def shrinkmcp(mcp_server: FastMCP, mcp_server_url: str):
     exclude = augmentation_config.get("exclude", [])
     augmentors = load_augmentors_config()
     active_augmentors = {name: aug for name, aug in augmentors.items() if name not in exclude}
+
+    # plan templates, expansions and augmentations per tool from dataset.target_size
+    budget = load_budget_plan(
+        n_tools=len(tools),
+        variants={name: augmentation_config.get(name, 1) for name in active_augmentors}
+    )
+
+    logger.info("Generating templates for all tools...\n")
+    templater_config = load_config("config.yaml", "templater")
+    templates_index = load_templates_index() if templater_config.get("reuse_templates", True) else {}
+    template_records = generate_templates_for_all_tools(
+        tools,
+        mcp_server_url,
+        templates_per_tool=budget.templates_per_tool,
+        templates_index=templates_index
+    )
+    save_templates(template_records)
+    logger.info("Expanding templates for all records...\n")
+    expanded_records: List[GeneratedQuery] = expand_templates_for_all_records(template_records, batch_size=budget.batch_size)
+    save_expanded_queries(expanded_records)
+    logger.info("\nDone generating expanded records!\n\n")
+    # augment
+    logger.info("Starting query augmentation...\n")
     augmented_records: List[AugmentedQuery] = generate_augmented_queries(
         records=expanded_records,
-        augmentation_config=augmentation_config,
+        augmentation_config={**augmentation_config, **budget.variants},
         active_augmentors=active_augmentors
     )
     save_dataset_to_csv(augmented_records, seed=seed)
@@ -57,19 +101,35 @@ def shrinkmcp(mcp_server: FastMCP, mcp_server_url: str):
     merged_dataset: List[TeacherPrompt] = merge_base_queries_and_augmentation_queries(
         base_queries=expanded_records,
         augmented_queries=augmented_records,
-        save_as_csv=True
+        save_as_csv=False
     )
+    # keep only the most diverse prompts so the teacher stage stops at dataset.target_size
+    merged_dataset = select_diverse_prompts(merged_dataset, target_size=budget.target_size)
+    save_merged_dataset_to_csv(merged_dataset, "output/merged_dataset.csv")
     logger.info("\nDone merging datasets!\n\n")
     logger.info("Extracting knowledge from teacher prompts...\n")
     # extract knowledge from teacher
-    answers = get_answers_from_teacher_prompts(merged_dataset)
+    if teacher_config.get("mode", "hosted") == "local":
+        # run the tool calls in-process instead of exposing the server to the provider
+        servers = [mcp_server] if isinstance(mcp_server, FastMCP) else mcp_server
+        answers = asyncio.run(get_answers_with_local_tools(
+            merged_dataset,
+            servers,
+            max_concurrency=teacher_config.get("max_concurrency", 4)
+        ))
+    else:
+        answers = get_answers_from_teacher_prompts(merged_dataset)
     logger.info("\nDone extracting knowledge from teacher prompts!\n\n")
     
     # format student data for SFT
     logger.info("Formatting student dataset for SFT...\n")
     formatted_data = parse_and_format_student_data("output/student_data.csv")
     logger.info("✅ Student dataset formatted and saved to output/student_data_sft.jsonl")
-    # # fine-tune student model
+    save_metrics()
+    logger.info(f"LLM connection pools: {get_pool_stats()}")
+    logger.info(f"LLM endpoints: {get_router_stats()}")
+    # # fine-tune student model (imported here, unsloth needs a GPU)
+    # from src.sft.tune import tune_student_model
     # logger.info("Starting fine-tuning of the student model...\n")
     # tune_student_model(
     #     model_name="unsloth/gemma-2b",
@@ -1,17 +1,30 @@
-
+import asyncio
+import logging
+from collections import deque
+from typing import List
 
 # iterate over the TeacherPrompt to extract answers from each prompt
-from src.models.dataset import TeacherPrompt
-from src.knowledge_extraction.services import extract_knowledge_from_teacher
-from src.knowledge_extraction.utils import save_student_dataset_as_csv
+from src.mcp_client import MCPClientPool, ServerSpec, get_server_name
+from src.models.dataset import StudentDataset, TeacherPrompt
+from src.knowledge_extraction.services import (
+    RETRY_LATER_ERRORS,
+    extract_knowledge_from_teacher,
+    extract_knowledge_with_local_tools,
+)
+from src.knowledge_extraction.utils import save_student_dataset_as_csv, to_function_tools
 from src.utils import load_config
 
+logger = logging.getLogger(__name__)
+
 config = load_config("config.yaml", section="teacher")
 
 
 def get_answers_from_teacher_prompts(prompts: list[TeacherPrompt]) -> list[dict]:
     """
-    Processes all TeacherPrompt objects to extract answers one by one.
+    Processes all TeacherPrompt objects to extract answers one by one. Prompts that miss
+    teacher.deadline_seconds or hit a transient error (rate limit, connection or server error)
+    go to a retry queue that is drained after the first pass, up to teacher.deadline_retries
+    times. Prompts that fail otherwise are skipped.
 
     Args:
         prompts (list[TeacherPrompt]): List of TeacherPrompt objects.
@@ -20,12 +33,77 @@ def get_answers_from_teacher_prompts(prompts: list[TeacherPrompt]) -> list[dict]
         list[dict]: List of dictionaries containing the extracted answers.
     """
     answers = []
+    retry_queue = deque()
     try: 
         for prompt in prompts:
-            answer = extract_knowledge_from_teacher(teacher_prompt=prompt, config=config)
-            answers.append(answer)
+            try:
+                answer = extract_knowledge_from_teacher(teacher_prompt=prompt, config=config)
+            except RETRY_LATER_ERRORS as e:
+                logger.warning(f"Prompt ID {prompt.id} queued for retry: {e}")
+                retry_queue.append(prompt)
+                continue
+            if answer is not None:
+                answers.append(answer)
+        for _ in range(config.get("deadline_retries", 1)):
+            for _ in range(len(retry_queue)):
+                prompt = retry_queue.popleft()
+                try:
+                    answer = extract_knowledge_from_teacher(teacher_prompt=prompt, config=config)
+                except RETRY_LATER_ERRORS:
+                    retry_queue.append(prompt)
+                    continue
+                if answer is not None:
+                    answers.append(answer)
+        if retry_queue:
+            logger.error(f"Dropped prompt IDs after retries: {[prompt.id for prompt in retry_queue]}")
         save_student_dataset_as_csv(answers, "output/student_data.csv")
     except Exception as e:
         print(f"Error processing prompt ID {prompt.id}: {e}")
         save_student_dataset_as_csv(answers, "output/student_data.csv")
-    return answers
\ No newline at end of file
+    return answers
+
+
+async def get_answers_with_local_tools(prompts: list[TeacherPrompt], servers: List[ServerSpec],
+                                       max_concurrency: int = 4) -> list[StudentDataset]:
+    """
+    Answers all prompts with the client-side teacher loop. Each MCP server is connected once
+    and its session is shared by every prompt routed to it (by TeacherPrompt.mcp_server,
+    falling back to the first server).
+
+    Args:
+        prompts (list[TeacherPrompt]): Prompts to answer.
+        servers (List[ServerSpec]): FastMCP instances, URLs or stdio commands to run the tools on.
+        max_concurrency (int): Maximum number of prompts in flight.
+
+    Returns:
+        list[StudentDataset]: Answers in the order of the prompts, failed prompts are skipped.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    servers_by_name = {get_server_name(server): server for server in servers}
+
+    async with MCPClientPool() as pool:
+        function_tools = {}
+        for name, server in servers_by_name.items():
+            client = await pool.connect(server)
+            function_tools[name] = to_function_tools(await client.list_tools())
+
+        async def answer(prompt: TeacherPrompt) -> StudentDataset | None:
+            name = prompt.mcp_server if prompt.mcp_server in servers_by_name else get_server_name(servers[0])
+            async with semaphore:
+                try:
+                    return await extract_knowledge_with_local_tools(
+                        teacher_prompt=prompt,
+                        config=config,
+                        mcp_client=pool.get(name),
+                        function_tools=function_tools[name],
+                        server_label=name
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing prompt ID {prompt.id}: {e}")
+                    return None
+
+        answers = await asyncio.gather(*[answer(prompt) for prompt in prompts])
+
+    answers = [answer for answer in answers if answer is not None]
+    save_student_dataset_as_csv(answers, "output/student_data.csv")
+    return answers
@@ -1,9 +1,22 @@
+import json
 import logging
-from src.llm_client import get_groq_client, get_llm_client
+from functools import partial
 
-from src.knowledge_extraction.utils import prepare_student_dataset
+from fastmcp import Client
+
+from src.llm_client import (
+    RETRYABLE_ERRORS,
+    DeadlineExceeded,
+    LatencyTracker,
+    get_async_groq_client,
+    get_llm_client,
+    hedged_call,
+)
+from src.metrics import instrument, record_retry, record_usage, timed
+
+from src.knowledge_extraction.utils import prepare_student_dataset, get_tool_result_text
 from src.models.configs import ModelConfig
-from src.models.dataset import TeacherPrompt
+from src.models.dataset import TeacherPrompt, StudentDataset
 from src.utils import load_config
 
 config: ModelConfig = load_config("config.yaml", section="teacher")
@@ -11,10 +24,17 @@ config: ModelConfig = load_config("config.yaml", section="teacher")
 logger = logging.getLogger(__name__)
 
 
+# teacher calls failing with these are retried after the other prompts (deadline misses, and rate
+# limits, connection and server errors that single-attempt calls no longer retry in the SDK)
+RETRY_LATER_ERRORS = (DeadlineExceeded, *RETRYABLE_ERRORS)
+
 counter = 0
-client = get_llm_client()
+client = get_llm_client("teacher")
+# latencies of teacher calls, the hedging threshold is a percentile of these
+teacher_latency = LatencyTracker(min_samples=config.get("hedge", {}).get("min_samples", 20))
 # how to process this by batch?
-def extract_knowledge_from_teacher(teacher_prompt: TeacherPrompt, config: ModelConfig) -> dict:
+@instrument("extract_knowledge_from_teacher")
+def extract_knowledge_from_teacher(teacher_prompt: TeacherPrompt, config: ModelConfig) -> dict | None:
     """
     Extract knowledge from the given query using an LLM.
 
@@ -22,7 +42,10 @@ def extract_knowledge_from_teacher(teacher_prompt: TeacherPrompt, config: ModelC
         query (str): The input query string.
 
     Returns:
-        dict: The extracted knowledge as a dictionary.
+        dict: The extracted knowledge as a dictionary, None when the call failed.
+
+    Raises:
+        RETRY_LATER_ERRORS: When the call missed its deadline or hit a transient error.
     """
     global counter
     counter += 1
@@ -31,8 +54,15 @@ def extract_knowledge_from_teacher(teacher_prompt: TeacherPrompt, config: ModelC
         import time
         logger.info("Sleeping for 5 seconds to avoid rate limiting...\n")
         time.sleep(5)
+    hedge_config = config.get("hedge", {})
+    hedging = hedge_config.get("enabled", False)
+    deadline = config.get("deadline_seconds")
+    # a deadline-bound or hedged call is one attempt of at most `deadline` seconds: retrying is up
+    # to the hedge and the caller's retry queue, and abandoned calls free their worker in time
+    teacher_client = client.with_options(max_retries=0) if deadline is not None or hedging else client
     try: 
-        response = client.responses.create(
+        request = partial(
+            teacher_client.responses.create,
             model=config.get("model_name"),
             input=teacher_prompt.query,
             tools=[
@@ -41,10 +71,95 @@ def extract_knowledge_from_teacher(teacher_prompt: TeacherPrompt, config: ModelC
                     "server_label": "Testing-server",
                     "server_url": teacher_prompt.mcp_server_url + "/mcp"
                 }
-            ]
+            ],
+            timeout=deadline
         )
+        response = hedged_call(
+            request,
+            tracker=teacher_latency,
+            percentile=hedge_config.get("percentile", 0.95) if hedging else None,
+            deadline=deadline,
+            on_hedge=lambda: record_retry("extract_knowledge_from_teacher.hedge")
+        )
+        record_usage("extract_knowledge_from_teacher", response, config.get("model_name"))
+    except RETRY_LATER_ERRORS:
+        # handled by the caller's retry queue
+        raise
     except Exception as e:
-        print(f"Error generating response for prompt ID {teacher_prompt.id}: {e}")
+        logger.error(f"Error generating response for prompt ID {teacher_prompt.id}: {e}")
+        return None
     formatted_response = prepare_student_dataset(teacher_prompt, response, config)
     return formatted_response
 
+
+async def extract_knowledge_with_local_tools(teacher_prompt: TeacherPrompt, config: ModelConfig, mcp_client: Client,
+                                             function_tools: list[dict], server_label: str | None = None) -> StudentDataset:
+    """
+    Extract knowledge with a client-side agent loop: the teacher is called with chat-completions
+    function calling and every tool call is executed directly through the connected MCP client,
+    instead of letting the provider reach the MCP server over the internet.
+
+    Args:
+        teacher_prompt (TeacherPrompt): The prompt to answer.
+        config (ModelConfig): Teacher config (model_name, temperature, max_tokens, max_steps).
+        mcp_client (Client): Connected fastmcp client of the prompt's MCP server.
+        function_tools (list[dict]): The server's tools as chat-completions function definitions.
+        server_label (str, optional): Label recorded on each tool call.
+
+    Returns:
+        StudentDataset: Same shape as the hosted MCP extraction.
+    """
+    client = get_async_groq_client("teacher")
+    model = config.get("model_name")
+    messages = [{"role": "user", "content": teacher_prompt.query}]
+    reasoning = []
+    tool_calls = []
+
+    for _ in range(config.get("max_steps", 5)):
+        with timed("extract_knowledge_with_local_tools"):
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=function_tools,
+                temperature=config.get("temperature"),
+                max_tokens=config.get("max_tokens"),
+            )
+        record_usage("extract_knowledge_with_local_tools", response, model)
+        message = response.choices[0].message
+        if getattr(message, "reasoning", None):
+            reasoning.append(message.reasoning)
+
+        if not message.tool_calls:
+            if message.content and not reasoning:
+                reasoning.append(message.content)
+            break
+
+        messages.append({
+            "role": "assistant",
+            "content": message.content or "",
+            "tool_calls": [
+                {"id": call.id, "type": "function", "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                for call in message.tool_calls
+            ],
+        })
+        for call in message.tool_calls:
+            tool_calls.append({
+                "server_label": server_label,
+                "name": call.function.name,
+                "arguments": call.function.arguments,
+            })
+            try:
+                arguments = json.loads(call.function.arguments or "{}")
+            except json.JSONDecodeError as e:
+                messages.append({"role": "tool", "tool_call_id": call.id, "content": f"Invalid JSON arguments: {e}"})
+                continue
+            with timed("local_tool_call"):
+                result = await mcp_client.call_tool(call.function.name, arguments, raise_on_error=False)
+            messages.append({"role": "tool", "tool_call_id": call.id, "content": get_tool_result_text(result)})
+
+    return StudentDataset(
+        query=teacher_prompt,
+        reasoning="\n".join(reasoning),
+        tool_calls=tool_calls,
+        model_cfg=config
+    )
@@ -1,3 +1,5 @@
+import httpx
+import openai
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -38,4 +40,25 @@ def test_get_answers_from_teacher_prompts(mock_extract):
     assert mock_extract.call_count == 2
     # Update assertions to include all arguments
     mock_extract.assert_any_call(prompts[0].query, None, None)
-    mock_extract.assert_any_call(prompts[1].query, "http://mcp.example.com", "http://mcp.example.com")
\ No newline at end of file
+    mock_extract.assert_any_call(prompts[1].query, "http://mcp.example.com", "http://mcp.example.com")
+
+@patch('src.knowledge_extraction.helpers.save_student_dataset_as_csv')
+@patch('src.knowledge_extraction.helpers.extract_knowledge_from_teacher')
+def test_rate_limited_prompts_are_retried_and_failed_prompts_skipped(mock_extract, mock_save):
+    """Test that a rate limit queues the prompt for retry and a failed prompt does not stop the run."""
+    prompts = [
+        TeacherPrompt(id=i, query=f"query {i}", is_augmented=False, augmentation_technique=None,
+                      tool_name="tool", mcp_server=None)
+        for i in range(3)
+    ]
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.example.com"))
+    mock_extract.side_effect = [
+        openai.RateLimitError("rate limited", response=response, body=None),
+        None,
+        {"answer": "2"},
+        {"answer": "0"},
+    ]
+    answers = get_answers_from_teacher_prompts(prompts)
+
+    assert answers == [{"answer": "2"}, {"answer": "0"}]
+    assert [call.kwargs["teacher_prompt"].id for call in mock_extract.call_args_list] == [0, 1, 2, 0]
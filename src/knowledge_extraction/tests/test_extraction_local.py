@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastmcp import Client
+
+from src.models.dataset import TeacherPrompt
+from src.knowledge_extraction.services import extract_knowledge_with_local_tools
+from src.knowledge_extraction.utils import to_function_tools
+from src.server import create_mcp_server
+
+
+def make_response(content=None, tool_calls=None, reasoning=None):
+    message = SimpleNamespace(content=content, tool_calls=tool_calls, reasoning=reasoning)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_tool_call(name: str, arguments: str):
+    return SimpleNamespace(id=f"call_{name}", function=SimpleNamespace(name=name, arguments=arguments))
+
+
+@patch('src.knowledge_extraction.services.get_async_groq_client')
+def test_extract_knowledge_with_local_tools_runs_tool_calls(mock_get_client):
+    """Test that tool calls run on the local MCP server and their results are sent back to the teacher."""
+    mock_client = Mock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=[
+        make_response(tool_calls=[make_tool_call("add", '{"a": 2, "b": 3}')], reasoning="I should add."),
+        make_response(content="The answer is 5."),
+    ])
+    mock_get_client.return_value = mock_client
+    prompt = TeacherPrompt(id=1, query="What is 2 + 3?", is_augmented=False, tool_name="add")
+    config = {"model_name": "openai/gpt-oss-20b", "temperature": 0.3, "max_tokens": 256, "max_steps": 3}
+
+    async def run():
+        async with Client(create_mcp_server()) as client:
+            function_tools = to_function_tools(await client.list_tools())
+            return await extract_knowledge_with_local_tools(prompt, config, client, function_tools, server_label="test")
+
+    result = asyncio.run(run())
+
+    assert result.tool_calls == [{"server_label": "test", "name": "add", "arguments": '{"a": 2, "b": 3}'}]
+    assert result.reasoning == "I should add."
+    second_messages = mock_client.chat.completions.create.call_args_list[1].kwargs["messages"]
+    assert second_messages[-1] == {"role": "tool", "tool_call_id": "call_add", "content": "5"}
+
+
+def test_to_function_tools():
+    tool = SimpleNamespace(name="add", description="Add two numbers", inputSchema={"type": "object", "properties": {"a": {"type": "integer"}}})
+    assert to_function_tools([tool]) == [{
+        "type": "function",
+        "function": {"name": "add", "description": "Add two numbers", "parameters": tool.inputSchema},
+    }]
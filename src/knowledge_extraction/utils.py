@@ -48,6 +48,29 @@ def prepare_student_dataset(teacher_prompt: TeacherPrompt, teacher_response: dic
     return student_dataset
 
 
+def to_function_tools(tools: list) -> List[dict]:
+    """
+    Converts MCP tools (mcp.types.Tool) to chat-completions function tool definitions.
+    """
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description or "",
+                "parameters": tool.inputSchema or {"type": "object", "properties": {}},
+            },
+        }
+        for tool in tools
+    ]
+
+
+def get_tool_result_text(result) -> str:
+    # concatenates the text blocks of an MCP CallToolResult
+    texts = [block.text for block in getattr(result, "content", []) if hasattr(block, "text")]
+    return "\n".join(texts)
+
+
 def save_student_dataset_as_csv(student_dataset: List[StudentDataset], file_path: str) -> None:
     """
     Saves the StudentDataset to a CSV file.
@@ -1,31 +1,554 @@
+import asyncio
+import logging
 import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from types import SimpleNamespace
+from typing import Callable, Dict, List
 from dotenv import load_dotenv
 
-from groq import Groq
+import httpx
+from groq import AsyncGroq, Groq
 import openai
 
+from src.metrics import record_retry, timed
+from src.utils import load_config
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # connect to llm
 _response_client = None
 _client = None
+_http_client = None
+# async clients are bound to the event loop they were created in
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_http_config = None
+
+
+def get_http_config() -> dict:
+    global _http_config
+    if _http_config is None:
+        _http_config = load_config("config.yaml", "http") or {}
+    return _http_config
+
+
+def _http2_enabled(config: dict) -> bool:
+    if not config.get("http2", False):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("http.http2 is set but the h2 package is not installed, falling back to HTTP/1.1")
+        return False
+    return True
+
+
+def _build_http_client_kwargs() -> dict:
+    config = get_http_config()
+    timeouts = config.get("timeouts", {})
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.get("max_connections", 100),
+            max_keepalive_connections=config.get("max_keepalive_connections", 20),
+            keepalive_expiry=config.get("keepalive_expiry", 30.0),
+        ),
+        "timeout": httpx.Timeout(
+            connect=timeouts.get("connect", 5.0),
+            read=timeouts.get("read", 120.0),
+            write=timeouts.get("write", 30.0),
+            pool=timeouts.get("pool", 30.0),
+        ),
+        "http2": _http2_enabled(config),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Shared pooled httpx client behind every sync LLM client, configured by the `http`
+    section of config.yaml (pool size, keep-alive, HTTP/2, per-phase timeouts).
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(**_build_http_client_kwargs())
+    return _http_client
+
+
+def _get_async_clients() -> dict:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = {"http": httpx.AsyncClient(**_build_http_client_kwargs())}
+    return _async_clients[loop]
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Shared pooled httpx client for async LLM clients, one per running event loop.
+    """
+    return _get_async_clients()["http"]
+
 
 # config to use responses api with openai
 # https://console.groq.com/docs/responses-api
-def get_llm_client():
+def get_llm_client(section: str | None = None):
+    """
+    OpenAI-compatible client for the responses api. With providers.endpoints configured,
+    returns the router over the section's endpoint pool instead.
+    """
+    if section is not None and get_providers_config().get("endpoints"):
+        return get_routed_client(section)
     global _response_client
     if _response_client is None:
         _response_client = openai.OpenAI(
             api_key=os.getenv("GROQ_API_KEY"),
             base_url=os.getenv("GROQ_API_BASE_URL", "https://api.groq.com/openai/v1"),
+            http_client=get_http_client(),
         )
     return _response_client
 
 
-def get_groq_client():
+def get_groq_client(section: str | None = None):
+    """
+    Groq client for chat completions. With providers.endpoints configured, returns the
+    router over the section's endpoint pool instead.
+    """
+    if section is not None and get_providers_config().get("endpoints"):
+        return get_routed_client(section)
     global _client
     if _client is None:
         _client = Groq(
             api_key=os.getenv("GROQ_API_KEY"),
+            http_client=get_http_client(),
+        )
+    return _client
+
+
+def get_async_llm_client() -> openai.AsyncOpenAI:
+    clients = _get_async_clients()
+    if "llm" not in clients:
+        clients["llm"] = openai.AsyncOpenAI(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=os.getenv("GROQ_API_BASE_URL", "https://api.groq.com/openai/v1"),
+            http_client=clients["http"],
+        )
+    return clients["llm"]
+
+
+def get_async_groq_client(section: str | None = None):
+    if section is not None and get_providers_config().get("endpoints"):
+        return get_routed_client(section, is_async=True)
+    clients = _get_async_clients()
+    if "groq" not in clients:
+        clients["groq"] = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            http_client=clients["http"],
+        )
+    return clients["groq"]
+
+
+### Pool occupancy ###
+def _get_pool_stats(client: httpx.Client | httpx.AsyncClient) -> dict:
+    # httpx does not expose pool state publicly, read it from the underlying httpcore pool
+    pool = getattr(client._transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "max_connections": getattr(pool, "_max_connections", None),
+        "connections": len(connections),
+        "active": len(connections) - idle,
+        "idle": idle,
+        # requests waiting for a free connection
+        "queued": sum(1 for request in getattr(pool, "_requests", []) if request.is_queued()),
+    }
+
+
+def get_pool_stats() -> dict:
+    """
+    Occupancy of the shared connection pools, used to size pipeline concurrency:
+    `queued` > 0 means requests are waiting on http.max_connections.
+
+    Returns:
+        dict: {"sync": {...}, "async": [{...}, ...]} with connections, active, idle and queued counts.
+    """
+    return {
+        "sync": _get_pool_stats(_http_client) if _http_client is not None else None,
+        "async": [_get_pool_stats(clients["http"]) for clients in list(_async_clients.values())],
+    }
+
+
+### Provider routing ###
+# errors worth retrying on another endpoint, anything else (e.g. a bad request) is raised directly
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+_providers_config = None
+_endpoints: Dict[str, "Endpoint"] = {}
+_routers: Dict[str, "LLMRouter"] = {}
+_routers_lock = threading.Lock()
+# guards the state of every Endpoint (in-flight count, rate budget, health), which routers of
+# different sections share, so one lock for all routers rather than one per router
+_endpoints_lock = threading.Lock()
+
+
+def get_providers_config() -> dict:
+    global _providers_config
+    if _providers_config is None:
+        _providers_config = load_config("config.yaml", "providers") or {}
+    return _providers_config
+
+
+class Endpoint:
+    """
+    One OpenAI-compatible endpoint + API key, with its own rate budget and load/latency state.
+    Endpoints are shared by every router, so a budget covers the whole account.
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: str | None, weight: float = 1.0,
+                 requests_per_minute: float | None = None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.weight = weight
+        self.requests_per_minute = requests_per_minute
+        self.in_flight = 0
+        # exponentially weighted moving average of successful call latency, None until the first call
+        self.latency: float | None = None
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self._budget = float(requests_per_minute or 0)
+        self._refilled_at = time.monotonic()
+        self._clients: dict = {}
+
+    def _refill(self, now: float):
+        if self.requests_per_minute:
+            elapsed = now - self._refilled_at
+            self._budget = min(float(self.requests_per_minute), self._budget + elapsed * self.requests_per_minute / 60)
+        self._refilled_at = now
+
+    def wait_time(self, now: float) -> float:
+        # seconds until the rate budget allows another request
+        if not self.requests_per_minute:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self._budget >= 1 else (1 - self._budget) * 60 / self.requests_per_minute
+
+    def take(self, now: float):
+        self._refill(now)
+        if self.requests_per_minute:
+            self._budget -= 1
+        self.in_flight += 1
+
+    def get_client(self, is_async: bool = False):
+        if is_async:
+            clients = _get_async_clients()
+            # prefixed, so an endpoint named e.g. "groq" or "http" can't replace a shared client
+            key = ("endpoint", self.name)
+            if key not in clients:
+                clients[key] = openai.AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, http_client=clients["http"],
+                    max_retries=get_providers_config().get("max_retries", 1),
+                )
+            return clients[key]
+        if "sync" not in self._clients:
+            self._clients["sync"] = openai.OpenAI(
+                api_key=self.api_key, base_url=self.base_url, http_client=get_http_client(),
+                max_retries=get_providers_config().get("max_retries", 1),
+            )
+        return self._clients["sync"]
+
+    def to_dict(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "latency": self.latency,
+            "failures": self.failures,
+            "healthy": self.unhealthy_until <= time.monotonic(),
+        }
+
+
+def get_endpoint(config: dict) -> Endpoint:
+    name = config["name"]
+    if name not in _endpoints:
+        _endpoints[name] = Endpoint(
+            name=name,
+            base_url=config.get("base_url", "https://api.groq.com/openai/v1"),
+            api_key=os.getenv(config.get("api_key_env", "GROQ_API_KEY")),
+            weight=config.get("weight", 1.0),
+            requests_per_minute=config.get("requests_per_minute"),
         )
-    return _client
\ No newline at end of file
+    return _endpoints[name]
+
+
+class LLMRouter:
+    """
+    Spreads requests over a pool of endpoints. Picks the endpoint with the lowest
+    in-flight count ("least_loaded") or expected latency ("least_latency") relative to its
+    weight among those with rate budget left, and fails over to the next endpoint on
+    connection errors, rate limits and server errors. A failing endpoint is skipped for
+    `cooldown` seconds.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], strategy: str = "least_loaded", cooldown: float = 30.0,
+                 latency_smoothing: float = 0.2):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        if strategy not in ("least_loaded", "least_latency"):
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.latency_smoothing = latency_smoothing
+
+    def _score(self, endpoint: Endpoint) -> float:
+        if self.strategy == "least_latency":
+            # untried endpoints score 0 so each one gets probed
+            return (endpoint.latency or 0.0) * (endpoint.in_flight + 1) / endpoint.weight
+        return endpoint.in_flight / endpoint.weight
+
+    def acquire(self, exclude: set) -> tuple[Endpoint | None, float]:
+        """
+        Reserves an endpoint. Returns (endpoint, 0) or (None, seconds to wait) when every
+        candidate is out of rate budget.
+        """
+        with _endpoints_lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.name not in exclude]
+            if not candidates:
+                return None, 0.0
+            healthy = [e for e in candidates if e.unhealthy_until <= now]
+            # when everything is cooling down, try the one that recovers first
+            candidates = healthy or [min(candidates, key=lambda e: e.unhealthy_until)]
+            waits = {e.name: e.wait_time(now) for e in candidates}
+            ready = [e for e in candidates if waits[e.name] == 0.0]
+            if not ready:
+                return None, min(waits.values())
+            endpoint = min(ready, key=self._score)
+            endpoint.take(now)
+            return endpoint, 0.0
+
+    def release(self, endpoint: Endpoint, seconds: float, error: Exception | None = None):
+        with _endpoints_lock:
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.failures = 0
+                endpoint.latency = seconds if endpoint.latency is None else (
+                    self.latency_smoothing * seconds + (1 - self.latency_smoothing) * endpoint.latency
+                )
+            else:
+                endpoint.failures += 1
+                endpoint.unhealthy_until = time.monotonic() + self.cooldown
+
+    def _get_method(self, endpoint: Endpoint, path: str, is_async: bool, max_retries: int | None = None):
+        method = endpoint.get_client(is_async)
+        if max_retries is not None:
+            method = method.with_options(max_retries=max_retries)
+        for attribute in path.split("."):
+            method = getattr(method, attribute)
+        return method
+
+    def call(self, path: str, max_retries: int | None = None, **kwargs):
+        """
+        Calls `path` (e.g. "chat.completions.create") on the selected endpoint's client,
+        failing over to the other endpoints of the pool. `max_retries` overrides the
+        clients' own SDK retries for this call.
+        """
+        tried: set = set()
+        last_error = None
+        while True:
+            endpoint, wait = self.acquire(tried)
+            if endpoint is None:
+                if wait == 0.0:
+                    raise last_error
+                time.sleep(wait)
+                continue
+            start = time.perf_counter()
+            try:
+                with timed(f"llm_endpoint.{endpoint.name}"):
+                    response = self._get_method(endpoint, path, is_async=False, max_retries=max_retries)(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                self.release(endpoint, time.perf_counter() - start, e)
+                logger.warning(f"Endpoint {endpoint.name} failed ({type(e).__name__}), failing over")
+                record_retry(f"llm_endpoint.{endpoint.name}")
+                tried.add(endpoint.name)
+                last_error = e
+                continue
+            except Exception:
+                self.release(endpoint, time.perf_counter() - start)
+                raise
+            self.release(endpoint, time.perf_counter() - start)
+            return response
+
+    async def acall(self, path: str, max_retries: int | None = None, **kwargs):
+        """
+        Async version of `call`, using the endpoints' async clients.
+        """
+        tried: set = set()
+        last_error = None
+        while True:
+            endpoint, wait = self.acquire(tried)
+            if endpoint is None:
+                if wait == 0.0:
+                    raise last_error
+                await asyncio.sleep(wait)
+                continue
+            start = time.perf_counter()
+            try:
+                with timed(f"llm_endpoint.{endpoint.name}"):
+                    response = await self._get_method(endpoint, path, is_async=True, max_retries=max_retries)(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                self.release(endpoint, time.perf_counter() - start, e)
+                logger.warning(f"Endpoint {endpoint.name} failed ({type(e).__name__}), failing over")
+                record_retry(f"llm_endpoint.{endpoint.name}")
+                tried.add(endpoint.name)
+                last_error = e
+                continue
+            except Exception:
+                self.release(endpoint, time.perf_counter() - start)
+                raise
+            self.release(endpoint, time.perf_counter() - start)
+            return response
+
+
+def get_router(section: str) -> LLMRouter:
+    """
+    Router over the endpoints listed in `<section>.endpoints` of config.yaml
+    (all providers.endpoints when the section does not list any).
+    """
+    with _routers_lock:
+        if section not in _routers:
+            providers_config = get_providers_config()
+            names = load_config("config.yaml", section).get("endpoints") or []
+            endpoints = [
+                get_endpoint(endpoint) for endpoint in providers_config["endpoints"]
+                if not names or endpoint["name"] in names
+            ]
+            _routers[section] = LLMRouter(
+                endpoints,
+                strategy=providers_config.get("strategy", "least_loaded"),
+                cooldown=providers_config.get("cooldown", 30.0),
+            )
+        return _routers[section]
+
+
+def get_routed_client(section: str, is_async: bool = False) -> SimpleNamespace:
+    """
+    Drop-in replacement for the Groq/OpenAI clients at the call sites: exposes
+    `chat.completions.create`, `responses.create` and `with_options(max_retries=...)`
+    backed by the section's router.
+    """
+    router = get_router(section)
+    return _build_routed_client(router.acall if is_async else router.call)
+
+
+def _build_routed_client(call: Callable, max_retries: int | None = None) -> SimpleNamespace:
+    call = partial(call, max_retries=max_retries) if max_retries is not None else call
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=partial(call, "chat.completions.create"))),
+        responses=SimpleNamespace(create=partial(call, "responses.create")),
+        with_options=lambda max_retries: _build_routed_client(call, max_retries),
+    )
+
+
+def get_router_stats() -> dict:
+    return {name: endpoint.to_dict() for name, endpoint in _endpoints.items()}
+
+
+### Hedging ###
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class LatencyTracker:
+    """
+    Sliding window of successful call latencies, used as an online percentile estimate
+    for the hedging threshold.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        # None until enough samples were seen to trust the estimate
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_hedge_executor = ThreadPoolExecutor(thread_name_prefix="llm-hedge")
+
+
+def hedged_call(func: Callable, tracker: LatencyTracker | None = None, percentile: float | None = None,
+                deadline: float | None = None, on_hedge: Callable | None = None):
+    """
+    Calls `func` and, when it has not returned after the tracker's `percentile` latency,
+    sends a duplicate and returns whichever succeeds first. With a router the duplicate
+    lands on another endpoint, since the first one is still counted as in flight.
+    The slower call is not cancelled, its result is dropped, so callers should make `func`
+    a single attempt (no SDK retries) bounded by the deadline.
+
+    Args:
+        func (Callable): The request, called without arguments.
+        tracker (LatencyTracker, optional): Latencies of past calls, updated by every successful call.
+        percentile (float, optional): Hedge threshold as a quantile (e.g. 0.95); None disables hedging.
+        deadline (float, optional): Seconds after which DeadlineExceeded is raised.
+        on_hedge (Callable, optional): Called when the duplicate is sent.
+
+    Returns:
+        The first successful result.
+    """
+    started = threading.Event()
+
+    def timed_func():
+        started.set()
+        start = time.perf_counter()
+        result = func()
+        if tracker is not None:
+            tracker.observe(time.perf_counter() - start)
+        return result
+
+    pending = {_hedge_executor.submit(timed_func)}
+    # the deadline and hedge delay count from when a worker picks the call up, not while it
+    # waits in the executor queue behind abandoned calls
+    started.wait()
+    start = time.monotonic()
+    hedge_after = tracker.percentile(percentile) if tracker is not None and percentile is not None else None
+    hedged = False
+    error = None
+
+    while pending:
+        remaining = None if deadline is None else deadline - (time.monotonic() - start)
+        timeout = remaining
+        if not hedged and hedge_after is not None:
+            until_hedge = hedge_after - (time.monotonic() - start)
+            timeout = until_hedge if remaining is None else min(until_hedge, remaining)
+        done, pending = wait(pending, timeout=max(timeout, 0) if timeout is not None else None, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if done:
+            # the hedge only helps slow calls, a failed call is not duplicated
+            continue
+        if remaining is not None and time.monotonic() - start >= deadline:
+            raise DeadlineExceeded(f"No response within {deadline}s")
+        if not hedged and hedge_after is not None:
+            hedged = True
+            if on_hedge is not None:
+                on_hedge()
+            pending.add(_hedge_executor.submit(timed_func))
+    raise error
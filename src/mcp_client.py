@@ -0,0 +1,86 @@
+import asyncio
+import shlex
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from typing import Any, Dict
+
+from fastmcp import Client, FastMCP
+from fastmcp.client.transports import StdioTransport
+
+
+# a server spec is one of:
+# - a FastMCP instance (in-process)
+# - a URL string, e.g. "http://localhost:8000/mcp"
+# - a stdio command string, e.g. "python src/server.py"
+# - a dict with "name" and either "url" or "command" (+ optional "args", "env")
+ServerSpec = FastMCP | str | Dict[str, Any]
+
+
+def get_server_name(server: ServerSpec) -> str:
+    if isinstance(server, FastMCP):
+        return server.name
+    if isinstance(server, dict):
+        return server.get("name") or server.get("url") or " ".join([server["command"], *server.get("args", [])])
+    return server
+
+
+def get_server_url(server: ServerSpec) -> str | None:
+    if isinstance(server, dict):
+        return server.get("url")
+    if isinstance(server, str) and server.startswith(("http://", "https://")):
+        return server
+    return None
+
+
+def build_transport(server: ServerSpec):
+    if isinstance(server, FastMCP):
+        return server
+    if isinstance(server, dict):
+        if "url" in server:
+            return server["url"]
+        return StdioTransport(command=server["command"], args=server.get("args", []), env=server.get("env"))
+    if get_server_url(server) is not None:
+        return server
+    command, *args = shlex.split(server)
+    return StdioTransport(command=command, args=args)
+
+
+class MCPClientPool:
+    """
+    Keeps one connected fastmcp.Client per MCP server so discovery and tool calls
+    reuse the same session instead of reconnecting on every request.
+
+    Usage:
+        async with MCPClientPool() as pool:
+            client = await pool.connect("http://localhost:8000/mcp")
+            tools = await client.list_tools()
+    """
+
+    def __init__(self, timeout: float | None = 30):
+        self.timeout = timeout
+        self._clients: Dict[str, Client] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._stack: AsyncExitStack | None = None
+
+    async def __aenter__(self) -> "MCPClientPool":
+        self._stack = AsyncExitStack()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._stack.aclose()
+        self._clients.clear()
+
+    async def connect(self, server: ServerSpec) -> Client:
+        """
+        Returns the connected client for the server, connecting on first use.
+        """
+        name = get_server_name(server)
+        async with self._locks[name]:
+            if name not in self._clients:
+                client = Client(build_transport(server), name=name, timeout=self.timeout)
+                await self._stack.enter_async_context(client)
+                self._clients[name] = client
+        return self._clients[name]
+
+    def get(self, server_name: str) -> Client:
+        return self._clients[server_name]
@@ -1,5 +1,31 @@
-import pandas as pd
+import asyncio
 import base64
+import hashlib
+import io
+import ipaddress
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from src.mcp_servers.data_analysis.utils import RunningMoments, TDigest, lttb
+
+
+logger = logging.getLogger("DataAnalysisMCPServer")
 
 # Helper function for clean_data tool
 def min_max_normalize(series: pd.Series) -> pd.Series:
@@ -18,4 +44,929 @@ def min_max_normalize(series: pd.Series) -> pd.Series:
 # Helper function to encode the image
 def encode_image(image_path):
   with open(image_path, "rb") as image_file:
-    return base64.b64encode(image_file.read()).decode('utf-8')
\ No newline at end of file
+    return base64.b64encode(image_file.read()).decode('utf-8')
+
+
+### Dataset registry ###
+def to_records(dataset: pd.DataFrame) -> List[dict]:
+    # JSON-safe rows: missing values become None
+    return dataset.astype(object).where(dataset.notna(), None).to_dict(orient="records")
+
+
+def get_derived_handle(*parts: Any) -> str:
+    """
+    Handle of a dataset derived from others, e.g. (parent handle, filters): the same
+    operation on the same input gets the same handle, so it is stored once.
+    """
+    key = json.dumps(list(parts), sort_keys=True, default=str)
+    return "ds_" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class DatasetRegistry:
+    """
+    Keeps datasets server-side as memory-mapped Arrow IPC files and hands out opaque handles,
+    so tools pass a short string instead of the whole serialized DataFrame. Handles survive
+    server restarts since the files stay in `storage_dir`.
+
+    Usage:
+        registry = DatasetRegistry("output/datasets")
+        handle = registry.load("data/sales.csv")
+        dataset = registry.get(handle)
+    """
+
+    def __init__(self, storage_dir: str, frame_cache_size: int = 8, batch_rows: int = 65536):
+        self.storage_dir = storage_dir
+        self.frame_cache_size = frame_cache_size
+        # rows per record batch when converting csv / parquet files, bounds the memory used by load
+        self.batch_rows = batch_rows
+        self._tables: Dict[str, pa.Table] = {}
+        # pandas views of recently used tables
+        self._frames: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(storage_dir, exist_ok=True)
+
+    def _get_path(self, handle: str) -> str:
+        return os.path.join(self.storage_dir, f"{handle}.arrow")
+
+    def _store(self, handle: str, schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> str:
+        path = self._get_path(handle)
+        if not os.path.exists(path):
+            # write to a temp file first so a crash never leaves a truncated dataset behind
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        with self._lock:
+            self._tables[handle] = self._open(handle)
+        return handle
+
+    def _open(self, handle: str) -> pa.Table:
+        # zero-copy read, the pages are loaded by the OS on access
+        return pa.ipc.open_file(pa.memory_map(self._get_path(handle), "r")).read_all()
+
+    def load(self, path: str) -> str:
+        """
+        Loads a .csv, .parquet, .json/.jsonl or .arrow/.feather file and returns its handle.
+        The handle is derived from the path, size and modification time, so loading an
+        unchanged file again is free. CSV and Parquet files are converted batch by batch,
+        so they can be larger than memory.
+        """
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        handle = "ds_" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        if handle in self._tables:
+            return handle
+        if os.path.exists(self._get_path(handle)):
+            with self._lock:
+                self._tables[handle] = self._open(handle)
+            return handle
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".parquet":
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            return self._store(handle, parquet_file.schema_arrow, parquet_file.iter_batches(batch_size=self.batch_rows))
+        if extension == ".csv":
+            reader = pa_csv.open_csv(path)
+            try:
+                return self._store(handle, reader.schema, reader)
+            except pa.ArrowInvalid as e:
+                # streaming infers column types from the first block only, a later value of a
+                # wider type (e.g. 1.5 in an int column) needs the whole file
+                logger.warning(f"Streaming CSV load of {path} failed ({str(e)}), reading it whole")
+                table = pa_csv.read_csv(path)
+        elif extension in (".arrow", ".feather"):
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        elif extension in (".json", ".jsonl"):
+            table = pa.Table.from_pandas(pd.read_json(path, lines=extension == ".jsonl"), preserve_index=False)
+        else:
+            raise ValueError(f"Unsupported dataset format: {extension}")
+        return self._store(handle, table.schema, table.to_batches(self.batch_rows))
+
+    def register(self, dataset: pd.DataFrame, handle: str | None = None) -> str:
+        """
+        Stores a derived dataset (e.g. a cleaned one) and returns its handle, a new one unless
+        given (see `get_derived_handle`).
+        """
+        return self.register_table(pa.Table.from_pandas(dataset, preserve_index=False), handle=handle)
+
+    def register_table(self, table: pa.Table, handle: str | None = None) -> str:
+        handle = handle or "ds_" + uuid.uuid4().hex[:16]
+        return self._store(handle, table.schema, table.to_batches(self.batch_rows))
+
+    def get_path(self, handle: str) -> str:
+        self.get_table(handle)  # raises KeyError for unknown handles
+        return self._get_path(handle)
+
+    def exists(self, handle: str) -> bool:
+        return handle in self._tables or os.path.exists(self._get_path(handle))
+
+    def get_table(self, handle: str) -> pa.Table:
+        with self._lock:
+            if handle not in self._tables:
+                if not os.path.exists(self._get_path(handle)):
+                    raise KeyError(f"Unknown dataset handle: {handle}")
+                self._tables[handle] = self._open(handle)
+            return self._tables[handle]
+
+    def get(self, handle: str) -> pd.DataFrame:
+        """
+        Returns the dataset as a DataFrame. The frame is cached and shared between tools,
+        callers must copy it before modifying it.
+        """
+        with self._lock:
+            if handle in self._frames:
+                self._frames.move_to_end(handle)
+                return self._frames[handle]
+        dataset = self.get_table(handle).to_pandas()
+        with self._lock:
+            self._frames[handle] = dataset
+            if len(self._frames) > self.frame_cache_size:
+                self._frames.popitem(last=False)
+        return dataset
+
+    def describe(self, handle: str) -> dict:
+        table = self.get_table(handle)
+        return {
+            "handle": handle,
+            "rows": table.num_rows,
+            "columns": {field.name: str(field.type) for field in table.schema},
+        }
+
+
+### Plot rendering ###
+PLOT_TYPES = ["bar", "line", "scatter"]
+
+
+def get_plot_x(x: pd.Series) -> np.ndarray:
+    # numeric x positions for LTTB: values for numeric / datetime axes, row positions otherwise
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float, na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return (x - x.min()).dt.total_seconds().to_numpy(dtype=float, na_value=np.nan)
+    return np.arange(len(x), dtype=float)
+
+
+def downsample_plot_data(dataset: pd.DataFrame, x_axis: str, y_axis: List[str], plot_type: str,
+                         line_max_points: int = 2000, scatter_max_points: int = 10000,
+                         bar_max_bars: int = 50) -> Tuple[pd.DataFrame, str, str | None]:
+    """
+    Reduces large datasets to what a chart can show before plotting. Returns the rows to plot,
+    the pandas plot kind, and the downsampling method used (None when nothing was reduced):
+        line    -> LTTB per y column, keeping the union of the selected rows
+        scatter -> hexbin of the first y column (density instead of individual points)
+        bar     -> the `bar_max_bars` largest values of the first y column
+    """
+    if plot_type == "line" and len(dataset) > line_max_points:
+        x = get_plot_x(dataset[x_axis])
+        indices = set()
+        for column in y_axis:
+            y = pd.to_numeric(dataset[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            valid = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+            indices.update(valid[lttb(x[valid], y[valid], line_max_points)].tolist())
+        return dataset.iloc[sorted(indices)], "line", "lttb"
+    if plot_type == "scatter" and len(dataset) > scatter_max_points:
+        return dataset, "hexbin", "hexbin"
+    if plot_type == "bar" and len(dataset) > bar_max_bars:
+        return dataset.nlargest(bar_max_bars, y_axis[0]), "bar", "top_n"
+    return dataset, plot_type, None
+
+
+def render_plot(path: str, x_axis: str, y_axis: List[str], plot_type: str,
+                downsample: Dict[str, int] | None = None) -> Tuple[bytes, dict]:
+    """
+    Renders a plot of the Arrow dataset file at `path` to PNG bytes. Each call draws on a figure
+    of its own through the object-oriented Agg API, with no pyplot state, so calls can run
+    concurrently. Runs in the plot worker processes, which memory-map the file themselves.
+
+    `downsample` holds the limits of `downsample_plot_data` plus `hexbin_gridsize`. Also returns
+    the row counts, downsampling method and render time.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    start = time.perf_counter()
+    downsample = dict(downsample or {})
+    gridsize = downsample.pop("hexbin_gridsize", 50)
+    columns = list(dict.fromkeys([x_axis, *y_axis]))
+    dataset = pa.ipc.open_file(pa.memory_map(path, "r")).read_all().select(columns).to_pandas()
+    plotted, kind, method = downsample_plot_data(dataset, x_axis, y_axis, plot_type, **downsample)
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    options = {"y": y_axis[0], "gridsize": gridsize} if kind == "hexbin" else {"y": y_axis}
+    plotted.plot(kind=kind, x=x_axis, title=f"{plot_type.capitalize()} Plot", ax=figure.subplots(), **options)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png", bbox_inches="tight")
+    info = {
+        "rows": len(dataset),
+        "plotted_rows": len(plotted),
+        "downsampling": method,
+        "render_seconds": round(time.perf_counter() - start, 4),
+    }
+    return buffer.getvalue(), info
+
+
+class PlotRenderer:
+    """
+    Renders visualize_data plots in a pool of worker processes. Files are named after a hash
+    of the request (dataset handle, axes, plot type), so concurrent calls never overwrite each
+    other, an identical request returns the existing file, and identical requests in flight
+    share one render. The PNG bytes of the last `cache_size` plots stay in memory for
+    generate_report. Large datasets are downsampled with the `downsample` limits (see render_plot).
+
+    Usage:
+        renderer = PlotRenderer(registry, "plots")
+        report = await renderer.render(handle, "year", ["sales"], "line")
+        image = renderer.read(report["path"])
+    """
+
+    def __init__(self, registry: DatasetRegistry, output_dir: str = "plots", max_workers: int | None = None,
+                 cache_size: int = 32, downsample: Dict[str, int] | None = None):
+        self.registry = registry
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.downsample = downsample or {}
+        self._images: OrderedDict = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def get_plot_path(self, handle: str, x_axis: str, y_axis: List[str], plot_type: str) -> str:
+        key = json.dumps([handle, x_axis, y_axis, plot_type, self.downsample], sort_keys=True)
+        return os.path.join(self.output_dir, f"{plot_type}_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}.png")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, since the server runs threads that fork would copy
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    async def render(self, handle: str, x_axis: str, y_axis: List[str], plot_type: str) -> dict:
+        """
+        Renders the plot if it does not exist yet. Returns its path and size, and for plots
+        rendered by this server the row counts, downsampling method and render time.
+        """
+        if plot_type not in PLOT_TYPES:
+            raise ValueError(f"Unknown plot type: {plot_type}")
+        path = self.get_plot_path(handle, x_axis, y_axis, plot_type)
+        with self._lock:
+            if path in self._images:
+                return {**self._images[path][1], "cached": True}
+        if os.path.exists(path):
+            return {"path": path, "size_bytes": os.path.getsize(path), "cached": True}
+        task = self._pending.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._render(path, handle, x_axis, y_axis, plot_type))
+            self._pending[path] = task
+            task.add_done_callback(lambda _: self._pending.pop(path, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, path: str, handle: str, x_axis: str, y_axis: List[str], plot_type: str) -> dict:
+        image, info = await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), render_plot, self.registry.get_path(handle), x_axis, y_axis, plot_type, self.downsample
+        )
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(image)
+        os.replace(tmp_path, path)
+        report = {"path": path, "size_bytes": len(image), **info}
+        self._remember(path, image, report)
+        return {**report, "cached": False}
+
+    def _remember(self, path: str, image: bytes, report: dict):
+        with self._lock:
+            self._images[path] = (image, report)
+            self._images.move_to_end(path)
+            while len(self._images) > self.cache_size:
+                self._images.popitem(last=False)
+
+    def read(self, path: str) -> bytes:
+        """
+        PNG bytes of a plot, from memory when it was rendered recently, otherwise from disk.
+        """
+        with self._lock:
+            if path in self._images:
+                self._images.move_to_end(path)
+                return self._images[path][0]
+        with open(path, "rb") as file:
+            return file.read()
+
+
+### Vision results ###
+def get_content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored
+    (ttl None: never).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float | None = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            expires, value = self._data[key]
+            if expires is not None and time.monotonic() >= expires:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl if self.ttl is not None else None, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ImageFetcher:
+    """
+    Downloads images (http(s) or data: URLs) to hash their content. Concurrent fetches of the
+    same URL share one download. Bodies are streamed and a fetch fails with ValueError once
+    it goes over `max_bytes`, as does any other URL scheme.
+
+    URLs come from tool callers, so hosts that resolve to loopback, link-local or private
+    addresses are refused (unless `allow_private_hosts`), and redirects are followed by hand,
+    at most `max_redirects`, checking each hop the same way.
+    """
+
+    SCHEMES = ("http://", "https://", "data:")
+    HTTP_SCHEMES = ("http://", "https://")
+
+    def __init__(self, timeout: float = 30.0, max_bytes: int = 20 * 1024 * 1024, max_redirects: int = 3,
+                 allow_private_hosts: bool = False):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.allow_private_hosts = allow_private_hosts
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def fetch(self, url: str) -> bytes:
+        if not url.lower().startswith(self.SCHEMES):
+            raise ValueError(f"Unsupported image URL scheme: {url[:20]}")
+        task = self._pending.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url))
+            self._pending[url] = task
+            task.add_done_callback(lambda _: self._pending.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str) -> bytes:
+        if url.lower().startswith("data:"):
+            data = url.split(",", 1)[1]
+            if len(data) * 3 // 4 > self.max_bytes:
+                raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+            return base64.b64decode(data)
+        from src.llm_client import get_async_http_client
+        for _ in range(self.max_redirects + 1):
+            await self.check_host(url)
+            async with get_async_http_client().stream("GET", url, timeout=self.timeout,
+                                                      follow_redirects=False) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["location"])
+                    continue
+                response.raise_for_status()
+                if int(response.headers.get("content-length") or 0) > self.max_bytes:
+                    raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+                    chunks.append(chunk)
+            return b"".join(chunks)
+        raise ValueError(f"More than {self.max_redirects} redirects")
+
+    async def check_host(self, url: str):
+        if not url.lower().startswith(self.HTTP_SCHEMES):
+            raise ValueError(f"Unsupported image URL scheme: {url[:20]}")
+        host = urlsplit(url).hostname
+        if not host:
+            raise ValueError(f"Image URL has no host: {url[:100]}")
+        if self.allow_private_hosts:
+            return
+        for *_, address in await asyncio.get_running_loop().getaddrinfo(host, None):
+            # scoped IPv6 addresses come back as "fe80::1%eth0"
+            if not ipaddress.ip_address(address[0].split("%")[0]).is_global:
+                raise ValueError(f"Image host {host} is not a public address")
+
+
+### Report images ###
+IMAGE_MEDIA_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+def preprocess_image(image: bytes, max_side: int = 1024, image_format: str = "jpeg", quality: int = 85) -> bytes:
+    """
+    Shrinks an image to at most `max_side` pixels on its longest side (the vision model
+    downscales larger images anyway) and re-encodes it to `image_format`.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image)) as source:
+        source.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        if image_format == "jpeg" and source.mode != "RGB":
+            # no alpha channel in jpeg, flatten onto white like the plot background
+            background = Image.new("RGB", source.size, "white")
+            background.paste(source, mask=source.convert("RGBA").getchannel("A"))
+            source = background
+        buffer = io.BytesIO()
+        options = {"optimize": True} if image_format == "png" else {"quality": quality}
+        source.save(buffer, format=image_format.upper(), **options)
+    return buffer.getvalue()
+
+
+class ImageEncoder:
+    """
+    Turns report images into data URLs with `preprocess_image`, labelled with the format they
+    are actually encoded in. Encoded images are cached by the hash of the original bytes.
+
+    Usage:
+        encoder = ImageEncoder(max_side=1024, image_format="jpeg", quality=85)
+        encoded = encoder.encode(image)
+        encoded["url"], encoded["original_bytes"] - encoded["encoded_bytes"]
+    """
+
+    def __init__(self, max_side: int = 1024, image_format: str = "jpeg", quality: int = 85, cache_size: int = 64):
+        if image_format not in IMAGE_MEDIA_TYPES:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.max_side = max_side
+        self.image_format = image_format
+        self.quality = quality
+        self._cache = TTLCache(cache_size, ttl=None)
+
+    def encode(self, image: bytes) -> dict:
+        key = get_content_hash(image)
+        encoded = self._cache.get(key)
+        if encoded is None:
+            encoded = preprocess_image(image, self.max_side, self.image_format, self.quality)
+            self._cache.put(key, encoded)
+        return {
+            "url": f"data:{IMAGE_MEDIA_TYPES[self.image_format]};base64,{base64.b64encode(encoded).decode('utf-8')}",
+            "original_bytes": len(image),
+            "encoded_bytes": len(encoded),
+        }
+
+
+### Filters ###
+COMPARISONS = {
+    "==": pc.equal,
+    "!=": pc.not_equal,
+    ">": pc.greater,
+    ">=": pc.greater_equal,
+    "<": pc.less,
+    "<=": pc.less_equal,
+}
+FILTER_OPERATORS = [*COMPARISONS, "in", "not_in"]
+
+
+def parse_filters(filters: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    """
+    Turns get_raw_data filters into (column, operator, value) predicates, all combined with AND:
+        {"country": "PH"}                   -> country == "PH"
+        {"country": ["PH", "US"]}           -> country in ["PH", "US"]
+        {"year": {">=": 2020, "<": 2024}}  -> 2020 <= year < 2024
+    """
+    predicates = []
+    for column, condition in filters.items():
+        if isinstance(condition, dict):
+            for operator, value in condition.items():
+                if operator not in FILTER_OPERATORS:
+                    raise ValueError(f"Unknown filter operator '{operator}', expected one of {FILTER_OPERATORS}")
+                if operator in ("in", "not_in") and not isinstance(value, list):
+                    value = [value]
+                predicates.append((column, operator, value))
+        elif isinstance(condition, list):
+            predicates.append((column, "in", condition))
+        else:
+            predicates.append((column, "==", condition))
+    return predicates
+
+
+def to_scalar(value: Any, data_type: pa.DataType) -> pa.Scalar:
+    """
+    Filter value as a scalar of the column type. A number the column type can't hold exactly
+    (e.g. 2.5 on an integer column) stays a float64, so it is compared numerically.
+    """
+    try:
+        return pa.scalar(value).cast(data_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and is_numeric(data_type):
+            return pa.scalar(float(value), type=pa.float64())
+        raise ValueError(f"Filter value {value!r} does not match column type {data_type}") from e
+
+
+def is_numeric(data_type: pa.DataType) -> bool:
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+
+class SortedIndex:
+    """
+    Row positions of a column sorted by value, so equality, `in` and range predicates are
+    binary searches instead of full scans. Nulls and NaNs are not indexed and never match,
+    as with the comparison kernels.
+    """
+
+    def __init__(self, column: pa.ChunkedArray):
+        self.type = column.type
+        # NaNs are sorted after all numbers, then nulls last
+        order = pc.sort_indices(column)
+        valid = len(column) - column.null_count
+        if pa.types.is_floating(column.type):
+            valid -= pc.sum(pc.is_nan(column)).as_py() or 0
+        self.positions = order.to_numpy()[:valid]
+        self.values = pc.take(column, order).slice(0, valid).to_numpy(zero_copy_only=False)
+
+    @staticmethod
+    def supports(data_type: pa.DataType) -> bool:
+        return is_numeric(data_type) or pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+    def lookup(self, operator: str, value: Any) -> np.ndarray:
+        if operator == "in":
+            return np.concatenate([self.lookup("==", v) for v in value] or [np.empty(0, dtype=self.positions.dtype)])
+        value = to_scalar(value, self.type).as_py()
+        start, end = 0, len(self.values)
+        if operator in ("==", ">="):
+            start = np.searchsorted(self.values, value, side="left")
+        elif operator == ">":
+            start = np.searchsorted(self.values, value, side="right")
+        if operator in ("==", "<="):
+            end = np.searchsorted(self.values, value, side="right")
+        elif operator == "<":
+            end = np.searchsorted(self.values, value, side="left")
+        return self.positions[start:end]
+
+
+class FilterEngine:
+    """
+    Compiles all get_raw_data predicates into one boolean mask over the Arrow table (no pandas
+    copy), and keeps the filtered result as a dataset whose handle is derived from the parent
+    handle and the filters, so paging through the same subset filters once.
+
+    Tables with at least `index_min_rows` rows get a sorted index on each filtered column,
+    built on first use and kept for the `index_cache_size` most recent columns.
+    """
+
+    INDEXED_OPERATORS = ("==", "in", ">", ">=", "<", "<=")
+
+    def __init__(self, registry: DatasetRegistry, index_min_rows: int = 100_000, index_cache_size: int = 16):
+        self.registry = registry
+        self.index_min_rows = index_min_rows
+        self.index_cache_size = index_cache_size
+        self._indexes: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_index(self, handle: str, column: str) -> SortedIndex:
+        key = (handle, column)
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        index = SortedIndex(self.registry.get_table(handle).column(column))
+        with self._lock:
+            self._indexes[key] = index
+            if len(self._indexes) > self.index_cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def compile(self, handle: str, filters: Dict[str, Any]) -> pa.ChunkedArray | pa.Array:
+        table = self.registry.get_table(handle)
+        mask = None
+        for column, operator, value in parse_filters(filters):
+            if column not in table.column_names:
+                raise KeyError(f"Unknown column: {column}")
+            values = table.column(column)
+            if (operator in self.INDEXED_OPERATORS and table.num_rows >= self.index_min_rows
+                    and SortedIndex.supports(values.type)):
+                selected = np.zeros(table.num_rows, dtype=bool)
+                selected[self.get_index(handle, column).lookup(operator, value)] = True
+                predicate = pa.array(selected)
+            elif operator in ("in", "not_in"):
+                scalars = [to_scalar(v, values.type) for v in value]
+                if any(scalar.type != values.type for scalar in scalars):
+                    # a fractional value on an integer column, compared as floats
+                    values = pc.cast(values, pa.float64())
+                value_set = pa.array([scalar.as_py() for scalar in scalars], type=values.type)
+                predicate = pc.is_in(values, value_set=value_set)
+                if operator == "not_in":
+                    # missing values match neither "in" nor "not_in"
+                    predicate = pc.and_(pc.invert(predicate), pc.is_valid(values))
+            else:
+                predicate = COMPARISONS[operator](values, to_scalar(value, values.type))
+            # rows where a predicate is null (missing values) are dropped by Table.filter
+            mask = predicate if mask is None else pc.and_(mask, predicate)
+        return mask
+
+    def apply(self, handle: str, filters: Dict[str, Any]) -> str:
+        """
+        Returns the handle of the rows of `handle` matching all filters.
+        """
+        filtered = get_derived_handle(handle, filters)
+        if self.registry.exists(filtered):
+            return filtered
+        table = self.registry.get_table(handle)
+        return self.registry.register_table(table.filter(self.compile(handle, filters)), handle=filtered)
+
+
+def get_page(table: pa.Table, offset: int = 0, limit: int | None = None) -> dict:
+    # only the requested slice is converted to python rows
+    rows = table.slice(offset, limit) if limit is not None else table.slice(offset)
+    next_offset = offset + rows.num_rows
+    return {
+        "offset": offset,
+        "next_offset": next_offset if next_offset < table.num_rows else None,
+        "data": to_records(rows.to_pandas()),
+    }
+
+
+### Dataset comparison ###
+ROW_KEY = "__row__"
+
+
+def to_comparison_side(table: pa.Table, key: str | None, columns: List[str], marker: str) -> pa.Table:
+    # only the key and compared columns take part in the join, plus a marker of the side
+    if key is None:
+        table = table.append_column(ROW_KEY, pa.array(np.arange(table.num_rows)))
+    key = key or ROW_KEY
+    missing = [column for column in [key, *columns] if column not in table.column_names]
+    if missing:
+        raise KeyError(f"Unknown column(s): {missing}")
+    if pc.count_distinct(table.column(key), mode="all").as_py() != table.num_rows:
+        raise ValueError(f"Key column '{key}' has duplicate values")
+    table = table.select([key, *columns]).rename_columns([key, *(f"{column}_{marker}" for column in columns)])
+    return table.append_column(marker, pa.array(np.ones(table.num_rows, dtype=bool)))
+
+
+def compare_tables(left: pa.Table, right: pa.Table, columns: List[str], key: str | None = None,
+                   details: bool = False) -> Tuple[dict, pa.Table | None]:
+    """
+    Aligns the two tables on `key` (row position when None) with one Arrow hash join over the
+    key and compared columns only, then compares every column with vectorized kernels. Missing
+    values on both sides count as equal.
+
+    Returns a summary (matched / unmatched rows, changed rows per column, numeric deltas) and,
+    with `details`, a table of the differing rows sorted by key with a `status` column
+    ("changed", "only_in_self", "only_in_other").
+    """
+    columns = [column for column in columns if column != key]
+    joined = to_comparison_side(left, key, columns, "self").join(
+        to_comparison_side(right, key, columns, "other"), keys=key or ROW_KEY, join_type="full outer"
+    )
+    in_self, in_other = pc.is_valid(joined.column("self")), pc.is_valid(joined.column("other"))
+    matched = pc.and_(in_self, in_other)
+
+    summary = {
+        "key": key,
+        "rows_self": left.num_rows,
+        "rows_other": right.num_rows,
+        "matched_rows": pc.sum(matched).as_py() or 0,
+        "only_in_self": pc.sum(pc.invert(in_other)).as_py() or 0,
+        "only_in_other": pc.sum(pc.invert(in_self)).as_py() or 0,
+        "columns": {},
+    }
+    any_changed = pa.array(np.zeros(joined.num_rows, dtype=bool))
+    for column in columns:
+        before, after = joined.column(f"{column}_self"), joined.column(f"{column}_other")
+        equal = pc.or_(pc.fill_null(pc.equal(before, after), False), pc.and_(pc.is_null(before), pc.is_null(after)))
+        changed = pc.and_(matched, pc.invert(equal))
+        any_changed = pc.or_(any_changed, changed)
+        column_summary = {"changed_rows": pc.sum(changed).as_py() or 0}
+        if pa.types.is_integer(before.type) or pa.types.is_floating(before.type):
+            deltas = pc.drop_null(pc.filter(pc.subtract(after, before), changed))
+            if len(deltas):
+                column_summary.update({
+                    "mean_delta": pc.mean(deltas).as_py(),
+                    "total_delta": pc.sum(deltas).as_py(),
+                    "max_abs_delta": pc.max(pc.abs(deltas)).as_py(),
+                })
+        summary["columns"][column] = column_summary
+    summary["changed_rows"] = pc.sum(any_changed).as_py() or 0
+
+    if not details:
+        return summary, None
+    status = pc.if_else(pc.invert(in_other), "only_in_self", pc.if_else(pc.invert(in_self), "only_in_other", "changed"))
+    differences = joined.append_column("status", status).filter(pc.or_(any_changed, pc.invert(matched)))
+    differences = differences.drop_columns(["self", "other"]).sort_by(key or ROW_KEY)
+    if key is None:
+        differences = differences.rename_columns(["row" if name == ROW_KEY else name for name in differences.column_names])
+    return summary, differences
+
+
+### Statistics ###
+# metrics computed by one pandas aggregation, quantiles are named "median" or "p<percent>" (e.g. "p95")
+AGGREGATE_METRICS = ["mean", "std", "min", "max", "count"]
+
+
+def get_quantile(metric: str) -> float | None:
+    if metric == "median":
+        return 0.5
+    if metric.startswith("p"):
+        try:
+            percent = float(metric[1:])
+        except ValueError:
+            return None
+        if 0 <= percent <= 100:
+            return percent / 100
+    return None
+
+
+def get_unknown_metrics(metrics: List[str]) -> List[str]:
+    return [m for m in metrics if m not in AGGREGATE_METRICS and get_quantile(m) is None]
+
+
+def to_python(value):
+    # numpy scalars to plain python numbers for the JSON response
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def compute_column_statistics(dataset: pd.DataFrame, columns: List[str], metrics: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Computes every metric for every column with one `agg` call and one `quantile` call over
+    the selected columns, instead of one pass per column and metric.
+    """
+    frame = dataset[columns]
+    stats = {column: {} for column in columns}
+
+    aggregations = [m for m in metrics if m in AGGREGATE_METRICS]
+    if aggregations:
+        aggregated = frame.agg(aggregations)
+        for metric in aggregations:
+            for column in columns:
+                value = to_python(aggregated.at[metric, column])
+                # agg upcasts counts to float when mixed with the other metrics
+                stats[column][metric] = int(value) if metric == "count" else value
+
+    quantiles = {m: get_quantile(m) for m in metrics if m not in AGGREGATE_METRICS}
+    if quantiles:
+        values = frame.quantile(sorted(set(quantiles.values())))
+        for metric, q in quantiles.items():
+            for column in columns:
+                stats[column][metric] = to_python(values.at[q, column])
+    return stats
+
+
+class StatisticsCache:
+    """
+    Thread-safe LRU cache of single metric values keyed by (dataset handle, column, metric).
+    Handles never change content, so entries never go stale.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, handle: str, columns: List[str], metrics: List[str]) -> Dict[str, Dict[str, float]]:
+        # cached values only, columns / metrics that are missing are left out
+        stats = {}
+        with self._lock:
+            for column in columns:
+                for metric in metrics:
+                    key = (handle, column, metric)
+                    if key in self._data:
+                        self._data.move_to_end(key)
+                        stats.setdefault(column, {})[metric] = self._data[key]
+        return stats
+
+    def put_many(self, handle: str, stats: Dict[str, Dict[str, float]]):
+        with self._lock:
+            for column, values in stats.items():
+                for metric, value in values.items():
+                    self._data[(handle, column, metric)] = value
+                    self._data.move_to_end((handle, column, metric))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+### Out-of-core statistics ###
+class ColumnSummary:
+    """
+    Moments and quantile sketch of one column, built from record batches.
+    """
+
+    def __init__(self, compression: int = 200):
+        self.moments = RunningMoments()
+        self.digest = TDigest(compression)
+
+    def update(self, values: np.ndarray):
+        self.moments.update(values)
+        self.digest.update(values)
+
+    def merge(self, other: "ColumnSummary") -> "ColumnSummary":
+        self.moments.merge(other.moments)
+        self.digest.merge(other.digest)
+        return self
+
+    def get(self, metric: str) -> float:
+        if metric == "count":
+            return self.moments.count
+        if not self.moments.count:
+            return float("nan")
+        if metric == "mean":
+            return self.moments.mean
+        if metric == "std":
+            return self.moments.std()
+        if metric == "min":
+            return self.moments.min
+        if metric == "max":
+            return self.moments.max
+        q = get_quantile(metric)
+        if q is None:
+            raise ValueError(f"Unknown metric: {metric}")
+        return self.digest.quantile(q)
+
+
+def get_column_values(batch: pa.RecordBatch, column: str) -> np.ndarray:
+    # numeric values of the column without nulls / NaN, as float64
+    values = batch.column(column).to_numpy(zero_copy_only=False).astype(float)
+    return values[~np.isnan(values)]
+
+
+def iter_batch_groups(table: pa.Table, batch_rows: int, max_workers: int) -> Iterator[List[pa.RecordBatch]]:
+    # groups of batches processed concurrently, so only max_workers batches are materialized at once
+    group = []
+    for batch in table.to_batches(batch_rows):
+        group.append(batch)
+        if len(group) == max_workers:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def summarize_columns(table: pa.Table, columns: List[str], batch_rows: int = 65536, max_workers: int = 1,
+                      compression: int = 200) -> Dict[str, ColumnSummary]:
+    """
+    One streaming pass over the table computing count, mean, std, min, max and a t-digest per
+    column. Batches are summarized in parallel threads (numpy releases the GIL) and merged.
+    """
+    missing = [column for column in columns if column not in table.column_names]
+    if missing:
+        raise KeyError(f"Unknown column(s): {missing}")
+
+    def summarize_batch(batch: pa.RecordBatch) -> Dict[str, ColumnSummary]:
+        summaries = {column: ColumnSummary(compression) for column in columns}
+        for column in columns:
+            summaries[column].update(get_column_values(batch, column))
+        return summaries
+
+    summaries = {column: ColumnSummary(compression) for column in columns}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for group in iter_batch_groups(table, batch_rows, max_workers):
+            for partial in executor.map(summarize_batch, group):
+                for column in columns:
+                    summaries[column].merge(partial[column])
+    return summaries
+
+
+def find_outliers(table: pa.Table, columns: List[str], method: str = "z_score", threshold: float = 2.0,
+                  batch_rows: int = 65536, max_workers: int = 1, compression: int = 200) -> Dict[str, list]:
+    """
+    Two streaming passes: the first computes mean / std (z_score) or Q1 / Q3 (iqr) per column,
+    the second collects the values outside the bounds, in row order.
+    """
+    if method not in ("z_score", "iqr"):
+        raise ValueError(f"Unknown outlier detection method: {method}")
+    summaries = summarize_columns(table, columns, batch_rows, max_workers, compression)
+
+    bounds = {}
+    for column, summary in summaries.items():
+        if method == "z_score":
+            mean, std = summary.moments.mean, summary.moments.std()
+            bounds[column] = (mean - threshold * std, mean + threshold * std)
+        else:
+            q1, q3 = summary.digest.quantile(0.25), summary.digest.quantile(0.75)
+            iqr = q3 - q1
+            bounds[column] = (q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+
+    outliers = {column: [] for column in columns}
+    for batch in table.to_batches(batch_rows):
+        for column in columns:
+            values = batch.column(column)
+            lower, upper = bounds[column]
+            # nulls and NaN never match, values keep their column type
+            mask = pc.or_(pc.less(values, lower), pc.greater(values, upper))
+            outliers[column].extend(pc.filter(values, mask).to_pylist())
+    return outliers
@@ -3,14 +3,37 @@ from groq import Groq
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
+import asyncio
+import hashlib
 import logging
 import json
 import os
+import weakref
 from typing import List, Optional, Dict, Union
 
-from src.llm_client import get_groq_client
+from src.llm_client import get_async_groq_client
+from src.mcp_servers.data_analysis.helpers import (
+    PLOT_TYPES,
+    DatasetRegistry,
+    FilterEngine,
+    ImageEncoder,
+    ImageFetcher,
+    PlotRenderer,
+    StatisticsCache,
+    TTLCache,
+    compare_tables,
+    compute_column_statistics,
+    find_outliers,
+    get_content_hash,
+    get_derived_handle,
+    get_page,
+    get_unknown_metrics,
+    min_max_normalize,
+    summarize_columns,
+    to_records,
+)
+from src.utils import load_config
 
 logging.basicConfig(
     filename='logs/data_analysis.log',
@@ -19,8 +42,103 @@ logging.basicConfig(
 )
 logger = logging.getLogger("DataAnalysisMCPServer")
 
-groq_client = get_groq_client()
-VISUAL_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+data_config = load_config("config.yaml", section="data_analysis")
+vision_config = data_config.get("vision", {})
+VISUAL_MODEL = vision_config.get("model", "meta-llama/llama-4-scout-17b-16e-instruct")
+# datasets live server-side, tools exchange handles returned by load_dataset
+registry = DatasetRegistry(
+    data_config.get("registry_dir", "./output/datasets"),
+    frame_cache_size=data_config.get("frame_cache_size", 8),
+    batch_rows=data_config.get("streaming", {}).get("batch_rows", 65536),
+)
+plot_config = data_config.get("plots", {})
+plot_renderer = PlotRenderer(
+    registry,
+    plot_config.get("output_dir", "plots"),
+    max_workers=plot_config.get("max_workers"),
+    cache_size=plot_config.get("cache_size", 32),
+    downsample=plot_config.get("downsample"),
+)
+filter_config = data_config.get("filters", {})
+filter_engine = FilterEngine(
+    registry,
+    index_min_rows=filter_config.get("index_min_rows", 100_000),
+    index_cache_size=filter_config.get("index_cache_size", 16),
+)
+FilterValue = Union[str, int, float, bool]
+# compute_statistics results by (handle, column, metric)
+stats_cache = StatisticsCache(data_config.get("stats_cache_size", 4096))
+# compare_datasets summaries by datasets, columns and key
+comparison_cache = TTLCache(data_config.get("comparison_cache_size", 64), ttl=None)
+streaming_config = data_config.get("streaming", {})
+streaming_kwargs = {
+    "batch_rows": streaming_config.get("batch_rows", 65536),
+    "max_workers": streaming_config.get("max_workers", 4),
+    "compression": streaming_config.get("compression", 200),
+}
+
+
+_vision_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_vision_semaphore() -> asyncio.Semaphore:
+    # one per event loop, a semaphore cannot be shared between loops
+    loop = asyncio.get_running_loop()
+    if loop not in _vision_semaphores:
+        _vision_semaphores[loop] = asyncio.Semaphore(vision_config.get("max_concurrency", 4))
+    return _vision_semaphores[loop]
+
+
+async def call_vision_model(content: List[dict], **kwargs) -> str:
+    """
+    Sends one user message to the vision model with the async Groq client, so the event loop
+    keeps serving other tools. At most vision.max_concurrency calls are in flight.
+    """
+    async with get_vision_semaphore():
+        completion = await get_async_groq_client().chat.completions.create(
+            model=VISUAL_MODEL,
+            messages=[{"role": "user", "content": content}],
+            timeout=vision_config.get("timeout", 60),
+            **kwargs,
+        )
+    return completion.choices[0].message.content
+
+
+# extract_chart_data results by image content and request parameters
+chart_cache = TTLCache(vision_config.get("cache_size", 256), vision_config.get("cache_ttl", 3600))
+image_fetcher = ImageFetcher(
+    timeout=vision_config.get("timeout", 60),
+    max_bytes=int(vision_config.get("max_image_mb", 20) * 1024 * 1024),
+    allow_private_hosts=vision_config.get("allow_private_hosts", False),
+)
+
+
+async def get_image_hash(img_url: str) -> str:
+    try:
+        return get_content_hash(await image_fetcher.fetch(img_url))
+    except Exception as e:
+        # unsupported scheme, non-public host, too large or unreachable here (the model may still reach it):
+        # fall back to the url
+        logger.warning(f"Could not fetch {img_url[:100]} for the chart cache: {str(e)}")
+        return get_content_hash(img_url.encode("utf-8"))
+
+
+image_config = vision_config.get("images", {})
+image_encoder = ImageEncoder(
+    max_side=image_config.get("max_side", 1024),
+    image_format=image_config.get("format", "jpeg"),
+    quality=image_config.get("quality", 85),
+    cache_size=image_config.get("cache_size", 64),
+)
+
+
+def encode_plot(path: str) -> dict:
+    return image_encoder.encode(plot_renderer.read(path))
+
+
+def use_streaming(handle: str) -> bool:
+    # datasets above the limit are processed batch by batch instead of as one DataFrame
+    return registry.get_table(handle).nbytes > streaming_config.get("max_in_memory_mb", 512) * 1024 * 1024
 
 
 def create_mcp_server():
@@ -29,24 +147,50 @@ def create_mcp_server():
     )
 
     @mcp.tool
-    def get_raw_data(dataset: pd.DataFrame, filters: Optional[Dict[str, Union[str, int]]] = None) -> Union[pd.DataFrame|str]:
+    def load_dataset(path: str) -> dict:
         """
-        Returns the raw dataset or a filtered subset for analysis.
+        Loads a dataset file (.csv, .parquet, .json, .jsonl, .arrow) for analysis.
 
         Args:
-            filters (dict, optional): Filtering conditions. Example: {"country": "Philippines", "year": 2024}
-        
+            path (str): Path of the dataset file.
+
         Returns:
-            DataFrame: The raw or filtered dataset.
+            dict: The dataset handle to pass to the other tools, with its row count and column types.
         """
         try:
-            data = dataset.copy()
+            return registry.describe(registry.load(path))
+
+        except Exception as e:
+            logger.error(f"Error in load_dataset: {str(e)}")
+            return {"error": "Dataset loading failed", "details": str(e)}
+
+
+    @mcp.tool
+    def get_raw_data(
+        dataset: str,
+        filters: Optional[Dict[str, Union[FilterValue, List[FilterValue], Dict[str, Union[FilterValue, List[FilterValue]]]]]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Union[dict, str]:
+        """
+        Returns the raw dataset or a filtered subset for analysis, one page of rows at a time.
 
-            if filters:
-                for col, value in filters.items():
-                    data = data[data[col] == value]
+        Args:
+            dataset (str): Handle of the dataset, as returned by load_dataset.
+            filters (dict, optional): Filtering conditions, all of which must match. A value means equality, a list
+                                      means "in", and a dict maps operators ("==", "!=", ">", ">=", "<", "<=", "in", "not_in")
+                                      to values. Example: {"country": ["Philippines", "Japan"], "year": {">=": 2020, "<": 2024}}
+            offset (int): Index of the first row to return.
+            limit (int, optional): Maximum number of rows to return. Defaults to the server page size.
 
-            return data
+        Returns:
+            dict: The handle of the raw or filtered dataset, its total row count, the requested rows, and
+                  the offset of the next page (null on the last page).
+        """
+        try:
+            handle = filter_engine.apply(dataset, filters) if filters else dataset
+            limit = limit if limit is not None else filter_config.get("page_size", 1000)
+            return {**registry.describe(handle), **get_page(registry.get_table(handle), offset, limit)}
 
         except Exception as e:
             logger.error(f"Error in get_raw_data: {str(e)}")
@@ -54,19 +198,27 @@ def create_mcp_server():
 
 
     @mcp.tool
-    def clean_data(dataset: pd.DataFrame, method: str = "fillna") -> Union[pd.DataFrame|str]:
+    def clean_data(dataset: str, method: str = "fillna") -> Union[dict, str]:
         """
         Cleans the dataset by handling missing values and duplicates.
 
         Args:
-            dataset (DataFrame): The dataset to clean.
+            dataset (str): Handle of the dataset to clean.
             method (str): The cleaning or preprocessing method to apply.
                         Supported methods: 'fillna', 'normalize'
 
         Returns:
-            DataFrame: The cleaned dataset.
+            dict: The handle of the cleaned dataset, with its row count and column types.
         """
-        cleaned = dataset.copy()
+        # cleaning the same dataset the same way again reuses the stored result
+        cleaned_handle = get_derived_handle(dataset, "clean_data", method)
+        if registry.exists(cleaned_handle):
+            return registry.describe(cleaned_handle)
+        try:
+            cleaned = registry.get(dataset).copy()
+        except KeyError as e:
+            logger.error(f"Error in clean_data: {str(e)}")
+            return f"Error processing data: {str(e)}"
 
         if method == "fillna":
             cleaned = cleaned.ffill()
@@ -77,7 +229,7 @@ def create_mcp_server():
             logger.error(f"Unknown cleaning method: {method}")
             return f"Unknown cleaning method: {method}"
 
-        return cleaned
+        return registry.describe(registry.register(cleaned, handle=cleaned_handle))
 
 
     @mcp.tool
@@ -94,6 +246,13 @@ def create_mcp_server():
             dict: Extracted chart data in JSON format.
         """
         try:
+            # deterministic mode makes cached answers the ones the model would give again
+            temperature = 0 if vision_config.get("deterministic", False) else 0.7
+            key = json.dumps([await get_image_hash(img_url), chart_type, columns, VISUAL_MODEL, temperature])
+            cached = chart_cache.get(key)
+            if cached is not None:
+                return cached
+
             prompt = (
                     f"You are an expert data analyst specialized in interpreting chart images. "
                     f"Carefully examine the provided {chart_type} chart image and extract all available numeric data. "
@@ -106,25 +265,21 @@ def create_mcp_server():
                     f"Do not include explanations or extra text outside the JSON."
                 )
 
-            completion = groq_client.chat.completions.create(
-                model=VISUAL_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": img_url}}  # make sure the url is publicly accessible
-                        ]
-                    }
+            content = await call_vision_model(
+                [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": img_url}}  # make sure the url is publicly accessible
                 ],
-                temperature=0.7,
+                temperature=temperature,
                 max_completion_tokens=512,
                 top_p=1,
                 response_format={"type": "json_object"},
                 stream=False,
                 stop=None,
             )
-            return completion.choices[0].message.content
+            chart_data = json.loads(content)
+            chart_cache.put(key, chart_data)
+            return chart_data
 
         except Exception as e:
             logger.error(f"Error in extract_chart_data: {str(e)}")
@@ -132,67 +287,74 @@ def create_mcp_server():
 
 
     @mcp.tool
-    def compute_statistics(dataset: pd.DataFrame, columns: List[str], metrics: List[str]) -> dict:
+    def compute_statistics(dataset: str, columns: List[str], metrics: List[str]) -> dict:
         """
-        Computes the mean, median, and std of specified columns.
+        Computes summary statistics of specified columns.
 
         Args:
-            dataset (DataFrame): The dataset to analyze.
+            dataset (str): Handle of the dataset to analyze.
             columns (List[str]): List of columns to compute statistics for.
-            metrics (List[str]): List of metrics to compute. Possible values are ["mean", "median", "std"].
+            metrics (List[str]): List of metrics to compute. Possible values are ["mean", "median", "std", "min", "max", "count"]
+                                 and percentiles written as "p<percent>", e.g. "p25" or "p95".
 
         Returns:
             dict: A dictionary containing the computed statistics.
         """
-        stats = {}
+        unknown_metrics = get_unknown_metrics(metrics)
+        if unknown_metrics:
+            logger.error(f"Unknown metric(s): {unknown_metrics}")
+            return {"error": f"Unknown metric(s): {unknown_metrics}"}
+
         try:
-            for col in columns:
-                stats[col] = {}
-                if "mean" in metrics:
-                    stats[col]["mean"] = dataset[col].mean()
-                if "median" in metrics:
-                    stats[col]["median"] = dataset[col].median()
-                if "std" in metrics:
-                    stats[col]["std"] = dataset[col].std()
-
-                unknown_metrics = [m for m in metrics if m not in ["mean", "median", "std"]]
-                if unknown_metrics:
-                    logger.error(f"Unknown metric(s): {unknown_metrics}")
-                    return {"error": f"Unknown metric(s): {unknown_metrics}"}
+            stats = stats_cache.get_many(dataset, columns, metrics)
+            missing_columns = [col for col in columns if len(stats.get(col, {})) < len(set(metrics))]
+            if missing_columns:
+                missing_metrics = sorted({m for col in missing_columns for m in metrics if m not in stats.get(col, {})})
+                if use_streaming(dataset):
+                    summaries = summarize_columns(registry.get_table(dataset), missing_columns, **streaming_kwargs)
+                    computed = {col: {m: summaries[col].get(m) for m in missing_metrics} for col in missing_columns}
+                else:
+                    computed = compute_column_statistics(registry.get(dataset), missing_columns, missing_metrics)
+                stats_cache.put_many(dataset, computed)
+                for col, values in computed.items():
+                    stats.setdefault(col, {}).update(values)
 
         except Exception as e:
             logger.error(f"Error computing statistics: {str(e)}")
             return {"error": "Statistics computation failed", "details": {str(e)}}
 
-        return stats
+        return {col: {metric: stats[col][metric] for metric in metrics} for col in columns}
 
 
     @mcp.tool
-    def visualize_data(dataset: pd.DataFrame, x_axis: str, y_axis: List[str], plot_type: str) -> str:
+    async def visualize_data(dataset: str, x_axis: str, y_axis: List[str], plot_type: str) -> Union[dict, str]:
         """
         Generates a chart visualization (bar, line, scatter) from the dataset.
         If plot type is "scatter", the y_axis should be a single column.
+        Large datasets are downsampled: line charts keep the points that preserve their shape,
+        scatter plots become hexbin density plots, and bar charts show the largest bars.
 
         Args:
-            dataset (DataFrame): The dataset to visualize.
+            dataset (str): Handle of the dataset to visualize.
             x_axis (str): The column to use for the x-axis.
             y_axis (List[str]): List of columns to use for the y-axis.
             plot_type (str): Type of plot to create. Possible values are ["bar", "line", "scatter"].
 
         Returns:
-            str: The path to the generated image.
+            dict: The path to the generated image, its size, and the rows plotted.
         """
-        if plot_type not in ["bar", "line", "scatter"]:
+        if plot_type not in PLOT_TYPES:
             logger.error(f"Unknown plot type: {plot_type}")
             return f"Unknown plot type: {plot_type}"
         
         try:
-            # Ensure the 'plots' directory exists
-            os.makedirs("plots", exist_ok=True)
-            dataset.plot(kind=plot_type, x=x_axis, y=y_axis, title=f"{plot_type.capitalize()} Plot")
-            plt.savefig(f"plots/{plot_type}_plot.png", bbox_inches='tight')
-            plt.close()
-            return f"plots/{plot_type}_plot.png"
+            report = await plot_renderer.render(dataset, x_axis, y_axis, plot_type)
+            if not report["cached"]:
+                logger.info(
+                    f"Rendered {report['path']}: {report['plotted_rows']}/{report['rows']} rows "
+                    f"({report['downsampling'] or 'no downsampling'}), {report['size_bytes']} bytes in {report['render_seconds']}s"
+                )
+            return report
 
         except Exception as e:
             logger.error(f"Error in visualize_data: {str(e)}")
@@ -200,12 +362,12 @@ def create_mcp_server():
 
 
     @mcp.tool
-    async def generate_report(dataset: pd.DataFrame, stats: dict, plots: List[str]) -> str:
+    async def generate_report(dataset: str, stats: dict, plots: List[str]) -> str:
         """
         Generates a summary report based on the dataset and analysis results.
 
         Args:
-            dataset (DataFrame): The dataset to analyze.
+            dataset (str): Handle of the dataset to analyze.
             stats (dict): Computed statistics from the dataset.
             plots (List[str]): List of plot image paths to include in the report.
 
@@ -213,10 +375,12 @@ def create_mcp_server():
             str: A textual summary report.
         """
         try:
+            # the preview and the image encoding read from disk, keep them off the event loop
+            preview = await asyncio.to_thread(lambda: registry.get_table(dataset).slice(0, 10).to_pandas().to_string(index=False))
             prompt = (
                 "You are a data analyst. Write a clear, insightful summary based on the dataset, statistics, and plots below.\n\n"
                 "### Dataset Preview\n"
-                f"{dataset.head(10).to_string(index=False)}\n\n"
+                f"{preview}\n\n"
                 "### Statistics\n"
                 f"{json.dumps(stats, indent=2)}\n\n"
                 "### Notes\n"
@@ -225,33 +389,32 @@ def create_mcp_server():
                 "- Keep it concise, professional, and easy to read.\n\n"
             )
 
-            base64_images = [encode_image(plot) for plot in plots]
+            images = await asyncio.gather(*(asyncio.to_thread(encode_plot, plot) for plot in plots))
+            if images:
+                original_bytes = sum(image["original_bytes"] for image in images)
+                encoded_bytes = sum(image["encoded_bytes"] for image in images)
+                logger.info(
+                    f"generate_report images: {encoded_bytes} bytes instead of {original_bytes} "
+                    f"({original_bytes - encoded_bytes} bytes saved)"
+                )
 
             content = [{"type": "text", "text": prompt}]
-            for b64_img in base64_images:
+            for image in images:
                 content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{b64_img}"
+                        "url": image["url"]
                     }
                 })
 
-            completion = groq_client.chat.completions.create(
-                model=VISUAL_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": content
-                    }
-                ],
+            return await call_vision_model(
+                content,
                 temperature=0.7,
                 max_completion_tokens=512,
                 top_p=1,
                 stream=False,
                 stop=None,
             )
-            
-            return completion.choices[0].message.content
 
         except Exception as e:
             logger.error(f"Error in generate_report: {str(e)}")
@@ -259,12 +422,12 @@ def create_mcp_server():
         
 
     @mcp.tool
-    def detect_outliers(dataset: pd.DataFrame, columns: List[str], method: str = "z_score") -> dict:
+    def detect_outliers(dataset: str, columns: List[str], method: str = "z_score") -> dict:
         """
         Identifies outliers in a dataset.
 
         Args:
-            dataset (DataFrame): The dataset to analyze.
+            dataset (str): Handle of the dataset to analyze.
             columns (List[str]): List of columns to check for outliers.
             method (str): Method to use for outlier detection. Possible values are ["z_score", "iqr"].
 
@@ -273,6 +436,10 @@ def create_mcp_server():
         """
         outliers = {}
         try:
+            if use_streaming(dataset):
+                return find_outliers(registry.get_table(dataset), columns, method, threshold=2.0, **streaming_kwargs)
+
+            dataset = registry.get(dataset)
             for col in columns:
                 if method == "z_score":
                     threshold = 2.0
@@ -298,28 +465,55 @@ def create_mcp_server():
 
 
     @mcp.tool
-    def compare_datasets(dataset1: pd.DataFrame, dataset2: pd.DataFrame, columns: List[str]) -> dict:
+    def compare_datasets(
+        dataset1: str,
+        dataset2: str,
+        columns: List[str],
+        key: Optional[str] = None,
+        details: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> dict:
         """
         Compares two datasets and highlights differences in specified columns.
 
         Args:
-            dataset1 (DataFrame): The first dataset.
-            dataset2 (DataFrame): The second dataset.
+            dataset1 (str): Handle of the first dataset.
+            dataset2 (str): Handle of the second dataset.
             columns (List[str]): List of columns to compare.
+            key (str, optional): Column identifying the same record in both datasets. Rows are matched by position if not given.
+            details (bool): Also return the differing rows, one page at a time.
+            offset (int): Index of the first differing row to return when details is true.
+            limit (int, optional): Maximum number of differing rows to return. Defaults to the server page size.
 
         Returns:
-            dict: A dictionary highlighting differences for each specified column.
+            dict: Matched and unmatched row counts, and per column the number of changed rows and, for numeric
+                  columns, the mean, total and largest absolute change. With details, the handle of the
+                  differing rows and the requested page of them.
         """
-        differences = {}
         try:
-            for col in columns:
-                diffs = dataset1[col].compare(dataset2[col])
-                differences[col] = diffs.to_dict()
+            # handles never change content, so the same inputs always give the same comparison:
+            # the summary is cached and the differences stored once, later pages skip the join
+            key_hash = hashlib.sha256(json.dumps(["compare", dataset1, dataset2, columns, key]).encode("utf-8")).hexdigest()
+            handle = "ds_" + key_hash[:16]
+            summary = comparison_cache.get(key_hash)
+            if summary is None or (details and not registry.exists(handle)):
+                summary, differences = compare_tables(
+                    registry.get_table(dataset1), registry.get_table(dataset2), columns, key=key, details=details
+                )
+                comparison_cache.put(key_hash, summary)
+                if details:
+                    registry.register_table(differences, handle=handle)
+
+            result = dict(summary)
+            if details:
+                limit = limit if limit is not None else filter_config.get("page_size", 1000)
+                result["details"] = {"handle": handle, **get_page(registry.get_table(handle), offset, limit)}
 
         except Exception as e:
             logger.error(f"Error comparing datasets: {str(e)}")
             return {"error": "Dataset comparison failed", "details": {str(e)}}
 
-        return differences
+        return result
     
     return mcp
\ No newline at end of file
@@ -0,0 +1,425 @@
+import asyncio
+import base64
+import io
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.mcp_servers.data_analysis.helpers import (
+    DatasetRegistry,
+    FilterEngine,
+    ImageEncoder,
+    ImageFetcher,
+    PlotRenderer,
+    StatisticsCache,
+    TTLCache,
+    compare_tables,
+    compute_column_statistics,
+    downsample_plot_data,
+    find_outliers,
+    get_content_hash,
+    get_page,
+    get_unknown_metrics,
+    preprocess_image,
+    render_plot,
+    summarize_columns,
+    to_records,
+)
+
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({"country": ["PH", "US", "PH"], "sales": [10.0, None, 30.0]}).to_csv(path, index=False)
+    return str(path)
+
+
+class TestDatasetRegistry:
+    def test_load_returns_stable_handle(self, tmp_path, dataset_path):
+        """Test that loading the same unchanged file twice gives the same handle."""
+        registry = DatasetRegistry(str(tmp_path / "registry"))
+        handle = registry.load(dataset_path)
+        assert registry.load(dataset_path) == handle
+        assert registry.describe(handle) == {"handle": handle, "rows": 3, "columns": {"country": "string", "sales": "double"}}
+
+    def test_handles_survive_restart(self, tmp_path, dataset_path):
+        """Test that a new registry on the same storage directory reopens existing handles."""
+        handle = DatasetRegistry(str(tmp_path / "registry")).load(dataset_path)
+        dataset = DatasetRegistry(str(tmp_path / "registry")).get(handle)
+        assert dataset["country"].tolist() == ["PH", "US", "PH"]
+
+    def test_register_derived_dataset(self, tmp_path, dataset_path):
+        registry = DatasetRegistry(str(tmp_path / "registry"))
+        dataset = registry.get(registry.load(dataset_path))
+        handle = registry.register(dataset[dataset["country"] == "PH"])
+        assert registry.get(handle)["sales"].tolist() == [10.0, 30.0]
+
+    def test_unknown_handle(self, tmp_path):
+        with pytest.raises(KeyError):
+            DatasetRegistry(str(tmp_path)).get("ds_missing")
+
+    def test_unsupported_format(self, tmp_path):
+        path = tmp_path / "data.xml"
+        path.write_text("<rows/>")
+        with pytest.raises(ValueError):
+            DatasetRegistry(str(tmp_path / "registry")).load(str(path))
+
+
+def test_to_records_replaces_missing_values():
+    assert to_records(pd.DataFrame({"a": [1.0, None]})) == [{"a": 1.0}, {"a": None}]
+
+
+class TestStreamingStatistics:
+    def make_table(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(0, 1, 5000)
+        values[[10, 2000]] = [25.0, -30.0]
+        return pa.table({"x": values, "n": pa.array([None if i % 7 == 0 else i for i in range(5000)])})
+
+    def test_summarize_columns_matches_pandas(self):
+        table = self.make_table()
+        dataset = table.to_pandas()
+        summaries = summarize_columns(table, ["x", "n"], batch_rows=512, max_workers=3)
+        for column in ["x", "n"]:
+            assert np.isclose(summaries[column].get("mean"), dataset[column].mean())
+            assert np.isclose(summaries[column].get("std"), dataset[column].std())
+            assert abs(summaries[column].get("median") - dataset[column].median()) < 0.01 * dataset[column].std()
+
+    def test_find_outliers_z_score(self):
+        table = self.make_table()
+        dataset = table.to_pandas()
+        expected = dataset[np.abs((dataset["x"] - dataset["x"].mean()) / dataset["x"].std()) > 3.0]["x"].tolist()
+        assert find_outliers(table, ["x"], "z_score", threshold=3.0, batch_rows=512) == {"x": expected}
+
+    def test_find_outliers_iqr_keeps_extremes(self):
+        outliers = find_outliers(self.make_table(), ["x"], "iqr", batch_rows=512)["x"]
+        assert 25.0 in outliers and -30.0 in outliers
+
+    def test_unknown_column(self):
+        with pytest.raises(KeyError):
+            summarize_columns(self.make_table(), ["missing"])
+
+
+class TestComputeStatistics:
+    def test_matches_pandas(self):
+        dataset = pd.DataFrame({"a": [1.0, 2.0, None, 4.0], "b": [10, 20, 30, 40]})
+        stats = compute_column_statistics(dataset, ["a", "b"], ["mean", "median", "std", "min", "max", "count", "p90"])
+        for column in ["a", "b"]:
+            assert stats[column]["mean"] == dataset[column].mean()
+            assert stats[column]["median"] == dataset[column].median()
+            assert stats[column]["std"] == dataset[column].std()
+            assert stats[column]["count"] == dataset[column].count() and isinstance(stats[column]["count"], int)
+            assert stats[column]["p90"] == dataset[column].quantile(0.9)
+        assert (stats["b"]["min"], stats["b"]["max"]) == (10, 40)
+
+    def test_unknown_metrics(self):
+        assert get_unknown_metrics(["mean", "p95", "p101", "mode", "pxx"]) == ["p101", "mode", "pxx"]
+
+    def test_streaming_summary_metrics(self):
+        table = pa.table({"x": [3.0, 1.0, None, 2.0]})
+        summary = summarize_columns(table, ["x"], batch_rows=2)["x"]
+        assert [summary.get(m) for m in ["count", "min", "max", "median", "p50"]] == [3, 1.0, 3.0, 2.0, 2.0]
+
+    def test_cache_returns_only_cached_values(self):
+        cache = StatisticsCache(maxsize=2)
+        cache.put_many("ds_1", {"a": {"mean": 1.0, "max": 3.0}, "b": {"mean": 5.0}})
+        assert len(cache) == 2
+        assert cache.get_many("ds_1", ["a", "b"], ["mean", "max"]) == {"a": {"max": 3.0}, "b": {"mean": 5.0}}
+        assert cache.get_many("ds_2", ["a"], ["max"]) == {}
+
+
+class TestFilterEngine:
+    FILTERS = [
+        {"country": "PH"},
+        {"country": ["PH", "JP"], "year": {">=": 2021}},
+        {"year": {">": 2020, "<=": 2023}, "sales": {"<": 50.0}},
+        {"country": {"not_in": ["PH"]}, "sales": {"!=": 20.0}},
+    ]
+
+    @pytest.fixture
+    def registry(self, tmp_path):
+        registry = DatasetRegistry(str(tmp_path / "registry"))
+        self.dataset = pd.DataFrame({
+            "country": ["PH", "US", "JP", "PH", None, "JP"],
+            "year": [2020, 2021, 2022, 2023, 2024, 2021],
+            "sales": [10.0, 20.0, None, 40.0, 50.0, 60.0],
+        })
+        self.handle = registry.register(self.dataset)
+        return registry
+
+    @pytest.mark.parametrize("index_min_rows", [0, 1_000_000])
+    def test_filters_match_pandas(self, registry, index_min_rows):
+        """Test that indexed and scanned filters both return the rows pandas would select."""
+        engine = FilterEngine(registry, index_min_rows=index_min_rows)
+        d = self.dataset
+        expected = [
+            d[d["country"] == "PH"],
+            d[d["country"].isin(["PH", "JP"]) & (d["year"] >= 2021)],
+            d[(d["year"] > 2020) & (d["year"] <= 2023) & (d["sales"] < 50.0)],
+            d[d["country"].notna() & ~d["country"].isin(["PH"]) & d["sales"].notna() & (d["sales"] != 20.0)],
+        ]
+        for filters, rows in zip(self.FILTERS, expected):
+            result = registry.get(engine.apply(self.handle, filters))
+            assert to_records(result) == to_records(rows.reset_index(drop=True))
+
+    @pytest.mark.parametrize("index_min_rows", [0, 1_000_000])
+    def test_nan_never_matches(self, registry, index_min_rows):
+        """Test that indexed and scanned range filters both skip NaN values."""
+        handle = registry.register_table(pa.table({"x": [float("nan"), 7.0, None, 3.0, 9.0, float("nan")]}))
+        engine = FilterEngine(registry, index_min_rows=index_min_rows)
+        for filters, expected in [({">": 5}, [7.0, 9.0]), ({"<=": 7}, [7.0, 3.0]), ({"==": 3}, [3.0])]:
+            result = registry.get_table(engine.apply(handle, {"x": filters}))
+            assert result.column("x").to_pylist() == expected
+
+    @pytest.mark.parametrize("index_min_rows", [0, 1_000_000])
+    def test_fractional_bound_on_integer_column(self, registry, index_min_rows):
+        engine = FilterEngine(registry, index_min_rows=index_min_rows)
+        d = self.dataset
+        for filters, rows in [({">=": 2021.5}, d[d["year"] >= 2021.5]), ({"<": 2021.5}, d[d["year"] < 2021.5]),
+                              ({"==": 2021.5}, d[d["year"] == 2021.5]), ({"in": [2021.5, 2022]}, d[d["year"] == 2022])]:
+            result = registry.get(engine.apply(self.handle, {"year": filters}))
+            assert to_records(result) == to_records(rows.reset_index(drop=True))
+
+    def test_same_filters_reuse_handle(self, registry):
+        engine = FilterEngine(registry)
+        assert engine.apply(self.handle, {"country": "PH"}) == engine.apply(self.handle, {"country": "PH"})
+
+    def test_invalid_filters(self, registry):
+        engine = FilterEngine(registry)
+        with pytest.raises(ValueError):
+            engine.apply(self.handle, {"year": {"~": 1}})
+        with pytest.raises(ValueError):
+            engine.apply(self.handle, {"year": "last year"})
+        with pytest.raises(KeyError):
+            engine.apply(self.handle, {"missing": 1})
+
+    def test_get_page(self, registry):
+        table = registry.get_table(self.handle)
+        page = get_page(table, offset=4, limit=3)
+        assert (page["offset"], page["next_offset"]) == (4, None)
+        assert [row["year"] for row in page["data"]] == [2024, 2021]
+        assert get_page(table, offset=0, limit=2)["next_offset"] == 2
+
+
+class TestDownsamplePlotData:
+    dataset = pd.DataFrame({"x": np.arange(1000), "a": np.sin(np.arange(1000) / 50), "b": np.arange(1000) % 7})
+
+    def test_line_uses_lttb(self):
+        plotted, kind, method = downsample_plot_data(self.dataset, "x", ["a", "b"], "line", line_max_points=100)
+        assert (kind, method) == ("line", "lttb")
+        assert 100 <= len(plotted) <= 200 and plotted["x"].is_monotonic_increasing
+
+    def test_scatter_uses_hexbin(self):
+        assert downsample_plot_data(self.dataset, "x", ["a"], "scatter", scatter_max_points=100)[1:] == ("hexbin", "hexbin")
+
+    def test_bar_keeps_top_n(self):
+        plotted, _, method = downsample_plot_data(self.dataset, "x", ["a"], "bar", bar_max_bars=10)
+        assert method == "top_n" and plotted["a"].tolist() == self.dataset["a"].nlargest(10).tolist()
+
+    def test_small_datasets_are_unchanged(self):
+        plotted, kind, method = downsample_plot_data(self.dataset, "x", ["a"], "line")
+        assert plotted is self.dataset and (kind, method) == ("line", None)
+
+
+class TestPlotRenderer:
+    @pytest.fixture
+    def registry(self, tmp_path):
+        registry = DatasetRegistry(str(tmp_path / "registry"))
+        self.handle = registry.register(pd.DataFrame({"year": [2021, 2022, 2023], "sales": [1.0, 3.0, 2.0]}))
+        return registry
+
+    def test_render_plot_returns_png(self, registry):
+        image, info = render_plot(registry.get_path(self.handle), "year", ["sales"], "line")
+        assert image.startswith(b"\x89PNG")
+        assert (info["rows"], info["plotted_rows"], info["downsampling"]) == (3, 3, None)
+
+    def test_concurrent_renders(self, tmp_path, registry):
+        """Test that identical requests share one file and different requests never collide."""
+        renderer = PlotRenderer(registry, str(tmp_path / "plots"), max_workers=2)
+
+        async def render_all():
+            return await asyncio.gather(
+                renderer.render(self.handle, "year", ["sales"], "line"),
+                renderer.render(self.handle, "year", ["sales"], "line"),
+                renderer.render(self.handle, "year", ["sales"], "bar"),
+            )
+
+        line, same_line, bar = [report["path"] for report in asyncio.run(render_all())]
+        assert line == same_line and line != bar
+        assert sorted(os.listdir(tmp_path / "plots")) == sorted([os.path.basename(line), os.path.basename(bar)])
+        with open(bar, "rb") as file:
+            assert renderer.read(bar) == file.read()
+
+    def test_repeated_render_is_cached(self, tmp_path, registry):
+        renderer = PlotRenderer(registry, str(tmp_path / "plots"), max_workers=1)
+        first = asyncio.run(renderer.render(self.handle, "year", ["sales"], "scatter"))
+        second = asyncio.run(renderer.render(self.handle, "year", ["sales"], "scatter"))
+        assert not first["cached"] and second["cached"]
+        assert first["size_bytes"] == second["size_bytes"] == os.path.getsize(first["path"])
+
+    def test_unknown_handle(self, tmp_path, registry):
+        renderer = PlotRenderer(registry, str(tmp_path / "plots"))
+        with pytest.raises(KeyError):
+            asyncio.run(renderer.render("ds_missing", "year", ["sales"], "line"))
+
+
+class TestVisionCache:
+    def test_ttl_cache_expires_entries(self):
+        cache = TTLCache(maxsize=2, ttl=0.05)
+        cache.put("a", {"label": "x"})
+        assert cache.get("a") == {"label": "x"}
+        time.sleep(0.06)
+        assert cache.get("a") is None
+
+    def test_ttl_cache_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=None)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    def test_concurrent_fetches_share_one_download(self):
+        """Test that fetches of the same image in flight are deduplicated."""
+        fetcher = ImageFetcher()
+        url = "data:image/png;base64," + base64.b64encode(b"chart").decode()
+
+        async def fetch_twice():
+            tasks = [asyncio.ensure_future(fetcher.fetch(url)) for _ in range(2)]
+            await asyncio.sleep(0)
+            pending = len(fetcher._pending)
+            return pending, await asyncio.gather(*tasks)
+
+        pending, images = asyncio.run(fetch_twice())
+        assert pending == 1 and images == [b"chart", b"chart"]
+        assert get_content_hash(images[0]) == get_content_hash(b"chart")
+
+    def test_fetch_rejects_other_schemes_and_large_images(self):
+        with pytest.raises(ValueError):
+            asyncio.run(ImageFetcher().fetch("file:///etc/passwd"))
+        url = "data:image/png;base64," + base64.b64encode(b"x" * 1000).decode()
+        with pytest.raises(ValueError):
+            asyncio.run(ImageFetcher(max_bytes=100).fetch(url))
+
+    @pytest.fixture
+    def image_server(self):
+        """Local http server: /chart.png streams 5000 bytes, /redirect/<target> redirects to target."""
+        requests = []
+
+        class ImageHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                if self.path.startswith("/redirect/"):
+                    self.send_response(302)
+                    self.send_header("Location", self.path[len("/redirect/"):])
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.end_headers()  # no content-length, the limit applies to the streamed body
+                self.wfile.write(b"x" * 5000)
+
+            def log_message(self, *args):
+                pass
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        yield f"http://127.0.0.1:{httpd.server_port}", requests
+        httpd.shutdown()
+
+    def test_fetch_streams_http_with_byte_limit(self, image_server):
+        """Test that http bodies over the limit are rejected while streaming."""
+        base_url, _ = image_server
+        url = f"{base_url}/chart.png"
+        assert asyncio.run(ImageFetcher(max_bytes=10_000, allow_private_hosts=True).fetch(url)) == b"x" * 5000
+        with pytest.raises(ValueError):
+            asyncio.run(ImageFetcher(max_bytes=1000, allow_private_hosts=True).fetch(url))
+
+    def test_fetch_refuses_private_hosts(self, image_server):
+        """Test that loopback hosts are refused before any request is sent."""
+        base_url, requests = image_server
+        with pytest.raises(ValueError, match="not a public address"):
+            asyncio.run(ImageFetcher().fetch(f"{base_url}/chart.png"))
+        assert requests == []
+
+    def test_fetch_checks_every_redirect(self, image_server):
+        base_url, requests = image_server
+        fetcher = ImageFetcher(allow_private_hosts=True, max_redirects=1)
+        assert asyncio.run(fetcher.fetch(f"{base_url}/redirect//chart.png")) == b"x" * 5000
+        with pytest.raises(ValueError, match="scheme"):
+            asyncio.run(fetcher.fetch(f"{base_url}/redirect/file:///etc/passwd"))
+        with pytest.raises(ValueError, match="redirects"):
+            asyncio.run(fetcher.fetch(f"{base_url}/redirect//redirect//chart.png"))
+        assert requests == ["/redirect//chart.png", "/chart.png", "/redirect/file:///etc/passwd",
+                            "/redirect//redirect//chart.png", "/redirect//chart.png"]
+
+
+class TestImageEncoder:
+    def make_png(self, size=(2000, 1000)):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGBA", size, (30, 120, 200, 255)).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def test_preprocess_image_resizes_and_converts(self):
+        from PIL import Image
+        image = preprocess_image(self.make_png(), max_side=500, image_format="jpeg")
+        with Image.open(io.BytesIO(image)) as result:
+            assert (result.format, result.size, result.mode) == ("JPEG", (500, 250), "RGB")
+
+    def test_encode_labels_actual_format(self):
+        image = self.make_png()
+        encoded = ImageEncoder(max_side=500, image_format="png").encode(image)
+        assert encoded["url"].startswith("data:image/png;base64,")
+        assert encoded["original_bytes"] == len(image) and encoded["encoded_bytes"] < len(image)
+
+    def test_unsupported_format(self):
+        with pytest.raises(ValueError):
+            ImageEncoder(image_format="gif")
+
+
+class TestCompareTables:
+    before = pa.table({"id": [1, 2, 3, 4], "price": [10.0, 20.0, None, 40.0], "name": ["a", "b", "c", "d"]})
+    after = pa.table({"id": [4, 3, 2, 5], "price": [45.0, None, 20.0, 50.0], "name": ["d", "C", "b", "e"]})
+
+    def test_summary_aligned_on_key(self):
+        """Test that rows are matched by key regardless of order, with missing values equal on both sides."""
+        summary, differences = compare_tables(self.before, self.after, ["id", "price", "name"], key="id")
+        assert differences is None
+        assert (summary["matched_rows"], summary["only_in_self"], summary["only_in_other"]) == (3, 1, 1)
+        assert summary["changed_rows"] == 2
+        assert summary["columns"] == {
+            "price": {"changed_rows": 1, "mean_delta": 5.0, "total_delta": 5.0, "max_abs_delta": 5.0},
+            "name": {"changed_rows": 1},
+        }
+
+    def test_details(self):
+        _, differences = compare_tables(self.before, self.after, ["price", "name"], key="id", details=True)
+        assert differences.column("id").to_pylist() == [1, 3, 4, 5]
+        assert differences.column("status").to_pylist() == ["only_in_self", "changed", "changed", "only_in_other"]
+        assert differences.column("name_other").to_pylist() == [None, "C", "d", "e"]
+
+    def test_positional_alignment(self):
+        summary, differences = compare_tables(self.before, self.after.slice(0, 3), ["name"], details=True)
+        assert (summary["matched_rows"], summary["only_in_self"]) == (3, 1)
+        assert differences.column("row").to_pylist() == [0, 1, 2, 3]
+
+    def test_duplicate_keys(self):
+        with pytest.raises(ValueError):
+            compare_tables(pa.table({"id": [1, 1]}), self.after, [], key="id")
+
+
+def test_load_csv_with_wider_type_after_first_block(tmp_path):
+    """Test that a value of a wider type past the first streamed block falls back to a full read."""
+    path = tmp_path / "wide.csv"
+    path.write_text("a,b\n" + "".join(f"{i},x\n" for i in range(300_000)) + "1.5,y\n")
+    registry = DatasetRegistry(str(tmp_path / "registry"))
+    handle = registry.load(str(path))
+    assert registry.describe(handle)["columns"] == {"a": "double", "b": "string"}
+    assert registry.get_table(handle).column("a")[-1].as_py() == 1.5
+    assert not [name for name in os.listdir(tmp_path / "registry") if name.endswith(".tmp")]
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import weakref
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from fastmcp import Client
+
+# the server logs to logs/data_analysis.log from import time
+os.makedirs("logs", exist_ok=True)
+
+from src.mcp_servers.data_analysis import server
+from src.mcp_servers.data_analysis.helpers import DatasetRegistry, TTLCache
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = DatasetRegistry(str(tmp_path / "registry"))
+    monkeypatch.setattr(server, "registry", registry)
+    monkeypatch.setattr(server, "comparison_cache", TTLCache(8, ttl=None))
+    return registry
+
+
+def call_tool(name: str, arguments: dict):
+    async def call():
+        async with Client(server.create_mcp_server()) as client:
+            return (await client.call_tool(name, arguments)).structured_content
+    return asyncio.run(call())
+
+
+def test_compare_datasets_pages_without_rejoining(registry, monkeypatch):
+    """Test that later detail pages are served from the stored differences."""
+    before = registry.register(pd.DataFrame({"id": range(10), "price": [float(i) for i in range(10)]}))
+    after = registry.register(pd.DataFrame({"id": range(10), "price": [i + 1.0 for i in range(10)]}))
+    calls = []
+
+    def counting_compare_tables(*args, **kwargs):
+        calls.append(kwargs.get("details"))
+        return compare_tables(*args, **kwargs)
+
+    compare_tables = server.compare_tables
+    monkeypatch.setattr(server, "compare_tables", counting_compare_tables)
+
+    arguments = {"dataset1": before, "dataset2": after, "columns": ["price"], "key": "id"}
+    summary = call_tool("compare_datasets", arguments)
+    first = call_tool("compare_datasets", {**arguments, "details": True, "limit": 4})
+    second = call_tool("compare_datasets", {**arguments, "details": True, "limit": 4, "offset": 4})
+
+    assert calls == [False, True]
+    assert summary["columns"]["price"]["changed_rows"] == 10 and "details" not in summary
+    assert first["details"]["handle"] == second["details"]["handle"]
+    assert [row["id"] for row in first["details"]["data"] + second["details"]["data"]] == list(range(8))
+    assert second["details"]["next_offset"] == 8
+
+
+def test_call_vision_model_caps_concurrency_and_forwards_timeout(monkeypatch):
+    """Test that at most vision.max_concurrency calls are in flight and the timeout is forwarded."""
+    in_flight = 0
+    max_in_flight = 0
+    timeouts = []
+
+    async def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        timeouts.append(kwargs["timeout"])
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        message = SimpleNamespace(content="a chart")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(server, "get_async_groq_client", lambda: client)
+    monkeypatch.setattr(server, "vision_config", {"max_concurrency": 2, "timeout": 7})
+    monkeypatch.setattr(server, "_vision_semaphores", weakref.WeakKeyDictionary())
+
+    async def run():
+        return await asyncio.gather(*(server.call_vision_model([]) for _ in range(6)))
+
+    assert asyncio.run(run()) == ["a chart"] * 6
+    assert max_in_flight == 2
+    assert timeouts == [7] * 6
+
+
+def test_clean_data_reuses_the_cleaned_dataset(registry):
+    """Test that cleaning the same dataset the same way stores one file."""
+    handle = registry.register(pd.DataFrame({"price": [1.0, None, 3.0]}))
+    # the str | dict return type wraps the structured result
+    first = call_tool("clean_data", {"dataset": handle, "method": "fillna"})["result"]
+    second = call_tool("clean_data", {"dataset": handle, "method": "fillna"})["result"]
+    normalized = call_tool("clean_data", {"dataset": handle, "method": "normalize"})["result"]
+
+    assert first["handle"] == second["handle"] != normalized["handle"]
+    assert registry.get(first["handle"])["price"].tolist() == [1.0, 1.0, 3.0]
+    assert len(os.listdir(registry.storage_dir)) == 3
@@ -0,0 +1,53 @@
+import numpy as np
+
+from src.mcp_servers.data_analysis.utils import RunningMoments, TDigest, lttb
+
+
+def test_running_moments_match_numpy():
+    """Test that batched and merged Welford updates match the full-array mean and std."""
+    values = np.random.default_rng(0).normal(50, 10, 10_000)
+    left, right = RunningMoments(), RunningMoments()
+    for batch in np.array_split(values[:6000], 7):
+        left.update(batch)
+    right.update(values[6000:])
+    left.merge(right)
+    assert left.count == len(values)
+    assert np.isclose(left.mean, values.mean())
+    assert np.isclose(left.std(), values.std(ddof=1))
+    assert (left.min, left.max) == (values.min(), values.max())
+
+
+def test_tdigest_is_exact_for_small_inputs():
+    values = np.array([5.0, 1.0, 3.0, 2.0])
+    digest = TDigest(compression=100)
+    digest.update(values)
+    assert digest.quantile(0.5) == np.median(values)
+
+
+def test_tdigest_quantiles_are_close():
+    """Test that the compressed, merged sketch stays close to the exact quantiles."""
+    values = np.random.default_rng(1).exponential(3.0, 50_000)
+    digest, other = TDigest(compression=200), TDigest(compression=200)
+    for batch in np.array_split(values[:25_000], 10):
+        digest.update(batch)
+    other.update(values[25_000:])
+    digest.merge(other)
+    assert len(digest.means) <= 200
+    for q in (0.25, 0.5, 0.75):
+        assert abs(digest.quantile(q) - np.quantile(values, q)) < 0.02 * np.quantile(values, 0.75)
+
+
+def test_lttb_keeps_shape():
+    """Test that downsampling keeps the endpoints and the spike of the series."""
+    x = np.arange(10_000)
+    y = np.sin(x / 500)
+    y[4321] = 10.0
+    indices = lttb(x, y, 200)
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert 4321 in indices
+
+
+def test_lttb_short_series():
+    assert lttb(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
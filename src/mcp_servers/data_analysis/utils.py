@@ -0,0 +1,137 @@
+import math
+
+import numpy as np
+
+
+class RunningMoments:
+    """
+    Count, mean, variance (Welford / Chan et al. parallel update), min and max of a column,
+    updated one batch at a time and mergeable across workers.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        other = RunningMoments()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other: "RunningMoments"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def std(self, ddof: int = 1) -> float:
+        # same default as pandas (sample standard deviation)
+        if self.count <= ddof:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - ddof))
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (merging t-digest with the k1 scale function). Values are kept
+    exactly until there are more than `compression` of them, then compressed to at most
+    about compression / 2 centroids, which are smaller near the tails.
+    """
+
+    def __init__(self, compression: int = 200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._add(values.astype(float), np.ones(len(values)))
+
+    def merge(self, other: "TDigest"):
+        if len(other.means) == 0:
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add(other.means, other.weights)
+
+    def _add(self, means: np.ndarray, weights: np.ndarray):
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind="stable")
+        self.means, self.weights = means[order], weights[order]
+        if len(self.means) > self.compression:
+            self._compress()
+
+    def _compress(self):
+        total = self.weights.sum()
+        q = (np.cumsum(self.weights) - self.weights / 2) / total
+        # k1 scale function, clusters span at most one unit of k
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1) + self.compression / 4
+        cluster = np.floor(k).astype(int)
+        cluster -= cluster.min()
+        weights = np.bincount(cluster, weights=self.weights)
+        sums = np.bincount(cluster, weights=self.weights * self.means)
+        keep = weights > 0
+        self.weights = weights[keep]
+        self.means = sums[keep] / self.weights
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def quantile(self, q: float) -> float:
+        if len(self.means) == 0:
+            return math.nan
+        if np.all(self.weights == 1):
+            # still exact, same linear interpolation as pandas / numpy
+            return float(np.quantile(self.means, q))
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0.0], centers, [self.count]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * self.count, positions, values))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of `threshold` points that keep the
+    visual shape of the series. The first and last points are always kept, and from each bucket
+    in between the point forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x, y = x.astype(float), y.astype(float)
+    every = (n - 2) / (threshold - 2)
+    bounds = (np.arange(threshold - 1) * every).astype(int) + 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_start, next_end = (bounds[i + 1], bounds[i + 2]) if i + 2 < len(bounds) else (n - 1, n)
+        average_x, average_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[a] - average_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (average_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
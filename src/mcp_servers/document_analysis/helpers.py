@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List
+
+import requests
+
+
+logger = logging.getLogger("DocumentAnalysisMCPServer")
+
+HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/{model}"
+
+# words of 3+ letters, shared by keyword_extractor, sentiment_analyzer and tone_classifier
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+POSITIVE_WORDS = {'good', 'great', 'excellent', 'happy', 'love', 'fantastic', 'positive'}
+NEGATIVE_WORDS = {'bad', 'terrible', 'awful', 'sad', 'hate', 'horrible', 'negative'}
+FORMAL_WORDS = {'therefore', 'however', 'moreover', 'thus', 'consequently', 'furthermore'}
+INFORMAL_WORDS = {'cool', 'awesome', 'dude', 'buddy', 'yeah', 'lol', 'omg'}
+
+
+### NER backends ###
+# a backend turns a batch of texts into one list of entity dicts
+# ({"entity_group" | "entity": ..., "word": ...}) per text
+class LocalNERBackend:
+    """
+    transformers token-classification pipeline, loaded once and run on batches of texts.
+    """
+
+    def __init__(self, model: str, device: int | str | None = None, batch_size: int = 16):
+        from transformers import pipeline
+        self.batch_size = batch_size
+        self.pipeline = pipeline("token-classification", model=model, aggregation_strategy="simple", device=device)
+        logger.info(f"Loaded local NER model {model}")
+
+    def predict(self, texts: List[str]) -> List[List[dict]]:
+        return self.pipeline(texts, batch_size=self.batch_size)
+
+
+class RemoteNERBackend:
+    """
+    HuggingFace inference API, with a shared keep-alive session and a request timeout.
+    """
+
+    def __init__(self, model: str, token: str | None, timeout: float = 30.0):
+        self.url = HUGGINGFACE_API_URL.format(model=model)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def predict(self, texts: List[str]) -> List[List[dict]]:
+        response = self.session.post(self.url, json={"inputs": texts}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"API request failed with status code {response.status_code}: {response.text}")
+        data = response.json()
+        # a single input comes back as a flat list of entities, empty when it has none
+        if len(texts) == 1 and (not data or isinstance(data[0], dict)):
+            data = [data]
+        if len(data) != len(texts):
+            raise RuntimeError(f"API returned {len(data)} results for {len(texts)} texts")
+        return data
+
+
+def create_ner_backend(config: dict, token: str | None = None):
+    model = config.get("model", "dbmdz/bert-large-cased-finetuned-conll03-english")
+    if config.get("backend", "local") == "remote":
+        return RemoteNERBackend(model, token, timeout=config.get("timeout", 30.0))
+    return LocalNERBackend(model, device=config.get("device"), batch_size=config.get("max_batch_size", 16))
+
+
+### Micro-batching ###
+class MicroBatcher:
+    """
+    Groups concurrent `submit` calls into one backend.predict call. A batch is sent when it
+    reaches `max_batch_size` or `max_wait_ms` after its first text, and predict runs in a
+    worker thread so the event loop keeps accepting requests.
+    """
+
+    def __init__(self, backend, max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _ensure_worker(self):
+        # the queue and worker belong to the loop of the first caller, recreated for a new loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, text: str) -> List[dict]:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                results = await asyncio.to_thread(self.backend.predict, texts)
+                if len(results) != len(batch):
+                    # results can't be matched to texts, so no caller may be left waiting
+                    raise RuntimeError(f"NER backend returned {len(results)} results for {len(batch)} texts")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+### Result cache ###
+def get_text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def group_entities(items: List[dict]) -> Dict[str, List[str]]:
+    entities = {"PER": set(), "ORG": set(), "LOC": set(), "MISC": set()}
+
+    for item in items:
+        entity_type = item.get("entity_group", item.get("entity"))
+        word = item.get("word")
+        if entity_type in entities:
+            entities[entity_type].add(word)
+
+    readable_entities = {
+        "person": sorted(list(entities["PER"])),
+        "organization": sorted(list(entities["ORG"])),
+        "location": sorted(list(entities["LOC"])),
+    }
+    return readable_entities
+
+
+### Tokenization ###
+def count_tokens(text: str) -> Counter:
+    """
+    Lowercased word counts of the text, in order of first occurrence. Matches are lowercased one
+    by one, so no lowercase copy of the whole document is made.
+    """
+    return Counter(match.group().lower() for match in WORD_PATTERN.finditer(text))
+
+
+_token_cache: LRUCache | None = None
+
+
+def get_token_counts(text: str, cache_size: int = 256) -> Counter:
+    """
+    Cached `count_tokens` keyed by document hash, so tools called on the same document
+    scan it once. The returned Counter is shared, callers must not modify it.
+    """
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = LRUCache(cache_size)
+    key = get_text_hash(text)
+    counts = _token_cache.get(key)
+    if counts is None:
+        counts = count_tokens(text)
+        _token_cache.put(key, counts)
+    return counts
+
+
+### Document analysis ###
+def extract_keywords(counts: Counter, top_k: int = 5) -> List[str]:
+    return [w for w, _ in counts.most_common(top_k)]
+
+
+def classify_sentiment(words: Iterable[str]) -> str:
+    words = set(words)
+    pos_count = len(words & POSITIVE_WORDS)
+    neg_count = len(words & NEGATIVE_WORDS)
+
+    if pos_count > neg_count:
+        return 'positive'
+    elif neg_count > pos_count:
+        return 'negative'
+    else:
+        return 'neutral'
+
+
+def classify_tone(words: Iterable[str]) -> str:
+    words = set(words)
+    formal_count = len(words & FORMAL_WORDS)
+    informal_count = len(words & INFORMAL_WORDS)
+
+    if formal_count > informal_count:
+        return 'formal'
+    elif informal_count > formal_count:
+        return 'informal'
+    else:
+        return 'neutral'
+
+
+def analyze_document(counts: Counter, task: str, top_k: int = 5) -> List[str] | str:
+    if task == "keywords":
+        return extract_keywords(counts, top_k)
+    if task == "sentiment":
+        return classify_sentiment(counts.keys())
+    if task == "tone":
+        return classify_tone(counts.keys())
+    raise ValueError(f"Unknown document analysis task: {task}")
+
+
+def analyze_documents(documents: List[str], task: str, top_k: int = 5) -> list:
+    # runs in the batch process pool, so it only uses module-level functions
+    return [analyze_document(count_tokens(document), task, top_k) for document in documents]
+
+
+### Batch inputs ###
+def resolve_data_path(file_path: str, data_dir: str) -> str:
+    """
+    Resolves a tool's file_path inside `data_dir` (relative paths are taken from it) and
+    raises ValueError for anything outside it, symlinks and ".." included, since file
+    paths come from the model calling the tool.
+    """
+    root = os.path.realpath(data_dir)
+    path = os.path.realpath(os.path.join(root, file_path))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"file_path must be inside the data directory: {file_path}")
+    return path
+
+
+def load_documents(file_path: str) -> Iterator[str]:
+    """
+    Reads documents lazily from a file: one JSON string or {"text": ...} object per line
+    for .jsonl files, otherwise one document per line.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if file_path.endswith(".jsonl"):
+                record = json.loads(line)
+                yield record["text"] if isinstance(record, dict) else str(record)
+            else:
+                yield line
+
+
+def iter_batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
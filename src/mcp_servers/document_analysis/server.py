@@ -1,15 +1,33 @@
 from src.llm_client import get_groq_client
 from src.models.configs import ModelConfig
 from src.utils import load_config
+from src.mcp_servers.document_analysis.helpers import (
+    LRUCache,
+    MicroBatcher,
+    analyze_document,
+    analyze_documents,
+    classify_sentiment,
+    classify_tone,
+    create_ner_backend,
+    extract_keywords,
+    get_text_hash,
+    get_token_counts,
+    group_entities,
+    iter_batches,
+    load_documents,
+    resolve_data_path,
+)
+import asyncio
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 from typing import List
 
-from fastmcp import FastMCP
-from collections import Counter
-import requests
-import re
+from fastmcp import Context, FastMCP
 
 
 logging.basicConfig(
@@ -21,15 +39,50 @@ logger = logging.getLogger("DocumentAnalysisMCPServer")
 
 load_dotenv()
 
-HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/dbmdz/bert-large-cased-finetuned-conll03-english"
 HUGGINGFACE_TOKEN = os.getenv("HF_TOKEN")
 
 groq_client = get_groq_client()
 config: ModelConfig = load_config("config.yaml", section="teacher")
 TEACHER_MODEL = config.get("model_name")
+document_config = load_config("config.yaml", section="document_analysis")
+ner_config = document_config.get("ner", {})
+# token counts by document hash, shared by keyword_extractor, sentiment_analyzer and tone_classifier
+token_cache_size = document_config.get("token_cache_size", 256)
+batch_config = document_config.get("batch", {})
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+# results by text hash, shared by every session
+entity_cache = LRUCache(ner_config.get("cache_size", 4096))
+_entity_batcher = None
+_entity_batcher_lock = threading.Lock()
+
+
+def get_entity_batcher() -> MicroBatcher:
+    global _entity_batcher
+    with _entity_batcher_lock:
+        if _entity_batcher is None:
+            _entity_batcher = MicroBatcher(
+                create_ner_backend(ner_config, HUGGINGFACE_TOKEN),
+                max_batch_size=ner_config.get("max_batch_size", 16),
+                max_wait_ms=ner_config.get("max_wait_ms", 10.0),
+            )
+    return _entity_batcher
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    # load the NER model when the server starts instead of on the first entity_extractor call
+    try:
+        await asyncio.to_thread(get_entity_batcher)
+    except Exception as e:
+        logger.error(f"Could not load the NER backend: {e}")
+    yield
+
 
 mcp = FastMCP(
     name="document_analysis_server",
+    lifespan=lifespan,
 )
 
 
@@ -114,9 +167,7 @@ def keyword_extractor(text: str, top_k: int = 5) -> List[str]:
     Returns:
         list: List of top-k keywords.
     """
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    common = Counter(words).most_common(top_k)
-    return [w for w, _ in common]
+    return extract_keywords(get_token_counts(text, token_cache_size), top_k)
 
 
 @mcp.tool
@@ -132,23 +183,28 @@ def sentiment_analyzer(text: str) -> str:
     Returns:
         str: Sentiment label (e.g., 'positive', 'negative', 'neutral').
     """
-    positive_words = {'good', 'great', 'excellent', 'happy', 'love', 'fantastic', 'positive'}
-    negative_words = {'bad', 'terrible', 'awful', 'sad', 'hate', 'horrible', 'negative'}
+    return classify_sentiment(get_token_counts(text, token_cache_size).keys())
 
-    words = set(re.findall(r'\b[a-zA-Z]{3,}\b', text.lower()))
-    pos_count = len(words & positive_words)
-    neg_count = len(words & negative_words)
 
-    if pos_count > neg_count:
-        return 'positive'
-    elif neg_count > pos_count:
-        return 'negative'
-    else:
-        return 'neutral'
+async def extract_entities(text: str) -> dict:
+    key = get_text_hash(text)
+    cached = entity_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        items = await get_entity_batcher().submit(text)
+    except Exception as e:
+        logger.error(f"Entity extraction failed: {e}")
+        return {"error": "Entity extraction failed", "details": str(e)}
+
+    readable_entities = group_entities(items)
+    entity_cache.put(key, readable_entities)
+    return readable_entities
 
 
 @mcp.tool
-def entity_extractor(text: str) -> dict:
+async def entity_extractor(text: str) -> dict:
     """
     Extract named entities from the given text using Hugging Face NER model.
 
@@ -158,60 +214,170 @@ def entity_extractor(text: str) -> dict:
     Returns:
         dict: Extracted entities categorized by type (e.g., persons, organizations, locations).
     """
-    headers = {"Authorization": f"Bearer {HUGGINGFACE_TOKEN}"}
-    payload = {"inputs": text}
+    return await extract_entities(text)
+
+
+@mcp.tool
+def tone_classifier(text: str) -> str:
+    """
+    Classify the tone of the given text.
+    Formal words are: therefore, however, moreover, thus, consequently, furthermore.
+    Informal words are: cool, awesome, dude, buddy, yeah, lol, omg.
 
-    response = requests.post(HUGGINGFACE_API_URL, headers=headers, json=payload)
-    if response.status_code != 200:
-        logger.error(f"Hugging Face API request failed with status code {response.status_code}: {response.text}")
-        return {"error": f"API request failed with status code {response.status_code}",
-                "details": response.text}
+    Args:
+        text: The document content.
 
-    data = response.json()
+    Returns:
+        str: Tone label (e.g., 'formal', 'informal', 'neutral').
+    """
+    return classify_tone(get_token_counts(text, token_cache_size).keys())
+
+
+### Batch tools ###
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, since the server runs threads (NER batcher, uvicorn) that fork would copy
+            _process_pool = ProcessPoolExecutor(
+                max_workers=batch_config.get("max_workers"),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _process_pool
+
+
+def resolve_documents(documents: List[str] | None, file_path: str | None) -> List[str]:
+    if documents is not None and file_path is not None:
+        raise ValueError("Pass either documents or file_path, not both")
+    if file_path is not None:
+        return list(load_documents(resolve_data_path(file_path, batch_config.get("data_dir", "./data"))))
+    if documents is None:
+        raise ValueError("Pass documents or file_path")
+    return documents
+
+
+async def run_batch(task: str, documents: List[str] | None, file_path: str | None, ctx: Context | None,
+                    top_k: int = 5) -> list | dict:
+    """
+    Runs a document analysis task over many documents. Small inputs run in the server process
+    (sharing the token cache), larger ones are split into chunks for the process pool, and
+    progress is reported to the client as chunks complete.
+    """
+    try:
+        documents = resolve_documents(documents, file_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not load documents: {e}")
+        return {"error": "Could not load documents", "details": str(e)}
+
+    chunk_size = batch_config.get("chunk_size", 64)
+    if len(documents) <= chunk_size:
+        return [analyze_document(get_token_counts(d, token_cache_size), task, top_k) for d in documents]
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    chunks = list(iter_batches(documents, chunk_size))
+
+    async def run_chunk(index: int, chunk: List[str]):
+        return index, await loop.run_in_executor(pool, analyze_documents, chunk, task, top_k)
+
+    results = [None] * len(chunks)
+    processed = 0
+    for completed in asyncio.as_completed([run_chunk(i, chunk) for i, chunk in enumerate(chunks)]):
+        index, chunk_results = await completed
+        results[index] = chunk_results
+        processed += len(chunk_results)
+        if ctx is not None:
+            await ctx.report_progress(processed, len(documents))
+    return [result for chunk_results in results for result in chunk_results]
 
-    entities = {"PER": set(), "ORG": set(), "LOC": set(), "MISC": set()}
 
-    for item in data:
-        entity_type = item.get("entity_group", item.get("entity"))
-        word = item.get("word")
-        if entity_type in entities:
-            entities[entity_type].add(word)
+@mcp.tool
+async def batch_keyword_extractor(documents: List[str] | None = None, file_path: str | None = None, top_k: int = 5,
+                                  ctx: Context | None = None) -> List[List[str]] | dict:
+    """
+    Extract top-k keywords from each of many text documents.
 
-    readable_entities = {
-        "person": sorted(list(entities["PER"])),
-        "organization": sorted(list(entities["ORG"])),
-        "location": sorted(list(entities["LOC"])),
-    }
-    return readable_entities
+    Args:
+        documents: The document contents. Use either documents or file_path.
+        file_path: Path, inside the server's data directory, of a file with one document per line
+            (.jsonl: one {"text": ...} object per line).
+        top_k: Number of keywords to extract per document.
+
+    Returns:
+        list: List of top-k keywords for each document, in input order.
+    """
+    return await run_batch("keywords", documents, file_path, ctx, top_k)
 
 
 @mcp.tool
-def tone_classifier(text: str) -> str:
+async def batch_sentiment_analyzer(documents: List[str] | None = None, file_path: str | None = None,
+                                   ctx: Context | None = None) -> List[str] | dict:
     """
-    Classify the tone of the given text.
+    Analyze the sentiment of each of many text documents.
+    Positive words are: good, great, excellent, happy, love, fantastic, positive.
+    Negative words are: bad, terrible, awful, sad, hate, horrible, negative.
+
+    Args:
+        documents: The document contents. Use either documents or file_path.
+        file_path: Path, inside the server's data directory, of a file with one document per line
+            (.jsonl: one {"text": ...} object per line).
+
+    Returns:
+        list: Sentiment label ('positive', 'negative', 'neutral') for each document, in input order.
+    """
+    return await run_batch("sentiment", documents, file_path, ctx)
+
+
+@mcp.tool
+async def batch_tone_classifier(documents: List[str] | None = None, file_path: str | None = None,
+                                ctx: Context | None = None) -> List[str] | dict:
+    """
+    Classify the tone of each of many text documents.
     Formal words are: therefore, however, moreover, thus, consequently, furthermore.
     Informal words are: cool, awesome, dude, buddy, yeah, lol, omg.
 
     Args:
-        text: The document content.
+        documents: The document contents. Use either documents or file_path.
+        file_path: Path, inside the server's data directory, of a file with one document per line
+            (.jsonl: one {"text": ...} object per line).
 
     Returns:
-        str: Tone label (e.g., 'formal', 'informal', 'neutral').
+        list: Tone label ('formal', 'informal', 'neutral') for each document, in input order.
+    """
+    return await run_batch("tone", documents, file_path, ctx)
+
+
+@mcp.tool
+async def batch_entity_extractor(documents: List[str] | None = None, file_path: str | None = None,
+                                 ctx: Context | None = None) -> List[dict] | dict:
     """
-    formal_words = {'therefore', 'however', 'moreover', 'thus', 'consequently', 'furthermore'}
-    informal_words = {'cool', 'awesome', 'dude', 'buddy', 'yeah', 'lol', 'omg'}
+    Extract named entities from each of many text documents using Hugging Face NER model.
+
+    Args:
+        documents: The document contents. Use either documents or file_path.
+        file_path: Path, inside the server's data directory, of a file with one document per line
+            (.jsonl: one {"text": ...} object per line).
 
-    words = set(re.findall(r'\b[a-zA-Z]{3,}\b', text.lower()))
-    formal_count = len(words & formal_words)
-    informal_count = len(words & informal_words)
+    Returns:
+        list: Entities by type (persons, organizations, locations) for each document, in input order.
+    """
+    try:
+        documents = resolve_documents(documents, file_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not load documents: {e}")
+        return {"error": "Could not load documents", "details": str(e)}
 
-    if formal_count > informal_count:
-        return 'formal'
-    elif informal_count > formal_count:
-        return 'informal'
-    else:
-        return 'neutral'
+    # concurrent submits are grouped into model batches by the NER micro-batcher
+    results = []
+    for batch in iter_batches(documents, batch_config.get("chunk_size", 64)):
+        results.extend(await asyncio.gather(*[extract_entities(document) for document in batch]))
+        if ctx is not None:
+            await ctx.report_progress(len(results), len(documents))
+    return results
 
 
 def create_mcp_server() -> FastMCP:
-    return mcp
\ No newline at end of file
+    return mcp
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,157 @@
+import asyncio
+import re
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from src.mcp_servers.document_analysis.helpers import (
+    LRUCache,
+    MicroBatcher,
+    RemoteNERBackend,
+    analyze_documents,
+    count_tokens,
+    get_token_counts,
+    group_entities,
+    iter_batches,
+    load_documents,
+    resolve_data_path,
+)
+
+
+class UpperCaseBackend:
+    """Tags every capitalized word as a person and records the batches it receives."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, texts):
+        self.batches.append(list(texts))
+        return [[{"entity_group": "PER", "word": word} for word in text.split() if word.istitle()] for text in texts]
+
+
+class TestMicroBatcher:
+    def test_concurrent_requests_share_a_batch(self):
+        """Test that concurrent submits are answered from one predict call, in order."""
+        backend = UpperCaseBackend()
+        batcher = MicroBatcher(backend, max_batch_size=8, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(*[batcher.submit(f"hello Alice{i} and bob") for i in range(3)])
+
+        results = asyncio.run(run())
+        assert len(backend.batches) == 1
+        assert [r[0]["word"] for r in results] == ["Alice0", "Alice1", "Alice2"]
+
+    def test_batches_are_capped(self):
+        backend = UpperCaseBackend()
+        batcher = MicroBatcher(backend, max_batch_size=2, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(*[batcher.submit("Alice") for _ in range(5)])
+
+        asyncio.run(run())
+        assert [len(batch) for batch in backend.batches] == [2, 2, 1]
+
+    def test_backend_errors_are_raised(self):
+        class FailingBackend:
+            def predict(self, texts):
+                raise RuntimeError("model not loaded")
+
+        async def run():
+            return await MicroBatcher(FailingBackend()).submit("Alice")
+
+        with pytest.raises(RuntimeError, match="model not loaded"):
+            asyncio.run(run())
+
+    def test_missing_results_are_raised(self):
+        """Test that a backend returning fewer results than texts fails the batch instead of hanging."""
+        class ShortBackend:
+            def predict(self, texts):
+                return []
+
+        async def run():
+            return await asyncio.wait_for(MicroBatcher(ShortBackend()).submit("no entities here"), 5)
+
+        with pytest.raises(RuntimeError, match="0 results for 1 texts"):
+            asyncio.run(run())
+
+
+class TestRemoteNERBackend:
+    def make_backend(self, monkeypatch, data):
+        backend = RemoteNERBackend("model", token="token")
+        response = SimpleNamespace(status_code=200, text="", json=lambda: data)
+        monkeypatch.setattr(backend.session, "post", lambda *args, **kwargs: response)
+        return backend
+
+    def test_single_text_without_entities(self, monkeypatch):
+        assert self.make_backend(monkeypatch, []).predict(["no entities here"]) == [[]]
+
+    def test_single_text_with_entities(self, monkeypatch):
+        entity = {"entity_group": "PER", "word": "Ada"}
+        assert self.make_backend(monkeypatch, [entity]).predict(["Ada"]) == [[entity]]
+
+    def test_result_count_mismatch(self, monkeypatch):
+        with pytest.raises(RuntimeError):
+            self.make_backend(monkeypatch, [[], []]).predict(["one", "two", "three"])
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_group_entities():
+    items = [{"entity_group": "PER", "word": "Ada"}, {"entity_group": "LOC", "word": "London"}, {"entity": "ORG", "word": "IBM"}]
+    assert group_entities(items) == {"person": ["Ada"], "organization": ["IBM"], "location": ["London"]}
+
+
+class TestTokenization:
+    TEXT = "The Good, the bad and the ugly: a GREAT film_noir, good day! An x-ray of it"
+
+    def test_count_tokens_matches_lowercase_findall(self):
+        """Test that counting on the original text gives the same words as the lowercased scan."""
+        assert count_tokens(self.TEXT) == Counter(re.findall(r'\b[a-zA-Z]{3,}\b', self.TEXT.lower()))
+
+    def test_get_token_counts_is_cached(self):
+        assert get_token_counts(self.TEXT) is get_token_counts(self.TEXT)
+
+
+class TestBatchAnalysis:
+    def test_analyze_documents(self):
+        documents = ["What a great and happy day", "Moreover, the results were bad", "cool dude"]
+        assert analyze_documents(documents, "sentiment") == ["positive", "negative", "neutral"]
+        assert analyze_documents(documents, "tone") == ["neutral", "formal", "informal"]
+        assert analyze_documents(documents, "keywords", top_k=1) == [["what"], ["moreover"], ["cool"]]
+
+    def test_analyze_documents_unknown_task(self):
+        with pytest.raises(ValueError):
+            analyze_documents(["text"], "summary")
+
+    def test_load_documents(self, tmp_path):
+        jsonl = tmp_path / "docs.jsonl"
+        jsonl.write_text('{"text": "first doc"}\n\n"second doc"\n')
+        text = tmp_path / "docs.txt"
+        text.write_text("first doc\nsecond doc\n")
+        assert list(load_documents(str(jsonl))) == ["first doc", "second doc"]
+        assert list(load_documents(str(text))) == ["first doc", "second doc"]
+
+    def test_resolve_data_path(self, tmp_path):
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        (data_dir / "docs.txt").write_text("doc\n")
+        (tmp_path / "secret.txt").write_text("secret\n")
+        (data_dir / "link.txt").symlink_to(tmp_path / "secret.txt")
+        assert resolve_data_path("docs.txt", str(data_dir)) == str((data_dir / "docs.txt").resolve())
+        assert resolve_data_path(str(data_dir / "docs.txt"), str(data_dir)) == str((data_dir / "docs.txt").resolve())
+        for outside in ("../secret.txt", str(tmp_path / "secret.txt"), "link.txt", "/etc/passwd"):
+            with pytest.raises(ValueError):
+                resolve_data_path(outside, str(data_dir))
+
+    def test_iter_batches(self):
+        assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,223 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List
+
+from src.utils import load_config
+
+
+logger = logging.getLogger(__name__)
+
+# latency histogram upper bounds in seconds, the last bucket is +Inf
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+
+class StageMetrics:
+    """
+    Counters for a single pipeline stage (e.g. "generate_template", "augment.noise_injection").
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cost = 0.0
+
+    def observe(self, seconds: float, failed: bool = False):
+        self.calls += 1
+        self.errors += int(failed)
+        self.total_seconds += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                return
+        self.bucket_counts[-1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 6),
+            "mean_seconds": round(self.total_seconds / self.calls, 6) if self.calls else 0.0,
+            "latency_buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self.bucket_counts)),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "cost": round(self.cost, 6),
+        }
+
+
+_metrics: Dict[str, StageMetrics] = {}
+_lock = threading.Lock()
+_metrics_config = None
+_logfire = None
+
+
+def get_metrics_config() -> dict:
+    global _metrics_config
+    if _metrics_config is None:
+        _metrics_config = load_config("config.yaml", "metrics") or {}
+    return _metrics_config
+
+
+def _get_stage(stage: str) -> StageMetrics:
+    if stage not in _metrics:
+        _metrics[stage] = StageMetrics()
+    return _metrics[stage]
+
+
+def _get_logfire():
+    # spans are optional, logfire is only imported and configured when metrics.logfire is set
+    global _logfire
+    if _logfire is None and get_metrics_config().get("logfire", False):
+        import logfire
+        logfire.configure(send_to_logfire="if-token-present")
+        _logfire = logfire
+    return _logfire
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Records the wall time of the block under the given stage, and opens a
+    logfire span when enabled.
+    """
+    logfire = _get_logfire()
+    span = logfire.span(stage) if logfire is not None else nullcontext()
+    failed = False
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _get_stage(stage).observe(elapsed, failed)
+
+
+def instrument(stage: str):
+    """
+    Decorator version of `timed`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _get_int(obj: Any, *names: str) -> int:
+    for name in names:
+        value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        if isinstance(value, int):
+            return value
+    return 0
+
+
+def record_usage(stage: str, response: Any, model: str | None = None):
+    """
+    Adds the token usage of an LLM response to the stage. Works with both chat completions
+    (prompt_tokens / completion_tokens) and responses API (input_tokens / output_tokens) usage,
+    and prices it with metrics.prices[model] when configured.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = _get_int(usage, "prompt_tokens", "input_tokens")
+    completion_tokens = _get_int(usage, "completion_tokens", "output_tokens")
+    details = getattr(usage, "prompt_tokens_details", None) or getattr(usage, "input_tokens_details", None)
+    cached_tokens = _get_int(details, "cached_tokens") if details is not None else 0
+
+    prices = get_metrics_config().get("prices", {}).get(model, {})
+    cost = (prompt_tokens * prices.get("input_per_million", 0.0)
+            + completion_tokens * prices.get("output_per_million", 0.0)) / 1_000_000
+
+    with _lock:
+        stage_metrics = _get_stage(stage)
+        stage_metrics.prompt_tokens += prompt_tokens
+        stage_metrics.completion_tokens += completion_tokens
+        stage_metrics.cached_tokens += cached_tokens
+        stage_metrics.cost += cost
+
+
+def record_retry(stage: str, count: int = 1):
+    with _lock:
+        _get_stage(stage).retries += count
+
+
+def record_cache_hit(stage: str, count: int = 1):
+    with _lock:
+        _get_stage(stage).cache_hits += count
+
+
+def get_metrics() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {stage: metrics.to_dict() for stage, metrics in _metrics.items()}
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+### Exporters ###
+def format_prometheus(metrics: Dict[str, Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    counters = ["calls", "errors", "prompt_tokens", "completion_tokens", "cached_tokens", "retries", "cache_hits"]
+    for name in counters:
+        lines.append(f"# TYPE mcpshrink_stage_{name}_total counter")
+        for stage, values in metrics.items():
+            lines.append(f'mcpshrink_stage_{name}_total{{stage="{stage}"}} {values[name]}')
+    lines.append("# TYPE mcpshrink_stage_cost_total counter")
+    for stage, values in metrics.items():
+        lines.append(f'mcpshrink_stage_cost_total{{stage="{stage}"}} {values["cost"]}')
+
+    lines.append("# TYPE mcpshrink_stage_latency_seconds histogram")
+    for stage, values in metrics.items():
+        cumulative = 0
+        for bound, count in values["latency_buckets"].items():
+            cumulative += count
+            lines.append(f'mcpshrink_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'mcpshrink_stage_latency_seconds_sum{{stage="{stage}"}} {values["total_seconds"]}')
+        lines.append(f'mcpshrink_stage_latency_seconds_count{{stage="{stage}"}} {values["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def save_metrics(logs_dir: str | None = None, filename: str = "metrics") -> str:
+    """
+    Writes the collected metrics as `<filename>.json` and `<filename>.prom`
+    (Prometheus text format) in paths.logs_dir.
+
+    Returns:
+        str: Path of the JSON summary.
+    """
+    if logs_dir is None:
+        logs_dir = load_config("config.yaml", "paths").get("logs_dir", "./logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    metrics = get_metrics()
+
+    json_path = os.path.join(logs_dir, f"{filename}.json")
+    with open(json_path, "w") as file:
+        json.dump(metrics, file, indent=2)
+    with open(os.path.join(logs_dir, f"{filename}.prom"), "w") as file:
+        file.write(format_prometheus(metrics))
+
+    logger.info(f"Metrics saved to {json_path}")
+    return json_path
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import Dict
+
+
+# output of the budget planner, consumed by the templater, generator and augmenter stages
+class BudgetPlan(BaseModel):
+    target_size: int = Field(..., description="Number of teacher prompts the dataset should contain")
+    n_tools: int = Field(..., description="Number of tools the budget is spread across")
+    rows_per_tool: int = Field(..., description="Number of teacher prompts each tool should end up with")
+    templates_per_tool: int = Field(..., description="Number of templates to generate per tool")
+    batch_size: int = Field(..., description="Number of expanded queries to generate per template")
+    variants: Dict[str, int] = Field(default_factory=dict, description="Number of variants per augmentation technique")
+    expected_rows: int = Field(..., description="Number of rows the plan is expected to produce before selection")
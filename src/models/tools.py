@@ -5,4 +5,6 @@ class Tool(BaseModel):
     name: str = Field(..., description="Name of the tool")
     description: str = Field(..., description="Description of the tool")
     parameters: Dict[str, Any] = Field(default_factory=dict, description="Parameters for the tool")
-    output_schema: Dict[str, Any] | None = Field(default=None, description="Output schema for the tool")
\ No newline at end of file
+    output_schema: Dict[str, Any] | None = Field(default=None, description="Output schema for the tool")
+    mcp_server: str | None = Field(default=None, description="Optional MCP server name the tool belongs to")
+    mcp_server_url: str | None = Field(default=None, description="MCP server URL the tool belongs to")
@@ -3,6 +3,8 @@ import re
 import asyncio
 from googletrans import Translator
 
+from src.metrics import instrument, record_retry
+
 import logging
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("wikipediaapi").setLevel(logging.WARNING)
@@ -19,7 +21,8 @@ class BackTranslationAugmentor:
     def __init__(self, hops: int = 2):
         self.hops = hops
 
-    async def _augment_async(self, text: str) -> str:
+    async def _augment_async(self, text: str, rng: random.Random | None = None) -> str:
+        rng = rng or random
         translator = Translator(timeout=10)
         placeholders = PLACEHOLDER_PATTERN.findall(text)
 
@@ -27,7 +30,7 @@ class BackTranslationAugmentor:
             fail = False
             intermediate = text
             for _ in range(self.hops):
-                lang = random.choice(LANGS)
+                lang = rng.choice(LANGS)
                 try:
                     translated = await translator.translate(intermediate, dest=lang)
                     intermediate = translated.text
@@ -39,6 +42,7 @@ class BackTranslationAugmentor:
                     break
 
             if fail:
+                record_retry("augment.back_translation")
                 continue
 
             back = await translator.translate(intermediate, dest="en")
@@ -46,8 +50,10 @@ class BackTranslationAugmentor:
 
             if all(ph in back for ph in placeholders):
                 return back
+            record_retry("augment.back_translation")
 
         return text
 
-    def augment(self, text: str) -> str:
-        return asyncio.run(self._augment_async(text))
\ No newline at end of file
+    @instrument("augment.back_translation")
+    def augment(self, text: str, rng: random.Random | None = None) -> str:
+        return asyncio.run(self._augment_async(text, rng))
\ No newline at end of file
@@ -3,7 +3,8 @@ import wikipedia
 import wikipediaapi
 import nlpaug.augmenter.char as nac
 
-from src.query.augmentation.helpers import regex_tokenizer, merge_params
+from src.metrics import instrument
+from src.query.augmentation.helpers import regex_tokenizer, merge_params, seeded_global_random
 
 # The first argument is the user agent, can be changed.
 wiki = wikipediaapi.Wikipedia("ShrinkMCP", "en")
@@ -69,12 +70,16 @@ class NoiseInjectionAugmentor:
             tokenizer=regex_tokenizer,
         )
 
-    def lexical_noise(self, text: str) -> str:
-        text = self.aug_typo.augment(text)
-        text = self.aug_swapletter.augment(text)
+    def lexical_noise(self, text: str, rng: random.Random | None = None) -> str:
+        with seeded_global_random(rng):
+            text = self.aug_typo.augment(text)
+            text = self.aug_swapletter.augment(text)
         return text[0]
 
-    def semantic_noise(self, text: str) -> str:
+    def semantic_noise(self, text: str, rng: random.Random | None = None) -> str:
+        # the page comes from the Wikipedia random endpoint and cannot be seeded,
+        # only the sentence picked from it follows rng
+        rng = rng or random
         for _ in range(5):
             try:
                 title = wikipedia.random(pages=1)
@@ -89,7 +94,7 @@ class NoiseInjectionAugmentor:
                 if not sentences:
                     continue
 
-                random_sentence = random.choice(sentences).strip()
+                random_sentence = rng.choice(sentences).strip()
                 if not random_sentence:
                     continue
 
@@ -99,14 +104,16 @@ class NoiseInjectionAugmentor:
 
         return text
 
-    def augment(self, text: str, add_lexical: bool = False, add_semantic: bool = True) -> str:
+    @instrument("augment.noise_injection")
+    def augment(self, text: str, add_lexical: bool = False, add_semantic: bool = True, rng: random.Random | None = None) -> str:
         """
         Apply a full augmentation pipeline:
         1. Lexical noise (optional)
         2. Semantic noise (optional)
+        Random choices are drawn from rng when given, otherwise from the global random state.
         """
         if add_lexical:
-            text = self.lexical_noise(text)
+            text = self.lexical_noise(text, rng)
         if add_semantic:
-            text = self.semantic_noise(text)
+            text = self.semantic_noise(text, rng)
         return text
\ No newline at end of file
@@ -2,7 +2,8 @@ import random
 from typing import List, Dict, Optional
 import nlpaug.augmenter.word as naw
 
-from src.query.augmentation.helpers import regex_tokenizer, merge_params, get_random_word
+from src.metrics import instrument
+from src.query.augmentation.helpers import regex_tokenizer, merge_params, get_random_word, seeded_global_random
 
 RANDOM_AUGMENTERS = [
     "synonym_replacement",
@@ -103,34 +104,40 @@ class RandomAugmentationAugmentor:
             tokenizer=regex_tokenizer
         )
 
-    def synonym_replacement(self, text: str) -> str:
-        return self.aug_syn.augment(text)[0]
+    def synonym_replacement(self, text: str, rng: random.Random | None = None) -> str:
+        with seeded_global_random(rng):
+            return self.aug_syn.augment(text)[0]
 
-    def random_swap(self, text: str) -> str:
-        return self.aug_swap.augment(text)[0]
+    def random_swap(self, text: str, rng: random.Random | None = None) -> str:
+        with seeded_global_random(rng):
+            return self.aug_swap.augment(text)[0]
 
-    def random_insert(self, text: str) -> str:
+    def random_insert(self, text: str, rng: random.Random | None = None) -> str:
+        rng = rng or random
         text_words = text.split()
         if len(text_words) < 2:
             return text
 
         for _ in range(self.insert_count):
-            random_word = get_random_word()
-            pos = random.randint(1, len(text_words) - 2)
+            random_word = get_random_word(rng)
+            pos = rng.randint(1, len(text_words) - 2)
             text_words.insert(pos, random_word)
 
         return " ".join(text_words)
 
-    def random_delete(self, text: str) -> str:
-        return self.aug_del.augment(text)[0]
+    def random_delete(self, text: str, rng: random.Random | None = None) -> str:
+        with seeded_global_random(rng):
+            return self.aug_del.augment(text)[0]
 
-    def augment(self, text: str) -> str:
+    @instrument("augment.random_augmentation")
+    def augment(self, text: str, rng: random.Random | None = None) -> str:
         """
         Apply multiple augmentations in sequence.
         Randomly select functions from RANDOM_AUGMENTERS based on mixup_count.
+        Random choices are drawn from rng when given, otherwise from the global random state.
         """
-        funcs = random.sample(RANDOM_AUGMENTERS, self.mixup_count)
+        funcs = (rng or random).sample(RANDOM_AUGMENTERS, self.mixup_count)
         for func_name in funcs:
             func = getattr(self, func_name)
-            text = func(text)
+            text = func(text, rng)
         return text
\ No newline at end of file
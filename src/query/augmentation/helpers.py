@@ -1,5 +1,10 @@
 import re
 import random
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import numpy as np
 from nltk.corpus import words
 
 
@@ -13,5 +18,39 @@ def merge_params(defaults: dict, user_params: dict | None) -> dict:
     return {**defaults, **(user_params or {})}
 
 
-def get_random_word() -> str:
-    return random.choice(words.words())
\ No newline at end of file
+def get_random_word(rng: random.Random | None = None) -> str:
+    return (rng or random).choice(words.words())
+
+
+# for reproducible augmentation
+def derive_rng(seed: int, record_key: str, technique: str, variant: int) -> random.Random:
+    """
+    Returns an RNG stream that depends only on (seed, record, technique, variant),
+    so results do not change when records are processed in parallel, reordered or cached.
+    """
+    payload = f"{seed}|{record_key}|{technique}|{variant}".encode("utf-8")
+    return random.Random(int.from_bytes(hashlib.sha256(payload).digest()[:8], "big"))
+
+
+_global_random_lock = threading.Lock()
+
+@contextmanager
+def seeded_global_random(rng: random.Random | None):
+    """
+    nlpaug only draws from the global `random` and `numpy.random` states. This reseeds both
+    from rng for the duration of the block (one block at a time) and restores them afterwards.
+    Does nothing when rng is None.
+    """
+    if rng is None:
+        yield
+        return
+    with _global_random_lock:
+        random_state = random.getstate()
+        numpy_state = np.random.get_state()
+        random.seed(rng.getrandbits(64))
+        np.random.seed(rng.getrandbits(32))
+        try:
+            yield
+        finally:
+            random.setstate(random_state)
+            np.random.set_state(numpy_state)
\ No newline at end of file
@@ -1,6 +1,10 @@
 from typing import Dict, List
+import logging
 
 from src.models import AugmentedQuery, GeneratedQuery
+from src.query.augmentation.helpers import derive_rng
+
+logger = logging.getLogger(__name__)
 
 # Augmentor type constants
 BACK_TRANSLATION = "back_translation"
@@ -8,8 +12,13 @@ NOISE_INJECTION = "noise_injection"
 RANDOM_AUGMENTATION = "random_augmentation"
 
 
+def get_record_key(record: GeneratedQuery) -> str:
+    return f"{record.template.tool.name}|{record.template.template}|{record.expanded_query}"
+
+
 def generate_augmented_queries(records: List[GeneratedQuery], augmentation_config: Dict,
                                active_augmentors: Dict) -> List[AugmentedQuery]:
+    seed = augmentation_config.get("seed", 1)
     back_translation_variants = augmentation_config.get("back_translation", 1)
     noise_injection_variants = augmentation_config.get("noise_injection", 1)
     random_augmentation_variants = augmentation_config.get("random_augmentation", 1)
@@ -28,17 +37,18 @@ def generate_augmented_queries(records: List[GeneratedQuery], augmentation_confi
             # Each technique generates the specified variants of the original template
             n_variants = variants_map.get(aug_name, 0)
 
-            for _ in range(n_variants):
-                augmented_query = aug.augment(record.expanded_query)
+            for variant in range(n_variants):
+                # per-record stream, independent of processing order
+                rng = derive_rng(seed, get_record_key(record), aug_name, variant)
+                augmented_query = aug.augment(record.expanded_query, rng=rng)
                 augmented_record = AugmentedQuery(
                     generated_query=record,
                     augmented_query=augmented_query,
                     augmentation_technique=aug_name
                 )
 
-                print("Template:", record.template.template)
-                print(augmented_record, end="\n\n")
+                logger.debug(f"Template: {record.template.template}, augmented: {augmented_query}")
                 augmented_records.append(augmented_record)
 
-    print("Augmentation complete.", augmented_records, end="\n\n")
+    logger.info(f"Augmentation complete, {len(augmented_records)} augmented queries.")
     return augmented_records
\ No newline at end of file
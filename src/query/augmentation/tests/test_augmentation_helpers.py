@@ -0,0 +1,61 @@
+import random
+
+import numpy as np
+
+from src.models.tools import Tool
+from src.models.queries import TemplateQuery, GeneratedQuery
+from src.query.augmentation.helpers import derive_rng, seeded_global_random
+from src.query.augmentation.services import generate_augmented_queries
+
+
+class ShuffleAugmentor:
+    """Augmentor stand-in that only depends on the rng it is given."""
+    def augment(self, text: str, rng: random.Random | None = None) -> str:
+        words = text.split()
+        (rng or random).shuffle(words)
+        return " ".join(words)
+
+
+def make_records() -> list[GeneratedQuery]:
+    tool = Tool(name="add", description="Add two numbers")
+    template = TemplateQuery(tool=tool, template="What is [a] plus [b]?")
+    return [
+        GeneratedQuery(template=template, expanded_query=f"what is {i} plus {i + 1} in total please")
+        for i in range(5)
+    ]
+
+
+def test_derive_rng_is_deterministic():
+    first = derive_rng(11, "record", "noise_injection", 0).random()
+    assert first == derive_rng(11, "record", "noise_injection", 0).random()
+    assert first != derive_rng(11, "record", "noise_injection", 1).random()
+    assert first != derive_rng(12, "record", "noise_injection", 0).random()
+
+
+def test_seeded_global_random_restores_state():
+    random.seed(1)
+    np.random.seed(1)
+    expected = (random.random(), np.random.random())
+
+    random.seed(1)
+    np.random.seed(1)
+    with seeded_global_random(random.Random(5)):
+        inside = (random.random(), np.random.random())
+    assert (random.random(), np.random.random()) == expected
+
+    with seeded_global_random(random.Random(5)):
+        assert (random.random(), np.random.random()) == inside
+
+
+def test_augmented_queries_do_not_depend_on_order():
+    """Test that reordering records gives byte-identical augmentations per record."""
+    config = {"seed": 11, "noise_injection": 2}
+    augmentors = {"noise_injection": ShuffleAugmentor()}
+    records = make_records()
+
+    serial = generate_augmented_queries(records, config, augmentors)
+    reordered = generate_augmented_queries(records[::-1], config, augmentors)
+
+    def by_record(results):
+        return sorted((r.generated_query.expanded_query, r.augmented_query) for r in results)
+    assert by_record(serial) == by_record(reordered)
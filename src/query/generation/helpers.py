@@ -1,4 +1,5 @@
-from typing import List
+from typing import Dict, List
+import asyncio
 import os
 import logging
 
@@ -6,8 +7,10 @@ from fastmcp.tools.tool import FunctionTool # FunctionTool class from fastmcp co
 
 from src.models.tools import Tool
 from src.models.queries import GeneratedQuery, TemplateQuery
-from .utils import format_expanded_templates, get_tool_parameters, get_tool_description, get_tool_name, get_tool_output, format_templates, save_expanded_queries_as_csv, save_templates_as_csv, get_config_output_path
+from .utils import format_expanded_templates, get_tool_parameters, get_tool_description, get_tool_name, get_tool_output, format_templates, save_expanded_queries_as_csv, save_templates_as_csv, get_config_output_path, get_tool_fingerprint, load_templates_index_from_csv, to_fastmcp_tool, dump_mcp_tools
 from .services import expand_templates, generate_template
+from src.metrics import record_cache_hit
+from src.mcp_client import MCPClientPool, ServerSpec, get_server_name, get_server_url
 from src.utils import load_config
 
 
@@ -34,22 +37,91 @@ async def get_mcp_tools(mcp_server) -> List[Tool]:
     return tool_metadata
 
 
-def generate_templates_for_all_tools(tool_metadata: List[Tool], mcp_server_url: str | None) -> List[TemplateQuery]:
+async def fetch_server_tool_schemas(pool: MCPClientPool, server: ServerSpec, semaphore: asyncio.Semaphore) -> List[dict]:
+    """
+    Lists the tool schemas of a single MCP server on its pooled connection. Always listed
+    fresh, since server versions do not change when tools do; unchanged tools are skipped
+    later by their fingerprint in generate_templates_for_all_tools.
+    """
+    async with semaphore:
+        client = await pool.connect(server)
+        return dump_mcp_tools(await client.list_tools())
+
+
+async def discover_mcp_tools(servers: List[ServerSpec], max_concurrency: int = 8,
+                             pool: MCPClientPool | None = None) -> List[Tool]:
+    """
+    Lists the tools of many MCP servers concurrently and extracts their metadata in one pass.
+
+    Args:
+        servers (List[ServerSpec]): FastMCP instances, URLs, stdio commands or server dicts.
+        max_concurrency (int): Maximum number of servers queried at the same time.
+        pool (MCPClientPool, optional): Open pool to reuse connections from. A temporary one is used otherwise.
+
+    Returns:
+        List[Tool]: Metadata of every tool, tagged with the server it belongs to.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_all(pool: MCPClientPool) -> List[List[dict]]:
+        return await asyncio.gather(*[
+            fetch_server_tool_schemas(pool, server, semaphore) for server in servers
+        ])
+
+    if pool is None:
+        async with MCPClientPool() as pool:
+            schemas_per_server = await fetch_all(pool)
+    else:
+        schemas_per_server = await fetch_all(pool)
+
+    fastmcp_tools, owners = [], []
+    for server, schemas in zip(servers, schemas_per_server):
+        fastmcp_tools.extend(to_fastmcp_tool(schema) for schema in schemas)
+        owners.extend([server] * len(schemas))
+
+    tool_metadata = extract_tool_metadata(fastmcp_tools)
+    for tool, server in zip(tool_metadata, owners):
+        tool.mcp_server = get_server_name(server)
+        tool.mcp_server_url = get_server_url(server)
+    logger.info(f"Discovered {len(tool_metadata)} tools from {len(servers)} MCP servers")
+    return tool_metadata
+
+
+def generate_templates_for_all_tools(tool_metadata: List[Tool], mcp_server_url: str | None, templates_per_tool: int | None = None,
+                                     templates_index: Dict[str, List[str]] | None = None) -> List[TemplateQuery]:
+    """
+    Generates templates for every tool. Tools whose fingerprint is already in templates_index
+    with enough templates reuse them, so only new or changed tools go back to the templater.
+    """
+    templates_index = templates_index or {}
     records = []
+    reused = 0
     for tool in tool_metadata:
-        templates = generate_template(tool_metadata=tool)
+        cached = templates_index.get(get_tool_fingerprint(tool), [])
+        if cached and (templates_per_tool is None or len(cached) >= templates_per_tool):
+            templates = {"templates": cached[:templates_per_tool] if templates_per_tool else cached}
+            reused += 1
+            record_cache_hit("generate_template")
+        else:
+            templates = generate_template(tool_metadata=tool, templates_per_tool=templates_per_tool)
         records.extend(format_templates(templates, tool, mcp_server_url))
+    logger.info(f"Reused templates for {reused} of {len(tool_metadata)} tools")
     return records
 
 
-def expand_templates_for_all_records(records: List[TemplateQuery]) -> List[GeneratedQuery]:
+def expand_templates_for_all_records(records: List[TemplateQuery], batch_size: int | None = None) -> List[GeneratedQuery]:
     expanded_records = []
     for record in records:
-        response = expand_templates(template=record.template)
+        response = expand_templates(template=record.template, batch_size=batch_size)
         expanded_records.extend(format_expanded_templates(response, record))
     return expanded_records
 
 
+def load_templates_index(filename: str="templates.csv") -> Dict[str, List[str]]:
+    file_path = os.path.join(get_config_output_path(), filename)
+    return load_templates_index_from_csv(file_path)
+
+
 def save_templates(records: List[TemplateQuery], filename: str="templates.csv"):
     output_dir = get_config_output_path()
     os.makedirs(output_dir, exist_ok=True)              # create dir if it exists
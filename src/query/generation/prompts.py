@@ -0,0 +1,88 @@
+from textwrap import dedent
+from typing import Dict, List
+
+from src.models.tools import Tool
+
+
+# providers cache prompts by exact prefix, so the system prompts are constants that never
+# change between calls, and everything that varies per call (tool metadata, template,
+# requested counts) goes at the end of the user message.
+
+
+# append the tool_metadata to the end of prompt.
+DEFAULT_TEMPLATE_PROMPT = """
+    Generate query templates that would invoke the following tool metadata. Ensure the templates are diverse and cover different use cases. The templates should be in natural language and should not be in the form of function calls.
+
+    Each template should clearly indicate the parameters to be used, enclosed in square brackets [].
+
+    The purpose of the template is for another model to expand upon these templates to create full queries.
+
+    Here is the tool metadata:
+"""
+
+TEMPLATER_SYSTEM_PROMPT = dedent("""
+    You are a template generator. Your task is to generate query templates that should invoke the tool metadata provided. The number of templates to generate is given at the end of the user message. Your response should stricly be in json format.
+    Example tool metadata:
+    {
+        'description': 'Add two numbers',
+        'parameters': {'a': {'type': 'integer'}, 'b': {'type': 'integer'}},
+        'output': {'type': 'integer'},
+        'description': 'The sum of the two numbers'
+    }
+
+    Response example:
+    ```
+    {
+    "templates": [
+        "I have {a} apples and {b} oranges. How many fruits do I have in total?",
+        "What is the sum of {a} and {b}?",
+        "How much coins will I have if Jason gives me {a} coins and Mike gives me {b} coins?",
+        "Calculate the total of {a} and {b}.",
+        "How many years would it take if I spend {a} years in high school and {b} years in college?"
+    ]
+    }```
+""").strip()
+
+EXPANDER_SYSTEM_PROMPT = dedent("""
+    You are a template expander. Your task is to expand the provided template into full queries. The number of queries to generate from the template is given at the end of the user message. The queries should be complete and coherent and could be used to invoke the tool described in the metadata. The queries should be in natural language and should not be in the form of function calls. The queries should follow the semantic meaning of the template but can be restructured or rephrased for diversity.
+
+    Here is an example of a template and its corresponding expanded query:
+    Template: "I have {a} apples and {b} oranges. How many fruits do I have in total?"
+    Expanded Templates: [
+        "I have [3] apples and [5] oranges. How many fruits do I have in total?",
+        "If I obtained [10] apples and [15] oranges, how many fruits do I have altogether?",
+        "I saw [3251] mangoes, [1234] bananas, and [5639] lettuce in the market. How many fruits did I see in total?",
+    ]
+
+    Response example:
+    ```
+    {
+    "expanded_templates": [
+        "I have [3] apples and [5] oranges. How many fruits do I have in total?",
+        "If I obtained [10] apples and [15] oranges, how many fruits do I have altogether?",
+        "I harvested [333] apples and [222] oranges from my farm. I want to know the total number of fruits I have.",
+    ]
+    }```
+""").strip()
+
+
+def build_template_messages(tool_metadata: Tool, templates_per_tool: int,
+                            prompt: str = DEFAULT_TEMPLATE_PROMPT) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": TEMPLATER_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"{prompt}\n{tool_metadata}\n\nGenerate exactly {templates_per_tool} query templates."
+        },
+    ]
+
+
+def build_expansion_messages(template: str, batch_size: int) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": EXPANDER_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"Here are the records to expand: {template}\n\nExpand the template into exactly {batch_size} queries."
+        },
+    ]
+
@@ -0,0 +1,63 @@
+import asyncio
+from unittest.mock import patch
+
+from fastmcp import FastMCP
+
+from src.models.tools import Tool
+from src.query.generation.helpers import discover_mcp_tools, generate_templates_for_all_tools
+from src.query.generation.utils import get_tool_fingerprint, save_templates_as_csv, load_templates_index_from_csv
+
+
+def create_server(name: str) -> FastMCP:
+    mcp = FastMCP(name)
+
+    @mcp.tool
+    def echo(text: str) -> str:
+        """Echo the text"""
+        return text
+
+    return mcp
+
+
+def test_discover_mcp_tools():
+    """Test that tools from several servers are tagged with their server."""
+    servers = [create_server("first"), create_server("second")]
+    tools = asyncio.run(discover_mcp_tools(servers))
+
+    assert [tool.name for tool in tools] == ["echo", "echo"]
+    assert [tool.mcp_server for tool in tools] == ["first", "second"]
+    assert tools[0].parameters == {"text": {"type": "string"}}
+
+
+def test_discover_mcp_tools_lists_new_tools():
+    """Test that a tool added to a server is discovered on the next run."""
+    server = create_server("first")
+    assert [tool.name for tool in asyncio.run(discover_mcp_tools([server]))] == ["echo"]
+
+    @server.tool
+    def shout(text: str) -> str:
+        """Shout the text"""
+        return text.upper()
+
+    assert [tool.name for tool in asyncio.run(discover_mcp_tools([server]))] == ["echo", "shout"]
+
+
+@patch('src.query.generation.helpers.generate_template')
+def test_generate_templates_only_for_changed_tools(mock_generate_template, tmp_path):
+    """Test that tools with a known fingerprint reuse their saved templates."""
+    add_tool = Tool(name="add", description="Add two numbers", parameters={"a": {"type": "integer"}})
+    multiply_tool = Tool(name="multiply", description="Multiply two numbers", parameters={"a": {"type": "integer"}})
+    mock_generate_template.return_value = {"templates": ["What is [a] times [a]?"]}
+
+    first_run = generate_templates_for_all_tools([add_tool], None)
+    file_path = str(tmp_path / "templates.csv")
+    save_templates_as_csv(first_run, file_path)
+    mock_generate_template.reset_mock()
+
+    changed_add_tool = add_tool.model_copy(update={"description": "Add two integers"})
+    index = load_templates_index_from_csv(file_path)
+    generate_templates_for_all_tools([add_tool, multiply_tool, changed_add_tool], None, templates_index=index)
+
+    called_tools = [call.kwargs["tool_metadata"] for call in mock_generate_template.call_args_list]
+    assert called_tools == [multiply_tool, changed_add_tool]
+    assert get_tool_fingerprint(add_tool) in index
@@ -0,0 +1,27 @@
+from src.models.tools import Tool
+from src.query.generation.prompts import (
+    EXPANDER_SYSTEM_PROMPT,
+    TEMPLATER_SYSTEM_PROMPT,
+    build_expansion_messages,
+    build_template_messages,
+)
+
+
+def make_tool(name: str) -> Tool:
+    return Tool(name=name, description=f"{name} two numbers", parameters={"a": {"type": "integer"}, "b": {"type": "integer"}})
+
+
+class TestPromptPrefix:
+    def test_template_prefix_is_stable(self):
+        """Test that the system message does not change with the tool or the template count."""
+        first = build_template_messages(make_tool("add"), templates_per_tool=2)
+        second = build_template_messages(make_tool("multiply"), templates_per_tool=5)
+        assert first[0] == second[0] == {"role": "system", "content": TEMPLATER_SYSTEM_PROMPT}
+        assert second[1]["content"].endswith("Generate exactly 5 query templates.")
+
+    def test_expansion_prefix_is_stable(self):
+        first = build_expansion_messages("What is {a} plus {b}?", batch_size=3)
+        second = build_expansion_messages("Multiply {a} by {b}", batch_size=4)
+        assert first[0] == second[0] == {"role": "system", "content": EXPANDER_SYSTEM_PROMPT}
+        assert second[1]["content"].startswith("Here are the records to expand: Multiply {a} by {b}")
+        assert second[1]["content"].endswith("exactly 4 queries.")
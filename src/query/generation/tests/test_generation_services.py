@@ -5,6 +5,7 @@ from unittest.mock import patch, MagicMock
 
 from src.query.generation import services
 from src.query.generation.services import get_groq_client, generate_template, expand_templates
+from src.llm_client import get_http_client
 from src.models.tools import Tool
 
 
@@ -74,7 +75,7 @@ class TestGroqClient:
         """Test that the Groq client is initialized with the API key."""
         with patch('src.llm_client.Groq') as mock_groq:
             client = get_groq_client()
-            mock_groq.assert_called_once_with(api_key="test-key")
+            mock_groq.assert_called_once_with(api_key="test-key", http_client=get_http_client())
             
     @patch.dict(os.environ, {"GROQ_API_KEY": "test-key"})
     def test_get_groq_client_singleton(self):
@@ -89,7 +90,7 @@ class TestGroqClient:
             client1 = get_groq_client()
             client2 = get_groq_client()
             
-            mock_groq.assert_called_once_with(api_key="test-key")  # Should only be called once
+            mock_groq.assert_called_once_with(api_key="test-key", http_client=get_http_client())  # Should only be called once
             assert client1 is client2  # Should be the same instance
             assert client1 is mock_instance  # Should be the mocked instance
 
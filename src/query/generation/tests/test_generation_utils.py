@@ -3,7 +3,7 @@ import pytest
 
 from src.models.tools import Tool
 from src.models.queries import TemplateQuery, GeneratedQuery
-from src.query.generation.utils import get_tool_parameters, get_tool_name, get_tool_description, get_tool_output, extract_json_in_text, format_templates, format_expanded_templates, save_templates_as_csv, get_config_output_path, save_expanded_queries_as_csv
+from src.query.generation.utils import get_tool_parameters, get_tool_name, get_tool_description, get_tool_output, extract_json_in_text, format_templates, format_expanded_templates, save_templates_as_csv, get_config_output_path, save_expanded_queries_as_csv, to_fastmcp_tool
         
 
 @pytest.fixture
@@ -67,6 +67,21 @@ class TestMetadataExtractors:
         assert output == {"type": "integer"}
 
 
+class TestDiscoveryUtils:
+    def test_to_fastmcp_tool(self):
+        """Test conversion of a listed MCP tool schema for the metadata extractors."""
+        schema = {
+            "name": "add",
+            "description": "Add two numbers",
+            "inputSchema": {"properties": {"a": {"type": "integer"}}, "required": ["a"]},
+            "outputSchema": {"properties": {"result": {"type": "integer"}}},
+        }
+        tool = to_fastmcp_tool(schema)
+        assert get_tool_name(tool) == "add"
+        assert get_tool_parameters(tool) == {"a": {"type": "integer"}}
+        assert get_tool_output(tool) == {"type": "integer"}
+
+
 class TestRegexUtils:
     def test_extract_json_in_text_valid(self):
         """Test extraction of valid JSON from text."""
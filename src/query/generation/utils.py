@@ -1,10 +1,13 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
+import hashlib
 import logging
+import os
 import re
 import json
 
+import mcp.types
 import pandas as pd
-from fastmcp.tools.tool import FunctionTool
+from fastmcp.tools.tool import FunctionTool, Tool as MCPTool
 
 from src.models.queries import TemplateQuery, GeneratedQuery
 from src.models.tools import Tool
@@ -18,7 +21,7 @@ logger.setLevel(logging.INFO)
 ### Tool metadata extractors ###
 def get_tool_parameters(tool: FunctionTool) -> dict:
     tool_parameters = {}
-    parameters = tool.parameters['required']
+    parameters = tool.parameters.get('required', [])
     for param in parameters:
         tool_parameters[param] = tool.parameters['properties'][param]
     return tool_parameters
@@ -44,6 +47,32 @@ def get_tool_output(tool: FunctionTool) -> dict:
     return tool_output
 
 
+def to_fastmcp_tool(schema: dict) -> MCPTool:
+    # convert a tool listed by an MCP client (mcp.types.Tool dump) to the fastmcp Tool shape
+    # read by the extractors above
+    return MCPTool(
+        name=schema["name"],
+        description=schema.get("description"),
+        parameters=schema.get("inputSchema") or {},
+        output_schema=schema.get("outputSchema"),
+    )
+
+
+def dump_mcp_tools(tools: List[mcp.types.Tool]) -> List[dict]:
+    return [tool.model_dump(include={"name", "description", "inputSchema", "outputSchema"}) for tool in tools]
+
+
+def get_tool_fingerprint(tool: Tool) -> str:
+    # hash of everything the templater sees, so any schema change invalidates the templates
+    payload = json.dumps({
+        "name": tool.name,
+        "description": tool.description,
+        "parameters": tool.parameters,
+        "output_schema": tool.output_schema,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 ### Json utils ###
 def extract_json_in_text(text: str) -> Optional[dict]:
     # use regex to extract the json part of the response
@@ -68,8 +97,8 @@ def format_templates(templates: dict, tool: Tool, mcp_server_url: str | None) ->
         records.append(TemplateQuery(
             template=template,
             tool=tool,
-            mcp_server=templates.get("mcp_server", None),
-            mcp_server_url=mcp_server_url
+            mcp_server=templates.get("mcp_server", tool.mcp_server),
+            mcp_server_url=tool.mcp_server_url or mcp_server_url
         ))
     return records
 
@@ -101,12 +130,29 @@ def save_templates_as_csv(records: List[TemplateQuery], file_path: str):
         data.append({
             "template": record.template,
             "tool": record.tool.name,
-            "mcp_server": record.mcp_server
+            "mcp_server": record.mcp_server,
+            "fingerprint": get_tool_fingerprint(record.tool)
         })
     df = pd.DataFrame(data)
     df.to_csv(file_path, index=False)
 
 
+def load_templates_index_from_csv(file_path: str) -> Dict[str, List[str]]:
+    """
+    Reads a templates CSV into {tool fingerprint: [templates]}.
+    Rows saved before fingerprints were recorded are skipped.
+    """
+    if not os.path.exists(file_path):
+        return {}
+    df = pd.read_csv(file_path)
+    if "fingerprint" not in df.columns:
+        return {}
+    index: Dict[str, List[str]] = {}
+    for _, row in df.dropna(subset=["fingerprint"]).iterrows():
+        index.setdefault(row["fingerprint"], []).append(row["template"])
+    return index
+
+
 def save_expanded_queries_as_csv(generated_queries: List[GeneratedQuery], file_path: str):
     data = []
     for record in generated_queries:
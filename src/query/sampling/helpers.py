@@ -0,0 +1,152 @@
+from typing import Dict, List
+from collections import defaultdict
+import logging
+import math
+
+from src.models.budget import BudgetPlan
+from src.models.dataset import TeacherPrompt
+from src.utils import load_config
+from .utils import rows_per_expansion, plan_expansions, select_diverse_indices
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def plan_budget(
+    target_size: int,
+    n_tools: int,
+    max_templates: int,
+    max_batch_size: int,
+    variants: Dict[str, int],
+    oversample: float = 1.0,
+    max_variant_factor: float = 3.0
+) -> BudgetPlan:
+    """
+    Computes how many templates, expansions and augmentation variants each tool needs
+    so the pipeline produces about `target_size * oversample` rows.
+    Templates and expansions are LLM calls, so they are kept as low as possible and
+    augmentation variants are only raised when the template and batch caps are reached, up to
+    `max_variant_factor` times their configured count (more variants of one record are mostly
+    near-duplicates the diversity selection drops).
+
+    Args:
+        target_size (int): Number of teacher prompts wanted in the final dataset.
+        n_tools (int): Number of tools to spread the budget across.
+        max_templates (int): Upper bound for templates per tool.
+        max_batch_size (int): Upper bound for expanded queries per template.
+        variants (Dict[str, int]): Variants per active augmentation technique.
+        oversample (float): Extra rows to produce so the diversity selection has room to choose.
+        max_variant_factor (float): Upper bound for each technique's variants, relative to `variants`.
+
+    Returns:
+        BudgetPlan: The planned counts per tool.
+    """
+    if n_tools < 1:
+        raise ValueError("Cannot plan a budget without tools")
+
+    rows_per_tool = math.ceil(target_size / n_tools)
+    wanted_rows = math.ceil(rows_per_tool * oversample)
+    variants = dict(variants)
+
+    expansions_needed = math.ceil(wanted_rows / rows_per_expansion(variants))
+    templates, batch_size = plan_expansions(expansions_needed, max_templates, max_batch_size)
+
+    # template and batch caps reached, make up the difference with augmentations
+    expansions = templates * batch_size
+    if expansions * rows_per_expansion(variants) < wanted_rows and variants:
+        extra = math.ceil(wanted_rows / expansions) - rows_per_expansion(variants)
+        caps = {name: math.ceil(max(count, 1) * max_variant_factor) for name, count in variants.items()}
+        while extra > 0:
+            raised = False
+            for name in variants:
+                if extra > 0 and variants[name] < caps[name]:
+                    variants[name] += 1
+                    extra -= 1
+                    raised = True
+            if not raised:
+                break
+
+    expected_rows = n_tools * expansions * rows_per_expansion(variants)
+    if expected_rows < target_size:
+        logger.warning(
+            f"Budget caps allow about {expected_rows} rows for a target size of {target_size}, raise "
+            f"templater.templates_per_tool, generator.batch_size or dataset.max_variant_factor"
+        )
+
+    return BudgetPlan(
+        target_size=target_size,
+        n_tools=n_tools,
+        rows_per_tool=rows_per_tool,
+        templates_per_tool=templates,
+        batch_size=batch_size,
+        variants=variants,
+        expected_rows=expected_rows
+    )
+
+
+def load_budget_plan(n_tools: int, variants: Dict[str, int]) -> BudgetPlan:
+    """
+    Builds a BudgetPlan from the `dataset`, `templater` and `generator` sections of config.yaml.
+    The templater and generator counts in the config act as upper bounds.
+    """
+    dataset_config = load_config("config.yaml", "dataset")
+    templater_config = load_config("config.yaml", "templater")
+    generator_config = load_config("config.yaml", "generator")
+    plan = plan_budget(
+        target_size=dataset_config.get("target_size", 1000),
+        n_tools=n_tools,
+        max_templates=templater_config.get("templates_per_tool", 3),
+        max_batch_size=generator_config.get("batch_size", 3),
+        variants=variants,
+        oversample=dataset_config.get("oversample", 1.0),
+        max_variant_factor=dataset_config.get("max_variant_factor", 3.0)
+    )
+    logger.info(f"Budget plan: {plan}")
+    return plan
+
+
+def allocate_quotas(group_sizes: Dict[str, int], target_size: int) -> Dict[str, int]:
+    """
+    Splits target_size across groups as evenly as possible. Groups smaller than their
+    share keep all their rows and hand the leftover to the remaining groups.
+    """
+    quotas = {}
+    remaining = target_size
+    ordered = sorted(group_sizes.items(), key=lambda item: item[1])
+    for i, (name, size) in enumerate(ordered):
+        share = math.ceil(remaining / (len(ordered) - i))
+        quotas[name] = min(size, share)
+        remaining -= quotas[name]
+    return quotas
+
+
+def select_diverse_prompts(prompts: List[TeacherPrompt], target_size: int, ngram_size: int = 2) -> List[TeacherPrompt]:
+    """
+    Selects at most target_size prompts, balanced across tools, that cover the most distinct
+    word n-grams within each tool. Keeps the original order of the prompts.
+
+    Args:
+        prompts (List[TeacherPrompt]): Candidate prompts.
+        target_size (int): Number of prompts to keep.
+        ngram_size (int): Maximum n-gram length used to measure coverage.
+
+    Returns:
+        List[TeacherPrompt]: The selected prompts.
+    """
+    if len(prompts) <= target_size:
+        return prompts
+
+    groups = defaultdict(list)
+    for index, prompt in enumerate(prompts):
+        groups[prompt.tool_name].append(index)
+
+    quotas = allocate_quotas({name: len(indices) for name, indices in groups.items()}, target_size)
+    selected = []
+    for name, indices in groups.items():
+        texts = [prompts[i].query for i in indices]
+        picked = select_diverse_indices(texts, quotas[name], ngram_size)
+        selected.extend(indices[i] for i in picked)
+
+    logger.info(f"Selected {len(selected)} of {len(prompts)} prompts for the teacher stage")
+    return [prompts[i] for i in sorted(selected)]
@@ -0,0 +1,73 @@
+import pytest
+
+from src.models.dataset import TeacherPrompt
+from src.query.sampling.helpers import plan_budget, allocate_quotas, select_diverse_prompts
+from src.query.sampling.utils import extract_ngrams, select_diverse_indices, plan_expansions
+
+
+def make_prompt(id: int, query: str, tool_name: str) -> TeacherPrompt:
+    return TeacherPrompt(id=id, query=query, is_augmented=False, tool_name=tool_name)
+
+
+class TestPlanBudget:
+    def test_plan_budget_uses_fewest_llm_calls(self):
+        """Test that a small target needs fewer templates and expansions than the caps."""
+        plan = plan_budget(target_size=12, n_tools=3, max_templates=5, max_batch_size=5, variants={"noise_injection": 1})
+        assert plan.rows_per_tool == 4
+        assert plan.templates_per_tool == 1
+        assert plan.batch_size == 2
+        assert plan.expected_rows == 12
+
+    def test_plan_budget_raises_variants_when_capped(self):
+        """Test that augmentation variants grow once template and batch caps are reached."""
+        plan = plan_budget(target_size=40, n_tools=1, max_templates=2, max_batch_size=3, variants={"a": 1, "b": 1})
+        assert plan.templates_per_tool == 2
+        assert plan.batch_size == 3
+        assert plan.expected_rows >= 40
+        assert plan.variants["a"] >= 1 and plan.variants["b"] >= 1
+
+    def test_plan_budget_caps_variants(self, caplog):
+        """Test that variants stop at max_variant_factor times their count and a shortfall is logged."""
+        plan = plan_budget(target_size=1000, n_tools=1, max_templates=2, max_batch_size=3, variants={"a": 1, "b": 2},
+                           max_variant_factor=3)
+        assert plan.variants == {"a": 3, "b": 6}
+        assert plan.expected_rows < 1000
+        assert "target size of 1000" in caplog.text
+
+    def test_plan_budget_oversample(self):
+        """Test that oversampling plans more rows than the target."""
+        plan = plan_budget(target_size=10, n_tools=1, max_templates=10, max_batch_size=10, variants={}, oversample=2.0)
+        assert plan.expected_rows >= 20
+
+    def test_plan_budget_no_tools(self):
+        with pytest.raises(ValueError):
+            plan_budget(target_size=10, n_tools=0, max_templates=1, max_batch_size=1, variants={})
+
+    def test_plan_expansions(self):
+        assert plan_expansions(7, max_templates=3, max_batch_size=3) == (3, 3)
+        assert plan_expansions(1, max_templates=3, max_batch_size=3) == (1, 1)
+
+
+class TestDiverseSelection:
+    def test_extract_ngrams(self):
+        assert extract_ngrams("Add two numbers", n=2) == {"add", "two", "numbers", "add two", "two numbers"}
+
+    def test_select_diverse_indices_skips_duplicates(self):
+        """Test that near-duplicate texts are not selected while new n-grams remain."""
+        texts = [
+            "What is the sum of 3 and 5?",
+            "What is the sum of 3 and 5?",
+            "I bought apples and oranges, how many fruits do I have?",
+        ]
+        assert sorted(select_diverse_indices(texts, 2)) == [0, 2]
+
+    def test_allocate_quotas_redistributes(self):
+        assert allocate_quotas({"add": 1, "multiply": 10}, 6) == {"add": 1, "multiply": 5}
+
+    def test_select_diverse_prompts_balances_tools(self):
+        prompts = [make_prompt(i, f"add query number {i}", "add") for i in range(6)]
+        prompts += [make_prompt(i + 6, f"multiply query number {i}", "multiply") for i in range(6)]
+        selected = select_diverse_prompts(prompts, target_size=4)
+        assert len(selected) == 4
+        assert sum(p.tool_name == "add" for p in selected) == 2
+        assert [p.id for p in selected] == sorted(p.id for p in selected)
@@ -0,0 +1,81 @@
+from typing import List, Set
+import heapq
+import math
+import re
+
+
+WORD_PATTERN = re.compile(r"\w+(?:'\w+)?")
+
+
+### Budget math ###
+def rows_per_expansion(variants: dict) -> int:
+    # every expanded query is kept as a base row plus one row per augmentation variant
+    return 1 + sum(variants.values())
+
+
+def plan_expansions(expansions_needed: int, max_templates: int, max_batch_size: int) -> tuple[int, int]:
+    """
+    Picks the number of templates and the batch size needed to produce `expansions_needed`
+    expanded queries, using as few templater calls as possible.
+
+    Args:
+        expansions_needed (int): Number of expanded queries required for a tool.
+        max_templates (int): Upper bound for templates per tool.
+        max_batch_size (int): Upper bound for expanded queries per template.
+
+    Returns:
+        tuple[int, int]: (templates_per_tool, batch_size)
+    """
+    expansions_needed = max(expansions_needed, 1)
+    templates = min(max_templates, math.ceil(expansions_needed / max_batch_size))
+    templates = max(templates, 1)
+    batch_size = min(max_batch_size, math.ceil(expansions_needed / templates))
+    return templates, max(batch_size, 1)
+
+
+### N-gram coverage ###
+def extract_ngrams(text: str, n: int = 2) -> Set[str]:
+    """
+    Returns all word n-grams of length 1 to n in the lowercased text.
+    """
+    tokens = WORD_PATTERN.findall(text.lower())
+    ngrams = set()
+    for size in range(1, n + 1):
+        for i in range(len(tokens) - size + 1):
+            ngrams.add(" ".join(tokens[i:i + size]))
+    return ngrams
+
+
+def select_diverse_indices(texts: List[str], k: int, n: int = 2) -> List[int]:
+    """
+    Greedily selects k texts that maximize the number of distinct n-grams covered.
+    Uses lazy evaluation of marginal gains, since coverage gains only shrink as the
+    selection grows. Ties keep the original order so the result is deterministic.
+
+    Args:
+        texts (List[str]): Candidate texts.
+        k (int): Number of texts to select.
+        n (int): Maximum n-gram length.
+
+    Returns:
+        List[int]: Indices of the selected texts, in selection order.
+    """
+    if k >= len(texts):
+        return list(range(len(texts)))
+
+    ngram_sets = [extract_ngrams(text, n) for text in texts]
+    heap = [(-len(ngrams), i) for i, ngrams in enumerate(ngram_sets)]
+    heapq.heapify(heap)
+
+    covered: Set[str] = set()
+    selected = []
+    while heap and len(selected) < k:
+        _, i = heapq.heappop(heap)
+        gain = len(ngram_sets[i] - covered)
+        # stale gain, push back with the refreshed value unless it is still the best
+        if heap and (-gain, i) > heap[0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        selected.append(i)
+        covered |= ngram_sets[i]
+    return selected
@@ -1,9 +1,12 @@
 from typing import List
 
+import pytest
+from fastmcp import FastMCP
+
 from src.models.tools import Tool
 from src.models.queries import GeneratedQuery, AugmentedQuery, TemplateQuery
 from src.models.dataset import TeacherPrompt
-from src.helpers import merge_base_queries_and_augmentation_queries
+from src.helpers import check_teacher_mode, merge_base_queries_and_augmentation_queries
 
 
 def test_merge_base_queries_and_augmentated_queries():
@@ -56,4 +59,14 @@ def test_merge_base_queries_and_augmentated_queries():
     assert merged_queries[0].query == base_queries[0].expanded_query
     assert merged_queries[1].query == base_queries[1].expanded_query
     assert merged_queries[2].query == augmented_queries[0].augmented_query
-    assert merged_queries[3].query == augmented_queries[1].augmented_query
\ No newline at end of file
+    assert merged_queries[3].query == augmented_queries[1].augmented_query
+
+
+def test_check_teacher_mode():
+    """Test that hosted mode needs a URL for every server and local mode runs any server."""
+    servers = ["http://localhost:8000/mcp", "python my_server.py", FastMCP("in-process")]
+    with pytest.raises(ValueError, match="python my_server.py"):
+        check_teacher_mode(servers, None, "hosted")
+    check_teacher_mode(servers, "https://example.ngrok-free.app", "hosted")
+    check_teacher_mode(servers[:1], None, "hosted")
+    check_teacher_mode(servers, None, "local")
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import httpx
+import openai
+import pytest
+
+from src import llm_client
+from src.llm_client import DeadlineExceeded, Endpoint, LatencyTracker, LLMRouter, hedged_call, get_async_groq_client, get_async_http_client, get_http_client, get_pool_stats
+
+
+def make_endpoint(name: str, weight: float = 1.0, requests_per_minute: float | None = None, response=None) -> Endpoint:
+    endpoint = Endpoint(name, base_url=f"http://{name}/v1", api_key="key", weight=weight, requests_per_minute=requests_per_minute)
+    client = Mock()
+    client.chat.completions.create.return_value = response or name
+    endpoint._clients["sync"] = client
+    return endpoint
+
+
+def test_http_client_is_shared_and_configured():
+    """Test that the sync clients share one pooled httpx client built from the http config."""
+    client = get_http_client()
+    assert client is get_http_client()
+    assert isinstance(client, httpx.Client)
+    assert client.timeout.connect == llm_client.get_http_config()["timeouts"]["connect"]
+
+
+def test_async_clients_are_shared_per_event_loop():
+    """Test that async clients reuse one httpx.AsyncClient within a loop and get a new one in another loop."""
+    async def get_clients():
+        return get_async_http_client(), get_async_groq_client(), get_async_groq_client()
+
+    http_client, groq_client, same_groq_client = asyncio.run(get_clients())
+    other_http_client, _, _ = asyncio.run(get_clients())
+    assert groq_client is same_groq_client
+    assert http_client is not other_http_client
+
+
+def test_endpoint_clients_do_not_replace_shared_clients():
+    """Test that an endpoint named like a shared client gets its own async client."""
+    async def get_clients():
+        endpoint_client = Endpoint("groq", "https://example.com/v1", "key").get_client(is_async=True)
+        return endpoint_client, get_async_groq_client(), get_async_http_client()
+
+    endpoint_client, groq_client, http_client = asyncio.run(get_clients())
+    assert endpoint_client is not groq_client
+    assert str(endpoint_client.base_url).startswith("https://example.com/v1")
+    assert isinstance(http_client, httpx.AsyncClient)
+
+
+def test_get_pool_stats():
+    get_http_client()
+    stats = get_pool_stats()
+    assert stats["sync"]["connections"] == stats["sync"]["active"] + stats["sync"]["idle"]
+    assert stats["sync"]["queued"] == 0
+
+
+class TestLLMRouter:
+    def test_least_loaded_respects_weights(self):
+        """Test that in-flight requests are spread in proportion to endpoint weights."""
+        heavy, light = make_endpoint("heavy", weight=2.0), make_endpoint("light")
+        router = LLMRouter([heavy, light])
+        picked = [router.acquire(set())[0].name for _ in range(3)]
+        assert sorted(picked) == ["heavy", "heavy", "light"]
+
+    def test_rate_budget_moves_to_next_endpoint(self):
+        limited, other = make_endpoint("limited", requests_per_minute=1), make_endpoint("other", weight=0.5)
+        router = LLMRouter([limited, other])
+        assert router.call("chat.completions.create") == "limited"
+        assert router.call("chat.completions.create") == "other"
+        endpoint, wait = LLMRouter([limited]).acquire(set())
+        assert endpoint is None and 0 < wait <= 60
+
+    def test_fails_over_on_connection_error(self):
+        """Test that a failing endpoint is skipped and cooled down."""
+        broken, healthy = make_endpoint("broken", weight=2.0), make_endpoint("healthy")
+        broken._clients["sync"].chat.completions.create.side_effect = openai.APIConnectionError(request=httpx.Request("POST", "http://broken"))
+        router = LLMRouter([broken, healthy])
+        assert router.call("chat.completions.create", model="m") == "healthy"
+        assert broken.failures == 1 and broken.in_flight == 0
+        assert router.acquire(set())[0] is healthy
+
+    def test_routers_share_endpoint_state(self):
+        """Test that routers of different sections sharing an endpoint see one consistent in-flight count."""
+        shared, other = make_endpoint("shared"), make_endpoint("other")
+        templater, teacher = LLMRouter([shared]), LLMRouter([shared, other])
+
+        def hammer(router):
+            for _ in range(2000):
+                endpoint, _ = router.acquire(set())
+                router.release(endpoint, 0.01)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(hammer, [templater, teacher] * 2))
+        assert shared.in_flight == 0 and other.in_flight == 0
+
+        templater.acquire(set())
+        assert teacher.acquire(set())[0] is other
+
+    def test_max_retries_override(self):
+        endpoint = make_endpoint("single")
+        single_attempt = endpoint._clients["sync"].with_options.return_value
+        single_attempt.chat.completions.create.return_value = "single attempt"
+        router = LLMRouter([endpoint])
+        assert router.call("chat.completions.create", max_retries=0) == "single attempt"
+        endpoint._clients["sync"].with_options.assert_called_once_with(max_retries=0)
+        assert router.call("chat.completions.create") == "single"
+
+    def test_does_not_fail_over_on_bad_request(self):
+        broken, healthy = make_endpoint("broken", weight=2.0), make_endpoint("healthy")
+        broken._clients["sync"].chat.completions.create.side_effect = ValueError("bad request")
+        with pytest.raises(ValueError):
+            LLMRouter([broken, healthy]).call("chat.completions.create")
+        assert healthy._clients["sync"].chat.completions.create.call_count == 0
+
+
+class TestHedging:
+    def make_tracker(self, seconds: float) -> LatencyTracker:
+        tracker = LatencyTracker(min_samples=5)
+        for _ in range(5):
+            tracker.observe(seconds)
+        return tracker
+
+    def test_percentile_needs_min_samples(self):
+        tracker = LatencyTracker(min_samples=3)
+        tracker.observe(1.0)
+        assert tracker.percentile(0.9) is None
+        tracker.observe(2.0)
+        tracker.observe(3.0)
+        assert tracker.percentile(0.9) == 3.0
+
+    def test_slow_call_is_hedged(self):
+        """Test that a duplicate is sent after the percentile latency and the faster result wins."""
+        calls = itertools.count()
+        hedges = []
+
+        def request():
+            call = next(calls)
+            time.sleep(1.0 if call == 0 else 0.01)
+            return call
+
+        result = hedged_call(request, tracker=self.make_tracker(0.05), percentile=0.95, on_hedge=lambda: hedges.append(1))
+        assert result == 1
+        assert hedges == [1]
+
+    def test_deadline_starts_when_worker_starts(self, monkeypatch):
+        """Test that time spent queued behind abandoned calls does not count against the deadline."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(llm_client, "_hedge_executor", executor)
+        executor.submit(time.sleep, 0.3)
+        assert hedged_call(lambda: time.sleep(0.05) or "ok", deadline=0.2) == "ok"
+        executor.shutdown()
+
+    def test_fast_call_is_not_hedged(self):
+        hedges = []
+        assert hedged_call(lambda: "ok", tracker=self.make_tracker(0.5), percentile=0.95, on_hedge=lambda: hedges.append(1)) == "ok"
+        assert hedges == []
+
+    def test_deadline_exceeded(self):
+        with pytest.raises(DeadlineExceeded):
+            hedged_call(lambda: time.sleep(0.5), deadline=0.05)
+
+    def test_error_is_raised(self):
+        def request():
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            hedged_call(request, tracker=self.make_tracker(0.05), percentile=0.95, deadline=1.0)
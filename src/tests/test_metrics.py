@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import src.metrics as metrics
+from src.metrics import timed, instrument, record_usage, record_retry, record_cache_hit, get_metrics, reset_metrics, save_metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics._metrics_config = {"prices": {"test-model": {"input_per_million": 1.0, "output_per_million": 2.0}}}
+    reset_metrics()
+    yield
+    reset_metrics()
+    metrics._metrics_config = None
+
+
+def test_timed_records_calls_and_errors():
+    @instrument("stage")
+    def fail():
+        raise ValueError("boom")
+
+    with timed("stage"):
+        pass
+    with pytest.raises(ValueError):
+        fail()
+
+    stage = get_metrics()["stage"]
+    assert stage["calls"] == 2
+    assert stage["errors"] == 1
+    assert sum(stage["latency_buckets"].values()) == 2
+
+
+def test_record_usage_chat_and_responses_api():
+    chat = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50, prompt_tokens_details=None))
+    responses = SimpleNamespace(usage=SimpleNamespace(input_tokens=10, output_tokens=5, input_tokens_details=SimpleNamespace(cached_tokens=4)))
+    record_usage("llm", chat, "test-model")
+    record_usage("llm", responses, "test-model")
+    record_retry("llm")
+    record_cache_hit("llm", 2)
+
+    stage = get_metrics()["llm"]
+    assert stage["prompt_tokens"] == 110
+    assert stage["completion_tokens"] == 55
+    assert stage["cached_tokens"] == 4
+    assert stage["retries"] == 1
+    assert stage["cache_hits"] == 2
+    assert stage["cost"] == pytest.approx((110 * 1.0 + 55 * 2.0) / 1_000_000)
+
+
+def test_save_metrics(tmp_path):
+    with timed("stage"):
+        pass
+    json_path = save_metrics(str(tmp_path))
+    with open(json_path) as file:
+        assert json.load(file)["stage"]["calls"] == 1
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert 'mcpshrink_stage_calls_total{stage="stage"} 1' in prom
+    assert 'mcpshrink_stage_latency_seconds_bucket{stage="stage",le="+Inf"} 1' in prom